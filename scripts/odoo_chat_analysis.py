@@ -4,214 +4,250 @@ Script para extraer y analizar todas las sesiones de chat de proconsa.online en
 Genera reportes ejecutivos descargables en CSV y Markdown.
 """
 
-import xmlrpc.client
 import json
 import os
-import re
 import csv
-from collections import Counter, defaultdict
+import argparse
+from collections import Counter
 from datetime import datetime, timedelta
-from html.parser import HTMLParser
-
-# Leer credenciales
-CONFIG_PATH = os.path.expanduser("~/Dev/mcp/mcp-odoo/odoo_config.json")
-with open(CONFIG_PATH) as f:
-    cfg = json.load(f)
-
-URL = cfg["url"]
-DB = cfg["db"]
-USERNAME = cfg["username"]
-PASSWORD = cfg["password"]
-
-OUTPUT_DIR = os.path.expanduser("~/Dev/wix-tasks/reports")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-class HTMLStripper(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.result = []
-    def handle_data(self, d):
-        self.result.append(d)
-    def get_data(self):
-        return ''.join(self.result)
-
-def strip_html(html):
-    s = HTMLStripper()
-    s.feed(html or "")
-    return s.get_data().strip()
-
-def connect():
-    common = xmlrpc.client.ServerProxy(f"{URL}/xmlrpc/2/common")
-    uid = common.authenticate(DB, USERNAME, PASSWORD, {})
-    if not uid:
-        raise Exception("No se pudo autenticar")
-    models = xmlrpc.client.ServerProxy(f"{URL}/xmlrpc/2/object")
-    print(f"Conectado a Odoo. UID: {uid}")
-    return uid, models
-
-def get_all_sessions(uid, models):
-    """Obtiene todas las sesiones de livechat"""
-    print("Obteniendo sesiones de chat...")
-    sessions = []
-    offset = 0
-    batch = 200
-    while True:
-        chunk = models.execute_kw(
-            DB, uid, PASSWORD,
-            'discuss.channel', 'search_read',
-            [[['livechat_channel_id', '=', 1]]],
-            {'fields': ['name', 'create_date', 'livechat_operator_id', 'anonymous_name',
-                        'country_id', 'message_ids', 'livechat_active'],
-             'limit': batch, 'offset': offset, 'order': 'create_date asc'}
-        )
-        if not chunk:
-            break
-        sessions.extend(chunk)
-        offset += batch
-        print(f"  Sesiones obtenidas: {len(sessions)}")
-    print(f"Total sesiones: {len(sessions)}")
-    return sessions
-
-def get_messages_batch(uid, models, message_ids):
-    """Obtiene mensajes en lotes"""
-    all_msgs = []
-    batch = 500
-    for i in range(0, len(message_ids), batch):
-        chunk_ids = message_ids[i:i+batch]
-        msgs = models.execute_kw(
-            DB, uid, PASSWORD,
-            'mail.message', 'read',
-            [chunk_ids],
-            {'fields': ['body', 'author_id', 'date', 'res_id', 'message_type']}
-        )
-        all_msgs.extend(msgs)
-    return all_msgs
 
-def analyze_chats(sessions, all_messages):
-    """Análisis profundo de todas las conversaciones"""
-    
-    # Organizar mensajes por sesión
-    msgs_by_session = defaultdict(list)
-    for m in all_messages:
-        msgs_by_session[m['res_id']].append(m)
-    
-    # Métricas generales
-    total_sessions = len(sessions)
-    total_messages = len(all_messages)
+import odoo_rpc
+import odoo_profile
+from odoo_chat_common import (
+    OUTPUT_DIR, STATE_DIR, LIVECHAT_CHANNEL_IDS, patterns_fingerprint,
+    connect, classify_sessions, fetch_and_classify, parse_channel_ids,
+)
+from odoo_chat_dedup import collapse_conversations
+from odoo_chat_sampling import run_sample, write_sample_report, print_estimates
+from odoo_chat_manifest import ReportManifest, sessions_fingerprint, source_fingerprint
+from odoo_chat_cooccurrence import MIN_PAIR_SESSIONS, combo_key, parse_combos, cross_demand
+from odoo_chat_columnar import (
+    CONVERSATION_COLUMNS, CONVERSATIONS_STEM, columnar_backend, columnar_filename, write_columnar,
+)
+from odoo_chat_output import (
+    add_compress_argument, set_compression, zstd_module, report_filename, report_output_path, open_report, report_batch,
+)
+from odoo_chat_replay import add_replay_arguments, redirect_output, replay_and_classify
+from odoo_chat_timing import format_duration, add_session_timing, merge_response_times, new_response_times
+from odoo_chat_sketches import (
+    EMERGING_BASELINE_WEEKS, EMERGING_MIN_GROWTH, EMERGING_MIN_SESSIONS, DaySketches, TrendAccumulator, sketch_json,
+)
+from odoo_metrics import METRICS, write_metrics, print_summary
+
+# Almacén persistente de agregados: un parcial por día cerrado
+AGGREGATES_PATH = os.path.join(STATE_DIR, 'chat_aggregates.json')
+AGGREGATES_VERSION = 5
+CLOSED_DAY_LAG_DAYS = 1  # Días de gracia antes de considerar un día cerrado
+# Días del CSV de detalle por sesión: las filas no se guardan en el almacén, se
+# regeneran en cada corrida a partir de las sesiones de esta ventana
+DETAIL_DAYS = 30
+
+CONVERSATIONS_CSV = 'chat_conversaciones_detalle.csv'
+CONVERSATION_FIELDS = [
+    'session_id', 'date', 'operator', 'country', 'active',
+    'num_messages', 'visitor_messages', 'intents', 'products', 'emails'
+]
+EXECUTIVE_REPORT = 'REPORTE_EJECUTIVO_CHAT.md'
+METRICS_CSV = 'chat_metricas.csv'
+
+# Archivos de cada grupo de reportes (ver odoo_chat_manifest)
+ARTIFACTS = {
+    'ejecutivo': [EXECUTIVE_REPORT],
+    'metricas': [CONVERSATIONS_CSV, 'chat_emails_capturados.csv', METRICS_CSV],
+}
+SOURCE_FILES = ['odoo_chat_analysis.py', 'odoo_chat_common.py', 'odoo_chat_cooccurrence.py', 'odoo_chat_dedup.py',
+                'odoo_chat_columnar.py', 'odoo_chat_output.py']
+
+weekday_names = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+def load_aggregate_store(channel_ids=None):
+    """Carga los parciales por día cerrado; descarta el almacén si cambiaron los patrones o los canales"""
+    channel_ids = channel_ids or LIVECHAT_CHANNEL_IDS
+    empty = {'version': AGGREGATES_VERSION, 'patterns': patterns_fingerprint(), 'channels': channel_ids, 'days': {}}
+    if not os.path.exists(AGGREGATES_PATH):
+        return empty
+    with open(AGGREGATES_PATH, encoding='utf-8') as f:
+        store = json.load(f)
+    if store.get('version') != AGGREGATES_VERSION or store.get('patterns') != empty['patterns']:
+        print("  Almacén de agregados obsoleto (patrones o versión distintos), se recalcula")
+        return empty
+    # Los almacenes anteriores a --channels solo tenían el canal 1
+    if store.setdefault('channels', [1]) != channel_ids:
+        print(f"  Almacén de agregados de otros canales ({store['channels']}), se recalcula")
+        return empty
+    return store
+
+def multi_channel(store):
+    """True si la corrida analiza más de un canal (filas y reportes etiquetados por canal)"""
+    return len(store['channels']) > 1
+
+def save_aggregate_store(store):
+    """Escribe el almacén de forma atómica (archivo temporal + rename)"""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp_path = AGGREGATES_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(store, f, ensure_ascii=False, default=sketch_json)
+    os.replace(tmp_path, AGGREGATES_PATH)
+
+def last_closed_day(now=None):
+    """Último día (YYYY-MM-DD, UTC) que ya no puede recibir sesiones ni mensajes nuevos"""
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=CLOSED_DAY_LAG_DAYS + 1)).strftime('%Y-%m-%d')
+
+def new_day_partial():
+    return {
+        'sessions': 0,
+        'messages': 0,
+        'by_hour': {},
+        'intents': {},
+        'products': {},
+        'emails': [],
+        'combos': {},  # 'máscara_intenciones:máscara_productos' -> sesiones
+        'sketches': DaySketches(),  # términos y conteos distintos (odoo_chat_sketches)
+        'response_times': new_response_times(),  # segundos por hora UTC (odoo_chat_timing)
+    }
+
+def add_session_to_partials(partials, c, by_channel=False):
+    """Acumula una sesión clasificada en el parcial de su día.
+
+    Con by_channel=True la sesión se acumula también en day['by_channel'][canal].
+    """
+    day = partials.setdefault(c['create_dt'].strftime('%Y-%m-%d'), new_day_partial())
+    accumulate_session(day, c)
+    if by_channel:
+        channel = day.setdefault('by_channel', {}).setdefault(str(c['channel_id']), new_day_partial())
+        accumulate_session(channel, c)
+
+def conversation_row(c, by_channel=False):
+    """Fila del CSV de detalle de una sesión clasificada (con su canal si hay varios)"""
+    session = c['session']
+    session_intents = c['intents']
+    session_products = c['products']
+    session_emails = c['emails']
+    row = {
+        'session_id': session['id'],
+        'date': session['create_date'],
+        'operator': session['livechat_operator_id'][1] if session['livechat_operator_id'] else 'N/A',
+        'country': session['country_id'][1] if session['country_id'] else 'N/A',
+        'active': session['livechat_active'],
+        'num_messages': c['num_messages'],
+        'visitor_messages': ' | '.join(c['visitor_texts'][:5]),
+        'intents': ', '.join(session_intents) if session_intents else 'sin_clasificar',
+        'products': ', '.join(session_products) if session_products else 'ninguno',
+        'emails': ', '.join(session_emails) if session_emails else '',
+    }
+    if by_channel:
+        row['channel_id'] = c['channel_id']
+    return row
+
+def detail_start(now=None, days=DETAIL_DAYS):
+    """Primer día (YYYY-MM-DD) de la ventana del CSV de detalle"""
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=days)).strftime('%Y-%m-%d')
+
+def add_detail_argument(parser):
+    parser.add_argument('--detail-days', type=int, default=DETAIL_DAYS, metavar='N',
+                        help="Días del CSV de detalle por sesión; las filas se regeneran de esta ventana "
+                             f"y no se guardan en el almacén (default: {DETAIL_DAYS})")
+
+def accumulate_session(day, c):
+    """Suma los conteos de una sesión clasificada a un parcial diario"""
+    create_dt = c['create_dt']
+    day['sessions'] += 1
+    hour_key = str(create_dt.hour)
+    day['by_hour'][hour_key] = day['by_hour'].get(hour_key, 0) + 1
+    day['messages'] += c['num_messages']
     
-    # Análisis temporal
+    session_intents = c['intents']
+    session_products = c['products']
+    for intent in session_intents:
+        day['intents'][intent] = day['intents'].get(intent, 0) + 1
+    for product in session_products:
+        day['products'][product] = day['products'].get(product, 0) + 1
+    day['emails'].extend(c['emails'])
+    combo = combo_key(session_intents, session_products)
+    day['combos'][combo] = day['combos'].get(combo, 0) + 1
+    day['sketches'].add_session(c)
+    add_session_timing(day['response_times'], c)
+
+def summarize_sessions(classified, by_channel=False, conversations=None):
+    """Acumula sesiones ya clasificadas en un parcial por día de creación.
+
+    Si se pasa la lista `conversations`, se le agrega la fila de detalle de cada sesión.
+    """
+    partials = {}
+    for c in classified:
+        add_session_to_partials(partials, c, by_channel)
+        if conversations is not None:
+            conversations.append(conversation_row(c, by_channel))
+    return partials
+
+def channel_partials(partials, channel_id):
+    """Parciales diarios de un solo canal (de day['by_channel'])"""
+    result = {}
+    for day_key, day in partials.items():
+        channel = day.get('by_channel', {}).get(str(channel_id))
+        if channel:
+            result[day_key] = channel
+    return result
+
+def channel_analyses(partials, channel_ids, conversations=()):
+    """{canal: resultado de merge_partials} para los canales con sesiones"""
+    analyses = {}
+    for channel_id in channel_ids:
+        per_channel = channel_partials(partials, channel_id)
+        if per_channel:
+            rows = [row for row in conversations if row.get('channel_id') == channel_id]
+            analyses[channel_id] = merge_partials(per_channel, rows)
+        else:
+            print(f"  Canal {channel_id}: sin sesiones, no se genera reporte por canal")
+    return analyses
+
+def merge_partials(partials, conversations=()):
+    """Combina parciales diarios en el resultado que consume generate_reports().
+
+    `conversations` son las filas del CSV de detalle (de la ventana reportada, no del almacén).
+    """
+    total_sessions = 0
+    total_messages = 0
     sessions_by_month = Counter()
     sessions_by_weekday = Counter()
     sessions_by_hour = Counter()
-    weekday_names = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    
-    # Análisis de contenido
-    visitor_messages = []
-    bot_messages = []
-    emails_captured = []
     products_mentioned = Counter()
     intents = Counter()
-    conversations_data = []
+    emails_captured = []
+    combos = Counter()
     
-    # Patrones de intención
-    intent_patterns = {
-        'cotizacion_mayoreo': r'cotizaci[oó]n.*mayoreo|mayoreo|precio.*mayoreo',
-        'talleres_clinicas': r'taller|cl[ií]nica|capacitaci[oó]n|curso|inscrib',
-        'problema_sitio': r'problema.*sitio|no.*funciona|error|no.*carga|no.*puedo',
-        'solo_viendo': r'solo.*viendo|nada.*gracias|no.*gracias|solo.*mirando',
-        'busca_producto': r'busco|necesito|quiero|donde.*encuentro|tienen',
-        'precio': r'precio|costo|cu[aá]nto.*cuesta|cu[aá]nto.*vale',
-        'disponibilidad': r'disponib|hay.*en.*stock|tienen.*en.*existencia',
-        'envio': r'env[ií]o|entrega|domicilio|mandan',
-        'horario': r'horario|abren|cierran|hora',
-        'ubicacion': r'ubicaci[oó]n|direcci[oó]n|donde.*est[aá]n|sucursal',
-        'devolucion': r'devoluci[oó]n|cambio|garant[ií]a',
-        'factura': r'factura|facturaci[oó]n|cfdi|rfc',
-        'contratista': r'contratista|constructor|obra|proyecto',
-    }
+    # Recorrer en orden cronológico conserva el orden de desempate de most_common()
+    for day_key in sorted(partials):
+        day = partials[day_key]
+        day_dt = datetime.strptime(day_key, '%Y-%m-%d')
+        total_sessions += day['sessions']
+        total_messages += day['messages']
+        sessions_by_month[day_dt.strftime('%Y-%m')] += day['sessions']
+        sessions_by_weekday[weekday_names[day_dt.weekday()]] += day['sessions']
+        for hour, count in day['by_hour'].items():
+            sessions_by_hour[int(hour)] += count
+        intents.update(day['intents'])
+        products_mentioned.update(day['products'])
+        emails_captured.extend(day['emails'])
+        combos.update(parse_combos(day['combos']))
     
-    # Categorías de productos
-    product_patterns = {
-        'Varilla/Acero': r'varilla|acero|alambre|clavo|malla|solera|perfil.*met[aá]l',
-        'Cemento/Concreto': r'cemento|concreto|mortero|mezcla|block|tabique|tabic[oó]n',
-        'Pintura': r'pintura|rodillo|brocha|impermeabilizante|sellador|esmalte',
-        'Pisos/Loseta': r'piso|loseta|porcelanato|azulejo|cer[aá]mica|adocreto',
-        'Plomería': r'tubo|tuber[ií]a|v[aá]lvula|llave|conector|plomer[ií]a|tinaco',
-        'Electricidad': r'cable|el[eé]ctric|interruptor|contacto|l[aá]mpara|foco',
-        'Herramientas': r'herramienta|taladro|sierra|martillo|llave|desarmador',
-        'Madera': r'madera|triplay|plywood|tabla|poste|viga',
-        'Ferretería': r'tornillo|pija|ancla|bisagra|jaladera|chapa|cerradura',
-        'Impermeabilizante': r'impermeabilizante|impermeable|membrana|asfalto',
-        'Vigueta/Estructura': r'vigueta|bovedilla|castillo|armex|estructura',
-        'Arena/Grava': r'arena|grava|piedra|material.*p[eé]treo',
-    }
+    # Emails únicos
+    unique_emails = list(set(e.lower() for e in emails_captured))
     
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+    with METRICS.stage('cooccurrence', items=len(combos)):
+        cross = cross_demand(combos, total_sessions)
     
-    for session in sessions:
-        sid = session['id']
-        create_dt = datetime.strptime(session['create_date'], '%Y-%m-%d %H:%M:%S')
-        
-        sessions_by_month[create_dt.strftime('%Y-%m')] += 1
-        sessions_by_weekday[weekday_names[create_dt.weekday()]] += 1
-        sessions_by_hour[create_dt.hour] += 1
-        
-        msgs = sorted(msgs_by_session.get(sid, []), key=lambda x: x['date'])
-        
-        visitor_texts = []
-        bot_texts = []
-        session_emails = []
-        session_products = set()
-        session_intents = set()
-        
-        for msg in msgs:
-            text = strip_html(msg['body'])
-            if not text or 'Reiniciando' in text or 'abandonó' in text:
-                continue
-            
-            is_visitor = msg['author_id'] == False or (isinstance(msg['author_id'], list) and msg['author_id'][0] not in [7, 8, 2])
-            
-            if is_visitor:
-                visitor_texts.append(text)
-                text_lower = text.lower()
-                
-                # Detectar emails
-                found_emails = re.findall(email_pattern, text)
-                session_emails.extend(found_emails)
-                
-                # Detectar intenciones
-                for intent, pattern in intent_patterns.items():
-                    if re.search(pattern, text_lower):
-                        session_intents.add(intent)
-                
-                # Detectar productos
-                for product, pattern in product_patterns.items():
-                    if re.search(pattern, text_lower):
-                        session_products.add(product)
-            else:
-                bot_texts.append(text)
-        
-        for intent in session_intents:
-            intents[intent] += 1
-        for product in session_products:
-            products_mentioned[product] += 1
-        emails_captured.extend(session_emails)
-        
-        conversations_data.append({
-            'session_id': sid,
-            'date': session['create_date'],
-            'operator': session['livechat_operator_id'][1] if session['livechat_operator_id'] else 'N/A',
-            'country': session['country_id'][1] if session['country_id'] else 'N/A',
-            'active': session['livechat_active'],
-            'num_messages': len(msgs),
-            'visitor_messages': ' | '.join(visitor_texts[:5]),
-            'intents': ', '.join(session_intents) if session_intents else 'sin_clasificar',
-            'products': ', '.join(session_products) if session_products else 'ninguno',
-            'emails': ', '.join(session_emails) if session_emails else '',
-        })
+    # Los sketches se combinan aparte: solo quedan en memoria las últimas semanas
+    with METRICS.stage('sketches', items=len(partials)):
+        trends = TrendAccumulator()
+        for day_key in sorted(partials):
+            trends.add(day_key, partials[day_key].get('sketches'))
+        trends = trends.result()
     
-    # Emails únicos
-    unique_emails = list(set(e.lower() for e in emails_captured))
+    with METRICS.stage('timing_merge', items=len(partials)):
+        response_times = merge_response_times(partials[day_key] for day_key in sorted(partials))
     
     return {
         'total_sessions': total_sessions,
@@ -223,35 +259,178 @@ def analyze_chats(sessions, all_messages):
         'products_mentioned': dict(products_mentioned.most_common()),
         'emails_captured': unique_emails,
         'total_emails_captured': len(unique_emails),
-        'conversations_data': conversations_data,
+        'conversations_data': list(conversations),
+        'cross_demand': cross,
+        'trends': trends,
+        'response_times': response_times,
     }
 
-def generate_reports(analysis):
-    """Genera reportes descargables"""
+def analyze_chats(sessions, all_messages):
+    """Análisis profundo de todas las conversaciones"""
+    conversations = []
+    partials = summarize_sessions(classify_sessions(sessions, all_messages), conversations=conversations)
+    return merge_partials(partials, conversations)
+
+def analyze_with_store(classified, store, detail_from=None):
+    """Combina los parciales guardados con los días nuevos y guarda los que ya cerraron.
+
+    Las sesiones de días que ya están en el almacén no se vuelven a acumular; las
+    creadas desde `detail_from` (YYYY-MM-DD) dan además las filas del CSV de detalle.
+    """
+    by_channel = multi_channel(store)
+    new_days = {}
+    conversations = []
+    for c in classified:
+        day_key = c['create_dt'].strftime('%Y-%m-%d')
+        if day_key not in store['days']:
+            add_session_to_partials(new_days, c, by_channel)
+        if detail_from is None or day_key >= detail_from:
+            conversations.append(conversation_row(c, by_channel))
+    return finalize_with_store(new_days, store, conversations)
+
+def finalize_with_store(new_days, store, conversations=()):
+    """Combina los parciales nuevos con los guardados y persiste los días ya cerrados.
+
+    Con varios canales el resultado lleva además 'channels': {canal: resultado}.
+    """
+    all_days = {**store['days'], **new_days}
+    analysis = merge_partials(all_days, conversations)
+    if multi_channel(store):
+        analysis['channels'] = channel_analyses(all_days, store['channels'], conversations)
+    
+    closed_until = last_closed_day()
+    closed_days = {d: p for d, p in new_days.items() if d <= closed_until}
+    if closed_days:
+        store['days'].update(closed_days)
+        save_aggregate_store(store)
+        print(f"Parciales guardados: {len(closed_days)} días nuevos en {AGGREGATES_PATH}")
+    return analysis
+
+def analyze_replay(classified, channel_ids):
+    """Análisis de un replay: todo el historial en memoria, sin leer ni guardar el almacén"""
+    by_channel = len(channel_ids) > 1
+    conversations = []
+    partials = summarize_sessions(classified, by_channel, conversations)
+    analysis = merge_partials(partials, conversations)
+    if by_channel:
+        analysis['channels'] = channel_analyses(partials, channel_ids, conversations)
+    return analysis
+
+def stored_days_cutoff(store, detail_from=None):
+    """Primer día (YYYY-MM-DD) que hay que descargar, o None para todo el historial.
+
+    Es el primero que aún no está resumido en el almacén, o `detail_from` si es
+    anterior (las filas de detalle de esos días no se guardan).
+    """
+    if not store['days']:
+        return None
+    last_stored = datetime.strptime(max(store['days']), '%Y-%m-%d')
+    print(f"Días ya resumidos: {len(store['days'])} (hasta {max(store['days'])})")
+    cutoff = (last_stored + timedelta(days=1)).strftime('%Y-%m-%d')
+    return min(cutoff, detail_from) if detail_from else cutoff
+
+def artifact_inputs(group, fingerprint, collapse_templates=False, columnar=False, channel_ids=None,
+                    detail_from=None):
+    """Entradas de las que depende un grupo de ARTIFACTS (para el manifiesto).
+
+    El detalle de 'metricas' depende además del inicio de su ventana, que avanza cada día.
+    """
+    inputs = {
+        'sessions': fingerprint['digest'],
+        'patterns': patterns_fingerprint(),
+        'version': source_fingerprint(*SOURCE_FILES),
+    }
+    if channel_ids and len(channel_ids) > 1:
+        inputs['channels'] = channel_ids
+    if group == 'metricas':
+        inputs['collapse_templates'] = collapse_templates
+        inputs['detail_from'] = detail_from
+        if columnar:
+            inputs['columnar'] = columnar_backend()
+    return inputs
+
+def channel_filename(filename, channel_id):
+    """'chat_metricas.csv' -> 'chat_metricas_canal_2.csv'"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_canal_{channel_id}{ext}"
+
+def artifact_files(group, columnar=False, channel_ids=None):
+    """Archivos de un grupo (con la extensión de --compress), incluidos el detalle columnar y los reportes por canal"""
+    files = list(ARTIFACTS[group])
+    if group == 'metricas' and columnar:
+        files.append(columnar_filename(CONVERSATIONS_STEM))
+    if channel_ids and len(channel_ids) > 1:
+        per_channel = EXECUTIVE_REPORT if group == 'ejecutivo' else METRICS_CSV
+        files.extend(channel_filename(per_channel, channel_id) for channel_id in channel_ids)
+    return [report_filename(name) for name in files]
+
+def generate_reports(analysis, collapse_templates=False, groups=None, columnar=False):
+    """Genera reportes descargables (solo los grupos de ARTIFACTS indicados, o todos).
+
+    Con columnar=True el detalle por sesión se escribe además en Parquet/npz,
+    siempre una fila por sesión aunque el CSV agrupe plantillas.
+    """
+    groups = groups or list(ARTIFACTS)
+    if 'metricas' in groups:
+        write_metrics_csvs(analysis, collapse_templates=collapse_templates)
+        if columnar:
+            write_conversations_columnar(analysis)
+    if 'ejecutivo' in groups:
+        return write_executive_report(analysis)
+
+def conversation_fields(multi_channel=False):
+    """Columnas del CSV de detalle; con varios canales cada fila lleva su canal"""
+    return CONVERSATION_FIELDS + ['channel_id'] if multi_channel else CONVERSATION_FIELDS
+
+def write_conversations_columnar(analysis):
+    columns = CONVERSATION_COLUMNS + [('channel_id', 'int')] if 'channels' in analysis else CONVERSATION_COLUMNS
+    return write_columnar(CONVERSATIONS_STEM, analysis['conversations_data'], columns)
+
+@METRICS.timed('csv_write')
+def write_metrics_csvs(analysis, include_conversations=True, collapse_templates=False):
+    """CSVs de detalle por sesión, emails capturados y métricas numéricas.
+
+    Con include_conversations=False el detalle por sesión no se escribe aquí
+    (el modo pipeline lo escribe en streaming mientras llegan las sesiones).
+    Con collapse_templates=True las sesiones de plantilla casi iguales salen en
+    una sola fila con su conteo; las métricas agregadas no cambian. Con varios
+    canales se escribe además chat_metricas_canal_<id>.csv por canal.
+    """
     
     # 1. CSV de todas las conversaciones
-    csv_path = os.path.join(OUTPUT_DIR, 'chat_conversaciones_detalle.csv')
-    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=[
-            'session_id', 'date', 'operator', 'country', 'active',
-            'num_messages', 'visitor_messages', 'intents', 'products', 'emails'
-        ])
-        writer.writeheader()
-        writer.writerows(analysis['conversations_data'])
-    print(f"  CSV conversaciones: {csv_path}")
+    if include_conversations:
+        csv_path = report_output_path(CONVERSATIONS_CSV)
+        rows = analysis['conversations_data']
+        fieldnames = conversation_fields('channels' in analysis)
+        if collapse_templates:
+            rows, grouped_sessions, groups = collapse_conversations(rows)
+            fieldnames = fieldnames + ['sesiones_en_grupo']
+            print(f"  Plantillas: {grouped_sessions} sesiones agrupadas en {groups} filas")
+        with open_report(csv_path, newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"  CSV conversaciones: {csv_path}")
     
     # 2. CSV de emails capturados
-    emails_path = os.path.join(OUTPUT_DIR, 'chat_emails_capturados.csv')
-    with open(emails_path, 'w', newline='', encoding='utf-8') as f:
+    emails_path = report_output_path('chat_emails_capturados.csv')
+    with open_report(emails_path, newline='') as f:
         writer = csv.writer(f)
         writer.writerow(['email'])
         for email in sorted(analysis['emails_captured']):
             writer.writerow([email])
     print(f"  CSV emails: {emails_path}")
     
-    # 3. CSV de métricas
-    metrics_path = os.path.join(OUTPUT_DIR, 'chat_metricas.csv')
-    with open(metrics_path, 'w', newline='', encoding='utf-8') as f:
+    # 3. CSV de métricas (combinado y por canal)
+    write_metrics_table(analysis, METRICS_CSV)
+    for channel_id, channel_analysis in analysis.get('channels', {}).items():
+        write_metrics_table(channel_analysis, channel_filename(METRICS_CSV, channel_id))
+    METRICS.add_items('csv_write', len(analysis['conversations_data']) + len(analysis['emails_captured']))
+
+def write_metrics_table(analysis, filename):
+    """CSV Métrica/Valor con totales y distribuciones"""
+    metrics_path = report_output_path(filename)
+    with open_report(metrics_path, newline='') as f:
         writer = csv.writer(f)
         writer.writerow(['Métrica', 'Valor'])
         writer.writerow(['Total Sesiones', analysis['total_sessions']])
@@ -278,17 +457,101 @@ def generate_reports(analysis):
         for k, v in analysis['products_mentioned'].items():
             writer.writerow([k, v])
     print(f"  CSV métricas: {metrics_path}")
+
+def write_trends_section(f, trends):
+    """Secciones 7.7 y 7.8: términos emergentes y visitantes/emails distintos (sketches)"""
+    f.write("### 7.7 Términos Emergentes\n")
+    if trends['week']:
+        f.write(f"Términos del visitante en la semana del {trends['week']} comparados con las "
+                f"{trends['baseline_weeks']} semanas previas (sesiones por semana, estimadas con count-min sketch). "
+                f"Se listan los que aparecen en al menos {EMERGING_MIN_SESSIONS} sesiones y crecen "
+                f"{EMERGING_MIN_GROWTH:.0f}x o más.\n\n")
+    if trends['emerging']:
+        f.write("| Término | Sesiones | Ritmo semanal | Semanas previas | Crecimiento | En patrones de producto |\n"
+                "|---|---|---|---|---|---|\n")
+        for r in trends['emerging']:
+            f.write(f"| {r['term']} | {r['sessions']} | {r['weekly_rate']:.1f} | {r['baseline_rate']:.1f} | "
+                    f"{r['growth']:.1f}x | {'sí' if r['known'] else '**no**'} |\n")
+        new_terms = [r['term'] for r in trends['emerging'] if not r['known']]
+        if new_terms:
+            f.write(f"\n- Términos que no cubre ningún patrón de producto: {', '.join(new_terms)}. "
+                    "Revisar si conviene agregarlos a `product_patterns`\n")
+        f.write("\n")
+    else:
+        f.write(f"- Sin términos emergentes (últimas {EMERGING_BASELINE_WEEKS + 1} semanas)\n\n")
+    if trends['top_terms']:
+        top = ', '.join(f"{term} ({count})" for term, count in trends['top_terms'])
+        f.write(f"**Términos más frecuentes de la semana:** {top}\n\n")
+    
+    f.write("### 7.8 Visitantes y Emails Distintos\n")
+    f.write(f"- **Visitantes distintos (estimado):** {trends['distinct_visitors']:,}\n")
+    f.write(f"- **Emails distintos (estimado):** {trends['distinct_emails']:,}\n\n")
+    if trends['recent_days']:
+        f.write("| Día | Visitantes | Emails |\n|---|---|---|\n")
+        for day_key, visitors, emails in trends['recent_days']:
+            f.write(f"| {day_key} | {visitors} | {emails} |\n")
+        f.write("\n")
+    f.write("*Conteos con HyperLogLog (error típico ~3%); se combinan entre corridas sin guardar los emails.*\n\n")
+
+def write_response_times_section(f, response_times):
+    """Sección 7.9: tiempos de respuesta del bot y operadores por hora (odoo_chat_timing)"""
+    def p(summary, name, q):
+        values = summary[name]
+        return format_duration(values[q] if values else None)
+    
+    f.write("### 7.9 Tiempos de Respuesta\n")
+    overall = response_times['overall']
+    if not overall['sessions']:
+        f.write("- Sin sesiones con mensajes del visitante\n\n")
+        return
+    f.write(f"- **Primera respuesta (bot u operador):** p50 {p(overall, 'first_response', 50)}, "
+            f"p90 {p(overall, 'first_response', 90)}, p95 {p(overall, 'first_response', 95)}\n")
+    f.write(f"- **Hasta un operador humano:** p50 {p(overall, 'time_to_human', 50)}, "
+            f"p90 {p(overall, 'time_to_human', 90)}, p95 {p(overall, 'time_to_human', 95)} "
+            f"({overall['human_rate']*100:.1f}% de las sesiones)\n")
+    f.write(f"- **Espera del visitante entre mensajes:** p50 {p(overall, 'wait_gaps', 50)}, "
+            f"p90 {p(overall, 'wait_gaps', 90)}, p95 {p(overall, 'wait_gaps', 95)}\n\n")
+    f.write("| Hora UTC (Tijuana) | Sesiones | 1ª respuesta p50 / p90 | Humano p50 / p90 | % humano | "
+            "Espera p50 / p90 | % abandono tras bot | % sin respuesta |\n"
+            "|---|---|---|---|---|---|---|---|\n")
+    for hour, summary in response_times['by_hour'].items():
+        f.write(f"| {hour:02d}:00 ({(hour - 8) % 24:02d}:00) | {summary['sessions']} | "
+                f"{p(summary, 'first_response', 50)} / {p(summary, 'first_response', 90)} | "
+                f"{p(summary, 'time_to_human', 50)} / {p(summary, 'time_to_human', 90)} | "
+                f"{summary['human_rate']*100:.0f}% | "
+                f"{p(summary, 'wait_gaps', 50)} / {p(summary, 'wait_gaps', 90)} | "
+                f"{summary['abandono_tras_bot']*100:.0f}% | {summary['sin_respuesta']*100:.0f}% |\n")
+    f.write("\n*Hora de inicio de la sesión. Solo sesiones en que el visitante escribió; "
+            "'abandono tras bot' = el último mensaje fue del bot. Percentiles por histograma: "
+            "exactos bajo 1 min, ±2.5% por encima.*\n\n")
+
+@METRICS.timed('markdown_write')
+def write_executive_report(analysis):
+    """Reporte ejecutivo en Markdown (combinado y, con varios canales, uno por canal)"""
+    report_path = write_executive_markdown(analysis, EXECUTIVE_REPORT)
+    for channel_id, channel_analysis in analysis.get('channels', {}).items():
+        write_executive_markdown(channel_analysis, channel_filename(EXECUTIVE_REPORT, channel_id),
+                                 channel_id=channel_id)
+    METRICS.add_items('markdown_write', 1 + len(analysis.get('channels', {})))
+    return report_path
+
+def write_executive_markdown(analysis, filename, channel_id=None):
+    """Un reporte ejecutivo; channel_id indica que el análisis es de un solo canal"""
     
     # 4. Reporte ejecutivo en Markdown
-    report_path = os.path.join(OUTPUT_DIR, 'REPORTE_EJECUTIVO_CHAT.md')
+    report_path = report_output_path(filename)
     
     total = analysis['total_sessions']
     intent_total = sum(analysis['intents'].values())
     
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write("# REPORTE EJECUTIVO - Análisis de Chat proconsa.online\n\n")
+    with open_report(report_path) as f:
+        title_suffix = f" (canal {channel_id})" if channel_id is not None else ""
+        f.write(f"# REPORTE EJECUTIVO - Análisis de Chat proconsa.online{title_suffix}\n\n")
         f.write(f"**Fecha de generación:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n")
         f.write(f"**Período analizado:** {min(analysis['sessions_by_month'].keys())} a {max(analysis['sessions_by_month'].keys())}\n\n")
+        if 'channels' in analysis:
+            channels = ', '.join(f"{cid} ({a['total_sessions']:,} sesiones)" for cid, a in analysis['channels'].items())
+            f.write(f"**Canales de livechat:** {channels}\n\n")
         f.write("---\n\n")
         
         # Resumen ejecutivo
@@ -385,13 +648,48 @@ def generate_reports(analysis):
         
         f.write("### 7.2 Demanda de Productos\n")
         f.write(f"- **Producto más consultado:** {top_product[0]} ({top_product[1]} menciones)\n")
-        f.write("- Los productos de construcción pesada (varilla, cemento, vigueta) dominan las consultas\n")
-        f.write("- Existe demanda cruzada: quienes piden varilla también preguntan por cemento y arena\n\n")
+        top_products = list(analysis['products_mentioned'])[:3]
+        if top_products:
+            f.write(f"- Las categorías más consultadas son: {', '.join(top_products)}\n")
+        f.write("\n")
+        
+        cross = analysis['cross_demand']
+        f.write("**Demanda cruzada (productos pedidos en la misma sesión):**\n\n")
+        if cross['product_pairs']:
+            f.write("| Quien pide | También pide | Sesiones | Soporte | Confianza | Lift |\n|---|---|---|---|---|---|\n")
+            for r in cross['product_pairs']:
+                f.write(f"| {r['a']} | {r['b']} | {r['sessions']} | {r['support']*100:.1f}% | "
+                        f"{r['confidence']*100:.1f}% | {r['lift']:.2f} |\n")
+            best = cross['product_pairs'][0]
+            f.write(f"\n- Quienes piden **{best['a']}** también preguntan por **{best['b']}** "
+                    f"en el {best['confidence']*100:.0f}% de los casos ({best['lift']:.1f}x lo esperado)\n\n")
+        else:
+            f.write(f"- No hay pares de productos con al menos {MIN_PAIR_SESSIONS} sesiones en común\n\n")
+        
+        f.write("**Intención × producto:**\n\n")
+        if cross['intent_product_pairs']:
+            f.write("| Intención | Producto | Sesiones | Soporte | Confianza | Lift |\n|---|---|---|---|---|---|\n")
+            for r in cross['intent_product_pairs']:
+                f.write(f"| {intent_labels.get(r['a'], r['a'])} | {r['b']} | {r['sessions']} | "
+                        f"{r['support']*100:.1f}% | {r['confidence']*100:.1f}% | {r['lift']:.2f} |\n")
+            f.write("\n")
+        else:
+            f.write(f"- No hay combinaciones con al menos {MIN_PAIR_SESSIONS} sesiones en común\n\n")
         
         f.write("### 7.3 Problemas Detectados\n")
         f.write(f"- **{problema_count} sesiones reportaron problemas con el sitio web**\n")
         f.write("- El chatbot (Mary Mejora) maneja la mayoría de conversaciones de forma automatizada\n")
-        f.write("- Cuando el bot no puede resolver, no hay operadores humanos disponibles frecuentemente\n\n")
+        overall = analysis['response_times']['overall']
+        if analysis['response_times']['untimed']:
+            # Replay desde exports: sin horas por mensaje no hay tasas de respuesta que mostrar
+            f.write("\n")
+        elif overall['sessions']:
+            f.write(f"- Un operador humano respondió en el **{overall['human_rate']*100:.1f}%** de las sesiones "
+                    f"en que escribió el visitante\n")
+            f.write(f"- **{overall['abandono_tras_bot']*100:.1f}%** terminan con el bot como último mensaje "
+                    f"y **{overall['sin_respuesta']*100:.1f}%** con el visitante sin respuesta\n\n")
+        else:
+            f.write("- Sin mensajes del visitante para medir respuestas del bot y operadores\n\n")
         
         f.write("### 7.4 Captura de Leads\n")
         f.write(f"- Se capturaron **{analysis['total_emails_captured']} emails únicos** de visitantes\n")
@@ -414,6 +712,10 @@ def generate_reports(analysis):
             f.write(f"- **{d}:** {c} sesiones ({c/max(total,1)*100:.1f}%)\n")
         f.write("\n")
         
+        write_trends_section(f, analysis['trends'])
+        if not analysis['response_times']['untimed']:
+            write_response_times_section(f, analysis['response_times'])
+        
         # Recomendaciones
         f.write("## 8. RECOMENDACIONES Y ACCIONES\n\n")
         
@@ -463,51 +765,151 @@ def generate_reports(analysis):
         f.write("y **optimizar el flujo del chatbot** para convertir más visitantes en clientes.\n\n")
         f.write("---\n\n")
         f.write("### Archivos generados:\n")
-        f.write(f"- `chat_conversaciones_detalle.csv` - Detalle de cada sesión\n")
+        f.write(f"- `chat_conversaciones_detalle.csv` - Detalle de cada sesión de los últimos días (`--detail-days`)\n")
         f.write(f"- `chat_emails_capturados.csv` - Lista de emails capturados\n")
         f.write(f"- `chat_metricas.csv` - Métricas numéricas\n")
         f.write(f"- `REPORTE_EJECUTIVO_CHAT.md` - Este reporte\n")
+        if 'channels' in analysis:
+            for cid in analysis['channels']:
+                f.write(f"- `{channel_filename(EXECUTIVE_REPORT, cid)}`, `{channel_filename(METRICS_CSV, cid)}` "
+                        f"- Reportes del canal {cid}\n")
     
     print(f"  Reporte ejecutivo: {report_path}")
     return report_path
 
 def main():
+    parser = argparse.ArgumentParser(description="Análisis de chat de proconsa.online")
+    parser.add_argument('--rebuild-aggregates', action='store_true',
+                        help="Ignora los parciales guardados y recalcula todo el historial")
+    parser.add_argument('--force', action='store_true',
+                        help="Regenera los reportes aunque sus entradas no hayan cambiado")
+    parser.add_argument('--collapse-templates', action='store_true',
+                        help="Agrupa en una fila del CSV de detalle las sesiones de plantilla casi iguales")
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help="Modo aproximado: clasifica una muestra de N sesiones estratificada por mes "
+                             "y reporta intenciones/productos con intervalos de confianza")
+    parser.add_argument('--seed', type=int, help="Semilla de la muestra (para repetir el mismo resultado)")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Escribe también el detalle por sesión en Parquet (pyarrow) o .npz (numpy) para BI")
+    parser.add_argument('--channels', type=parse_channel_ids, default=LIVECHAT_CHANNEL_IDS, metavar='IDS',
+                        help="Canales de livechat separados por coma; con varios se generan reportes por canal "
+                             f"además del combinado (default: {','.join(map(str, LIVECHAT_CHANNEL_IDS))})")
+    parser.add_argument('--metrics', metavar='PREFIJO',
+                        help="Escribe PREFIJO.json y PREFIJO.prom (textfile de node_exporter) con métricas por etapa")
+    parser.add_argument('--visitor-only', action='store_true',
+                        help="Descarga solo los textos del visitante: los filtros de autor y mensajes de sistema "
+                             "van en el dominio de mail.message (del bot y operadores solo autor y fecha)")
+    add_detail_argument(parser)
+    add_compress_argument(parser)
+    add_replay_arguments(parser)
+    odoo_profile.add_profile_argument(parser)
+    odoo_rpc.add_priority_argument(parser)
+    odoo_rpc.add_cache_argument(parser)
+    odoo_rpc.add_transport_argument(parser)
+    odoo_rpc.add_deadline_arguments(parser)
+    args = parser.parse_args()
+    odoo_rpc.set_transport(args.transport)
+    odoo_rpc.set_cache(args.rpc_cache)
+    odoo_rpc.set_call_timeout(args.rpc_timeout)
+    odoo_rpc.set_hedging(args.hedge)
+    odoo_rpc.set_deadline(args.deadline)
+    odoo_rpc.set_priority(args.priority)
+    odoo_profile.start(args.profile)
+    set_compression(args.compress)
+    if args.sample is not None and args.sample < 1:
+        parser.error("--sample debe ser mayor que 0")
+    if args.detail_days < 1:
+        parser.error("--detail-days debe ser mayor que 0")
+    if args.columnar and columnar_backend() is None:
+        parser.error("--columnar requiere pyarrow o numpy")
+    if args.compress == 'zstd' and zstd_module() is None:
+        parser.error("--compress zstd requiere Python 3.14 o el paquete zstandard")
+    if args.replay and (args.sample or args.snapshot):
+        parser.error("--replay no se combina con --sample ni --snapshot")
+    if args.visitor_only and (args.replay or args.sample or args.snapshot):
+        parser.error("--visitor-only no se combina con --replay, --sample ni --snapshot")
+    
     print("=" * 70)
     print("ANÁLISIS PROFUNDO DE CHAT - proconsa.online")
     print("=" * 70)
     
+    if args.replay:
+        # Sin Odoo: no hay huella de sesiones, así que el manifiesto no aplica
+        output_dir = redirect_output()
+        classified, _, _ = replay_and_classify(args.replay, channel_ids=args.channels)
+        print("\nAnalizando conversaciones...")
+        analysis = analyze_replay(classified, args.channels)
+        print("\nGenerando reportes...")
+        with report_batch():
+            generate_reports(analysis, collapse_templates=args.collapse_templates, columnar=args.columnar)
+        print(f"\nReplay completado. Archivos en: {output_dir}/")
+        if args.metrics:
+            print_summary(write_metrics(args.metrics, 'odoo_chat_analysis'))
+        return
+    
     uid, models = connect()
     
-    # 1. Obtener sesiones
-    sessions = get_all_sessions(uid, models)
+    if args.sample:
+        # Modo aproximado: no toca el almacén ni los reportes completos
+        result = run_sample(uid, models, args.sample, seed=args.seed, channel_ids=args.channels)
+        print_estimates(result)
+        print("\nGenerando reporte...")
+        write_sample_report(result)
+        if args.metrics:
+            print_summary(write_metrics(args.metrics, 'odoo_chat_analysis'))
+        return
     
-    # 2. Obtener todos los message_ids
-    all_msg_ids = set()
-    for s in sessions:
-        all_msg_ids.update(s['message_ids'])
-    print(f"\nTotal de mensajes a obtener: {len(all_msg_ids)}")
+    # 1. Huella de entradas: si ningún reporte cambió no hay nada que analizar
+    manifest = ReportManifest()
+    fingerprint = sessions_fingerprint(uid, models, channel_ids=args.channels)
+    detail_from = detail_start(days=args.detail_days)
+    inputs = {group: artifact_inputs(group, fingerprint, args.collapse_templates, args.columnar, args.channels,
+                                     detail_from)
+              for group in ARTIFACTS}
+    files = {group: artifact_files(group, args.columnar, args.channels) for group in ARTIFACTS}
+    stale = [group for group in ARTIFACTS
+             if args.force or not manifest.is_fresh(group, inputs[group], files[group])]
+    if not stale:
+        print(f"\nSin cambios desde la última corrida ({fingerprint['sessions']} sesiones, "
+              f"última modificación {fingerprint['max_write_date']}); no se regenera nada")
+        if args.metrics:
+            print_summary(write_metrics(args.metrics, 'odoo_chat_analysis'))
+        return
     
-    # 3. Obtener mensajes
-    print("Obteniendo mensajes...")
-    all_messages = get_messages_batch(uid, models, list(all_msg_ids))
-    print(f"Mensajes obtenidos: {len(all_messages)}")
+    # 2. Cargar parciales de días cerrados
+    store = load_aggregate_store(args.channels)
+    if args.rebuild_aggregates:
+        store['days'] = {}
     
-    # 4. Analizar
+    # 3. Obtener y clasificar solo las sesiones posteriores a lo ya resumido y las
+    #    de la ventana del detalle (un snapshot necesita el historial completo)
+    since = None if args.snapshot else stored_days_cutoff(store, detail_from)
+    classified, _ = fetch_and_classify(uid, models, since=since, channel_ids=args.channels,
+                                       snapshot=args.snapshot, visitor_only=args.visitor_only)
+    
+    # 4. Combinar con los parciales guardados
     print("\nAnalizando conversaciones...")
-    analysis = analyze_chats(sessions, all_messages)
+    analysis = analyze_with_store(classified, store, detail_from)
     
-    # 5. Generar reportes
-    print("\nGenerando reportes...")
-    report_path = generate_reports(analysis)
+    # 5. Generar solo los reportes cuyas entradas cambiaron
+    print(f"\nGenerando reportes: {', '.join(stale)}")
+    with report_batch():
+        generate_reports(analysis, collapse_templates=args.collapse_templates, groups=stale, columnar=args.columnar)
+    for group in stale:
+        manifest.record(group, inputs[group], files[group])
+    manifest.save()
     
     print("\n" + "=" * 70)
     print("ANÁLISIS COMPLETADO")
     print("=" * 70)
     print(f"\nArchivos generados en: {OUTPUT_DIR}/")
-    print(f"  - chat_conversaciones_detalle.csv")
-    print(f"  - chat_emails_capturados.csv")
-    print(f"  - chat_metricas.csv")
-    print(f"  - REPORTE_EJECUTIVO_CHAT.md")
+    print(f"  - {report_filename(CONVERSATIONS_CSV)}")
+    print(f"  - {report_filename('chat_emails_capturados.csv')}")
+    print(f"  - {report_filename(METRICS_CSV)}")
+    print(f"  - {EXECUTIVE_REPORT}")
+    
+    if args.metrics:
+        print_summary(write_metrics(args.metrics, 'odoo_chat_analysis'))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Exportación columnar del detalle de conversaciones y de los leads para BI.
+
+Con pyarrow se escribe Parquet; si no está instalado pero sí numpy, un .npz
+comprimido. Intenciones y productos se guardan como máscaras de bits (los bits
+de odoo_chat_cooccurrence) y las columnas de pocos valores distintos (operador,
+país, prioridad...) con codificación de diccionario, así un filtro por producto
+es una operación de bits sobre una columna entera, sin parsear texto.
+
+Distribución del .npz (leer con read_npz):
+    __columns__              'nombre:tipo' de cada columna, en orden
+    nombre                   enteros, flotantes, booleanos o datetime64[s]
+    nombre.codes/.categories columnas de diccionario
+    nombre.data/.offsets     texto libre: UTF-8 concatenado y offsets
+    nombre.bits              nombres de cada bit de una columna de máscara
+"""
+
+import json
+from datetime import datetime
+
+from odoo_chat_common import output_path
+from odoo_chat_cooccurrence import INTENT_BITS, PRODUCT_BITS
+from odoo_chat_output import staged_path
+from odoo_metrics import METRICS
+
+# Tipos: int, float, bool, datetime, category (diccionario), text, intents/products (máscara)
+CONVERSATION_COLUMNS = [
+    ('session_id', 'int'), ('date', 'datetime'), ('operator', 'category'), ('country', 'category'),
+    ('active', 'bool'), ('num_messages', 'int'), ('visitor_messages', 'text'),
+    ('intents', 'intents'), ('products', 'products'), ('emails', 'text'),
+]
+LEAD_COLUMNS = [
+    ('session_id', 'int'), ('fecha_chat', 'datetime'), ('dias_transcurridos', 'int'),
+    ('priority_num', 'int'), ('prioridad', 'category'), ('email', 'text'), ('nombre_odoo', 'text'),
+    ('telefono', 'text'), ('celular', 'text'), ('tipo_cliente', 'category'),
+    ('productos_solicitados', 'products'), ('intenciones', 'intents'),
+    ('sugerencia_abordaje', 'category'), ('resumen_visitante', 'text'),
+    ('ciudad', 'category'), ('estado', 'category'), ('empresa', 'text'), ('puesto', 'text'),
+    ('es_cliente_existente', 'bool'), ('ordenes_venta', 'int'), ('total_facturado', 'float'),
+    ('num_mensajes', 'int'),
+]
+
+CONVERSATIONS_STEM = 'chat_conversaciones_detalle'
+LEADS_STEM = 'LEADS_SEGUIMIENTO_MARKETING'
+
+MASK_BITS = {'intents': INTENT_BITS, 'products': PRODUCT_BITS}
+
+def columnar_backend():
+    """'parquet' con pyarrow, 'npz' con numpy, None si no hay ninguno"""
+    try:
+        import pyarrow  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        pass
+    try:
+        import numpy  # noqa: F401
+        return 'npz'
+    except ImportError:
+        return None
+
+def columnar_filename(stem):
+    """Nombre del archivo columnar según el backend disponible"""
+    return f"{stem}.{columnar_backend() or 'npz'}"
+
+def names_mask(value, bits):
+    """'a, b' -> máscara; etiquetas como 'sin_clasificar' o 'ninguno' no tienen bit"""
+    mask = 0
+    for name in (value or '').split(', '):
+        mask |= bits.get(name, 0)
+    return mask
+
+def _parse_datetime(value):
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S') if value else None
+
+def _text(value):
+    # Odoo devuelve False en campos vacíos
+    return value if isinstance(value, str) else ''
+
+def _column_values(rows, name, kind):
+    values = [row.get(name) for row in rows]
+    if kind in MASK_BITS:
+        return [names_mask(v, MASK_BITS[kind]) for v in values]
+    if kind == 'datetime':
+        return [_parse_datetime(v) for v in values]
+    if kind in ('text', 'category'):
+        return [_text(v) for v in values]
+    if kind == 'bool':
+        return [bool(v) for v in values]
+    if kind == 'float':
+        return [float(v or 0) for v in values]
+    return [int(v or 0) for v in values]
+
+def _bits_metadata(columns):
+    return {name: sorted(MASK_BITS[kind], key=MASK_BITS[kind].get) for name, kind in columns if kind in MASK_BITS}
+
+def _write_parquet(path, rows, columns):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(), 'datetime': pa.timestamp('s'),
+             'text': pa.string(), 'category': pa.string(), 'intents': pa.uint32(), 'products': pa.uint32()}
+    arrays = []
+    for name, kind in columns:
+        array = pa.array(_column_values(rows, name, kind), type=types[kind])
+        arrays.append(array.dictionary_encode() if kind == 'category' else array)
+    table = pa.Table.from_arrays(arrays, names=[name for name, _ in columns])
+    # Los nombres de cada bit viajan en los metadatos del esquema
+    table = table.replace_schema_metadata({'odoo_chat_bits': json.dumps(_bits_metadata(columns))})
+    pq.write_table(table, path, compression='zstd')
+
+def _write_npz(path, rows, columns):
+    import numpy as np
+
+    arrays = {'__columns__': np.array([f"{name}:{kind}" for name, kind in columns])}
+    bits = _bits_metadata(columns)
+    for name, kind in columns:
+        values = _column_values(rows, name, kind)
+        if kind == 'category':
+            categories = sorted(set(values))
+            index = {value: i for i, value in enumerate(categories)}
+            arrays[f'{name}.codes'] = np.array([index[v] for v in values], dtype=np.int32)
+            arrays[f'{name}.categories'] = np.array(categories, dtype=str)
+        elif kind == 'text':
+            encoded = [v.encode('utf-8') for v in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            arrays[f'{name}.data'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            arrays[f'{name}.offsets'] = offsets
+        elif kind in MASK_BITS:
+            arrays[name] = np.array(values, dtype=np.uint32)
+            arrays[f'{name}.bits'] = np.array(bits[name], dtype=str)
+        elif kind == 'datetime':
+            arrays[name] = np.array([v or 'NaT' for v in values], dtype='datetime64[s]')
+        else:
+            arrays[name] = np.array(values, dtype={'int': np.int64, 'float': np.float64, 'bool': np.bool_}[kind])
+    np.savez_compressed(path, **arrays)
+
+def read_npz(path):
+    """Carga un .npz de este módulo como {columna: arreglo o lista de textos}"""
+    import numpy as np
+
+    data = np.load(path)
+    columns = {}
+    for spec in data['__columns__']:
+        name, kind = str(spec).split(':')
+        if kind == 'category':
+            columns[name] = data[f'{name}.categories'][data[f'{name}.codes']]
+        elif kind == 'text':
+            raw, offsets = data[f'{name}.data'].tobytes(), data[f'{name}.offsets']
+            columns[name] = [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+        else:
+            columns[name] = data[name]
+            if kind in MASK_BITS:
+                columns[f'{name}.bits'] = [str(bit) for bit in data[f'{name}.bits']]
+    return columns
+
+@METRICS.timed('columnar_write')
+def write_columnar(stem, rows, columns):
+    """Escribe rows en OUTPUT_DIR/stem.parquet (o .npz); devuelve la ruta"""
+    backend = columnar_backend()
+    if backend is None:
+        raise Exception("La exportación columnar requiere pyarrow o numpy")
+    path = output_path(f"{stem}.{backend}")
+    with staged_path(path) as tmp_path:
+        (_write_parquet if backend == 'parquet' else _write_npz)(tmp_path, rows, columns)
+    METRICS.add_items('columnar_write', len(rows))
+    print(f"  Columnar ({backend}): {path}")
+    return path
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Funciones compartidas por los scripts de chat de proconsa.online:
+conexión a Odoo, descarga de sesiones/mensajes y clasificación de conversaciones.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from html.parser import HTMLParser
+
+import odoo_rpc
+from odoo_chat_timing import VISITOR, BOT, HUMAN, session_timings
+from odoo_metrics import METRICS
+
+OUTPUT_DIR = os.path.expanduser("~/Dev/wix-tasks/reports")
+
+STATE_DIR = os.path.expanduser("~/Dev/wix-tasks/state")
+
+# Canales de livechat (im_livechat.channel) analizados por defecto; --channels los cambia
+LIVECHAT_CHANNEL_IDS = [1]
+
+# Autores que son el bot u operadores internos (todo lo demás es el visitante)
+BOT_AUTHOR_IDS = [7, 8, 2]
+# De ellos, los que son el chatbot; el resto son operadores humanos (tiempos de respuesta)
+CHATBOT_AUTHOR_IDS = [7, 2]
+
+# Patrones
+email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+
+intent_patterns = {
+    'cotizacion_mayoreo': r'cotizaci[oó]n.*mayoreo|mayoreo|precio.*mayoreo',
+    'talleres_clinicas': r'taller|cl[ií]nica|capacitaci[oó]n|curso|inscrib',
+    'problema_sitio': r'problema.*sitio|no.*funciona|error|no.*carga|no.*puedo',
+    'solo_viendo': r'solo.*viendo|nada.*gracias|no.*gracias|solo.*mirando',
+    'busca_producto': r'busco|necesito|quiero|donde.*encuentro|tienen',
+    'precio': r'precio|costo|cu[aá]nto.*cuesta|cu[aá]nto.*vale',
+    'disponibilidad': r'disponib|hay.*en.*stock|tienen.*en.*existencia',
+    'envio': r'env[ií]o|entrega|domicilio|mandan',
+    'horario': r'horario|abren|cierran|hora',
+    'ubicacion': r'ubicaci[oó]n|direcci[oó]n|donde.*est[aá]n|sucursal',
+    'devolucion': r'devoluci[oó]n|cambio|garant[ií]a',
+    'factura': r'factura|facturaci[oó]n|cfdi|rfc',
+    'contratista': r'contratista|constructor|obra|proyecto',
+}
+
+product_patterns = {
+    'Varilla/Acero': r'varilla|acero|alambre|clavo|malla|solera|perfil.*met[aá]l',
+    'Cemento/Concreto': r'cemento|concreto|mortero|mezcla|block|tabique|tabic[oó]n',
+    'Pintura': r'pintura|rodillo|brocha|impermeabilizante|sellador|esmalte',
+    'Pisos/Loseta': r'piso|loseta|porcelanato|azulejo|cer[aá]mica|adocreto',
+    'Plomería': r'tubo|tuber[ií]a|v[aá]lvula|llave|conector|plomer[ií]a|tinaco',
+    'Electricidad': r'cable|el[eé]ctric|interruptor|contacto|l[aá]mpara|foco',
+    'Herramientas': r'herramienta|taladro|sierra|martillo|llave|desarmador',
+    'Madera': r'madera|triplay|plywood|tabla|poste|viga',
+    'Ferretería': r'tornillo|pija|ancla|bisagra|jaladera|chapa|cerradura',
+    'Impermeabilizante': r'impermeabilizante|impermeable|membrana|asfalto',
+    'Vigueta/Estructura': r'vigueta|bovedilla|castillo|armex|estructura',
+    'Arena/Grava': r'arena|grava|piedra|material.*p[eé]treo',
+}
+
+def patterns_fingerprint():
+    """Huella de los patrones; si cambia, los parciales guardados ya no son válidos"""
+    payload = json.dumps([intent_patterns, product_patterns, email_pattern], sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class HTMLStripper(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.result = []
+    def handle_data(self, d):
+        self.result.append(d)
+    def get_data(self):
+        return ''.join(self.result)
+
+def strip_html(html):
+    s = HTMLStripper()
+    s.feed(html or "")
+    return s.get_data().strip()
+
+# Los saludos del bot y los clics predefinidos se repiten en miles de sesiones:
+# con caché por texto, cada plantilla se limpia y clasifica una sola vez
+@lru_cache(maxsize=8192)
+def strip_body(html):
+    return strip_html(html)
+
+@lru_cache(maxsize=8192)
+def classify_visitor_text(text):
+    """(emails, intenciones, productos) de un mensaje del visitante, en el orden de los patrones"""
+    text_lower = text.lower()
+    return (
+        tuple(re.findall(email_pattern, text)),
+        tuple(intent for intent, pattern in intent_patterns.items() if re.search(pattern, text_lower)),
+        tuple(product for product, pattern in product_patterns.items() if re.search(pattern, text_lower)),
+    )
+
+def output_path(filename):
+    """Ruta en OUTPUT_DIR; el directorio se crea al escribir, no al importar"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return os.path.join(OUTPUT_DIR, filename)
+
+def connect():
+    uid, models = odoo_rpc.connect()
+    print(f"Conectado a Odoo. UID: {uid}")
+    return uid, models
+
+SESSION_FIELDS = ['name', 'create_date', 'livechat_operator_id', 'anonymous_name',
+                  'country_id', 'message_ids', 'livechat_active', 'livechat_channel_id']
+SESSION_PAGE_SIZE = 200
+
+MESSAGE_FIELDS = ['body', 'author_id', 'date', 'res_id', 'message_type']
+# Mensajes del bot y operadores en el modo solo visitante: sin 'body'
+MESSAGE_META_FIELDS = ['author_id', 'date', 'res_id', 'message_type']
+# Mensajes de sistema que classify_session descarta
+SYSTEM_MESSAGE_MARKERS = ['Reiniciando', 'abandonó']
+MESSAGE_BATCH_SIZE = 500
+
+def parse_channel_ids(value):
+    """Tipo de argparse para --channels: '1,3' -> [1, 3] (sin repetidos, ordenados)"""
+    try:
+        channel_ids = sorted({int(part) for part in value.split(',') if part.strip()})
+    except ValueError:
+        raise ValueError(f"canales inválidos: {value} (ids separados por coma)")
+    if not channel_ids:
+        raise ValueError("se necesita al menos un canal")
+    return channel_ids
+
+def session_domain(since=None, channel_ids=None):
+    """Dominio de discuss.channel para las sesiones de livechat.
+
+    `since` es YYYY-MM-DD (desde el inicio del día) o YYYY-MM-DD HH:MM:SS (UTC).
+    `channel_ids` son los canales de livechat (default: LIVECHAT_CHANNEL_IDS).
+    """
+    channel_ids = channel_ids or LIVECHAT_CHANNEL_IDS
+    if len(channel_ids) == 1:
+        domain = [['livechat_channel_id', '=', channel_ids[0]]]
+    else:
+        domain = [['livechat_channel_id', 'in', list(channel_ids)]]
+    if since:
+        domain.append(['create_date', '>=', since if len(since) > 10 else f'{since} 00:00:00'])
+    return domain
+
+def session_channel(session):
+    """Id del canal de livechat de una sesión"""
+    channel = session.get('livechat_channel_id')
+    return channel[0] if isinstance(channel, list) else channel
+
+@METRICS.timed('session_paging')
+def get_all_sessions(uid, models, since=None, channel_ids=None):
+    """Obtiene todas las sesiones de livechat (desde `since` YYYY-MM-DD si se indica).
+
+    Con varios canales cada uno se pagina en su propio hilo (con su propio proxy)
+    y las listas se intercalan por create_date.
+    """
+    print("Obteniendo sesiones de chat...")
+    channel_ids = channel_ids or LIVECHAT_CHANNEL_IDS
+    if len(channel_ids) == 1:
+        sessions = _page_sessions(uid, models, session_domain(since, channel_ids))
+    else:
+        def fetch_channel(channel_id):
+            return _page_sessions(uid, odoo_rpc.models_proxy(), session_domain(since, [channel_id]))
+
+        with ThreadPoolExecutor(max_workers=len(channel_ids)) as pool:
+            per_channel = list(pool.map(fetch_channel, channel_ids))
+        for channel_id, channel_sessions in zip(channel_ids, per_channel):
+            print(f"  Canal {channel_id}: {len(channel_sessions)} sesiones")
+        sessions = list(heapq.merge(*per_channel, key=lambda s: s['create_date']))
+    print(f"Total sesiones: {len(sessions)}")
+    METRICS.add_items('session_paging', len(sessions))
+    return sessions
+
+def _page_sessions(uid, models, domain):
+    sessions = []
+    offset = 0
+    batch = SESSION_PAGE_SIZE
+    while True:
+        chunk = models.execute_kw(
+            odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+            'discuss.channel', 'search_read',
+            [domain],
+            {'fields': SESSION_FIELDS,
+             'limit': batch, 'offset': offset, 'order': 'create_date asc'}
+        )
+        if not chunk:
+            break
+        sessions.extend(chunk)
+        offset += batch
+        print(f"  Sesiones obtenidas: {len(sessions)}")
+    return sessions
+
+@METRICS.timed('message_fetch')
+def get_messages_batch(uid, models, message_ids):
+    """Obtiene mensajes en lotes"""
+    all_msgs = []
+    batch = MESSAGE_BATCH_SIZE
+    for i in range(0, len(message_ids), batch):
+        chunk_ids = message_ids[i:i+batch]
+        msgs = models.execute_kw(
+            odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+            'mail.message', 'read',
+            [chunk_ids],
+            {'fields': MESSAGE_FIELDS}
+        )
+        all_msgs.extend(msgs)
+    METRICS.add_items('message_fetch', len(all_msgs))
+    return all_msgs
+
+@METRICS.timed('message_fetch')
+def get_visitor_messages(uid, models, message_ids):
+    """Como get_messages_batch, pero con cuerpo solo para los mensajes del visitante.
+
+    Los filtros de autor y de mensajes de sistema van en el dominio de
+    mail.message; los marcadores con `not like`, que distingue mayúsculas igual
+    que classify_session. Del bot y los operadores se traen solo autor y fecha
+    (para los tiempos de respuesta): sus textos largos no se descargan.
+
+    Diferencia con el modo completo: sin el texto no se sabe si un mensaje del
+    staff queda vacío al quitar el HTML. Se descartan los de cuerpo vacío, pero
+    uno con solo marcado (p. ej. '<p><br></p>') sí entra en la línea de tiempo,
+    y en el modo completo no.
+    """
+    not_system = [['body', 'not like', marker] for marker in SYSTEM_MESSAGE_MARKERS]
+    all_msgs = []
+    batch = MESSAGE_BATCH_SIZE
+    for i in range(0, len(message_ids), batch):
+        chunk_ids = message_ids[i:i+batch]
+        all_msgs.extend(models.execute_kw(
+            odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+            'mail.message', 'search_read',
+            [[['id', 'in', chunk_ids], '|', ['author_id', '=', False], ['author_id', 'not in', BOT_AUTHOR_IDS]]
+             + not_system],
+            {'fields': MESSAGE_FIELDS}
+        ))
+        all_msgs.extend(models.execute_kw(
+            odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+            'mail.message', 'search_read',
+            [[['id', 'in', chunk_ids], ['author_id', 'in', BOT_AUTHOR_IDS], ['body', '!=', False]] + not_system],
+            {'fields': MESSAGE_META_FIELDS}
+        ))
+    # Mismo orden de empate por fecha que get_messages_batch
+    all_msgs.sort(key=lambda m: m['id'])
+    METRICS.add_items('message_fetch', len(all_msgs))
+    return all_msgs
+
+def classify_session(session, msgs, num_messages=None):
+    """Clasifica una sesión: textos del visitante, emails, intenciones y productos.
+
+    `msgs` deben venir ordenados por fecha. El resultado es el insumo común de
+    todos los reportes, así cada mensaje se limpia y clasifica una sola vez.
+    Con mensajes de get_visitor_messages `num_messages` da el total de la sesión.
+    """
+    visitor_texts = []
+    bot_texts = []
+    session_emails = []
+    session_products = set()
+    session_intents = set()
+    full_conversation = []
+    timeline = ([], [])  # (fechas, clase de autor) de los mensajes con texto, para odoo_chat_timing
+    strip_wall = 0.0
+    strip_cpu = 0.0
+
+    for msg in msgs:
+        if 'body' not in msg:
+            # Bot u operador en el modo solo visitante: cuenta para los tiempos de respuesta
+            timeline[0].append(msg['date'])
+            timeline[1].append(BOT if msg['author_id'][0] in CHATBOT_AUTHOR_IDS else HUMAN)
+            continue
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        text = strip_body(msg['body'])
+        strip_wall += time.perf_counter() - wall0
+        strip_cpu += time.thread_time() - cpu0
+        if not text or any(marker in text for marker in SYSTEM_MESSAGE_MARKERS):
+            continue
+
+        is_visitor = msg['author_id'] == False or (isinstance(msg['author_id'], list) and msg['author_id'][0] not in BOT_AUTHOR_IDS)
+        timeline[0].append(msg['date'])
+        if is_visitor:
+            timeline[1].append(VISITOR)
+        else:
+            timeline[1].append(BOT if msg['author_id'][0] in CHATBOT_AUTHOR_IDS else HUMAN)
+
+        if is_visitor:
+            visitor_texts.append(text)
+
+            # Detectar emails, intenciones y productos
+            found_emails, found_intents, found_products = classify_visitor_text(text)
+            session_emails.extend(found_emails)
+            session_intents.update(found_intents)
+            session_products.update(found_products)
+
+            full_conversation.append(f"[Visitante]: {text}")
+        else:
+            bot_texts.append(text)
+            author_name = msg['author_id'][1] if isinstance(msg['author_id'], list) else 'Bot'
+            full_conversation.append(f"[{author_name}]: {text}")
+
+    # html_strip es una sub-etapa: su tiempo también está incluido en classification
+    METRICS.add_time('html_strip', strip_wall, strip_cpu, items=len(msgs))
+
+    return {
+        'session': session,
+        'channel_id': session_channel(session),
+        'create_dt': datetime.strptime(session['create_date'], '%Y-%m-%d %H:%M:%S'),
+        'num_messages': len(msgs) if num_messages is None else num_messages,
+        'visitor_texts': visitor_texts,
+        'bot_texts': bot_texts,
+        'emails': session_emails,
+        'intents': session_intents,
+        'products': session_products,
+        'full_conversation': full_conversation,
+        'timeline': None if session.get('untimed') else timeline,
+    }
+
+def classify_sessions(sessions, all_messages, message_counts=None):
+    """Agrupa mensajes por sesión y clasifica cada sesión (mismo orden que `sessions`).
+
+    `message_counts` ({session_id: total}) cuando `all_messages` no trae todos los mensajes.
+    """
+    msgs_by_session = defaultdict(list)
+    for m in all_messages:
+        msgs_by_session[m['res_id']].append(m)
+
+    with METRICS.stage('classification', items=len(sessions)):
+        classified = [
+            classify_session(session, sorted(msgs_by_session.get(session['id'], []), key=lambda x: x['date']),
+                             message_counts[session['id']] if message_counts else None)
+            for session in sessions
+        ]
+    with METRICS.stage('response_times', items=len(all_messages)):
+        return session_timings(classified)
+
+def fetch_and_classify(uid, models, since=None, channel_ids=None, snapshot=None, visitor_only=False):
+    """Descarga sesiones y mensajes una sola vez y los clasifica.
+
+    Con varios canales los mensajes y la clasificación se comparten: cada sesión
+    lleva su `channel_id`. Con `snapshot` los datos crudos se guardan además en
+    ese archivo para odoo_chat_replay. Con `visitor_only` solo se descargan los
+    textos del visitante (get_visitor_messages): sin bot_texts ni conversación
+    completa, así que no sirve para los leads ni para un snapshot. Devuelve
+    (sesiones clasificadas en orden cronológico, total de mensajes de las sesiones).
+    """
+    sessions = get_all_sessions(uid, models, since=since, channel_ids=channel_ids)
+
+    all_msg_ids = set()
+    for s in sessions:
+        all_msg_ids.update(s['message_ids'])
+    print(f"\nTotal de mensajes a obtener: {len(all_msg_ids)}")
+
+    if visitor_only:
+        print("Obteniendo mensajes del visitante (bot y operadores sin texto)...")
+        all_messages = get_visitor_messages(uid, models, list(all_msg_ids))
+        print(f"Mensajes obtenidos: {len(all_messages)}")
+        # El total por sesión ya viene en message_ids: no hace falta contar en Odoo
+        message_counts = {s['id']: len(s['message_ids']) for s in sessions}
+        print("\nClasificando conversaciones...")
+        return classify_sessions(sessions, all_messages, message_counts), len(all_msg_ids)
+
+    print("Obteniendo mensajes...")
+    all_messages = get_messages_batch(uid, models, list(all_msg_ids))
+    print(f"Mensajes obtenidos: {len(all_messages)}")
+    if snapshot:
+        from odoo_chat_replay import write_snapshot
+        write_snapshot(snapshot, sessions, all_messages, since, channel_ids)
+
+    print("\nClasificando conversaciones...")
+    return classify_sessions(sessions, all_messages), len(all_messages)
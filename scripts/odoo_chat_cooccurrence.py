@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Demanda cruzada: co-ocurrencia de productos (y de intención × producto) por sesión.
+
+Cada sesión se reduce a dos máscaras de bits (intenciones y productos). Los
+parciales diarios guardan solo el histograma de pares de máscaras distintas, así
+el historial completo se resume en unos cientos de enteros y cada par se cuenta
+con una prueba `mask & par == par` sobre ese histograma.
+"""
+
+from collections import Counter
+from itertools import combinations
+
+from odoo_chat_common import intent_patterns, product_patterns
+
+# Bits en orden alfabético: la huella de patrones del almacén cubre cualquier cambio
+PRODUCT_BITS = {name: 1 << i for i, name in enumerate(sorted(product_patterns))}
+INTENT_BITS = {name: 1 << i for i, name in enumerate(sorted(intent_patterns))}
+
+# Pares con menos sesiones no se reportan (el lift de conteos pequeños es ruido)
+MIN_PAIR_SESSIONS = 5
+TOP_PAIRS = 10
+
+def to_mask(names, bits):
+    mask = 0
+    for name in names:
+        mask |= bits[name]
+    return mask
+
+def combo_key(intents, products):
+    """Llave JSON del histograma diario: 'máscara_intenciones:máscara_productos'"""
+    return f"{to_mask(intents, INTENT_BITS)}:{to_mask(products, PRODUCT_BITS)}"
+
+def parse_combos(combos):
+    """Histograma {'i:p': n} -> Counter {(máscara_intenciones, máscara_productos): n}"""
+    parsed = Counter()
+    for key, count in combos.items():
+        intent_mask, product_mask = key.split(':')
+        parsed[(int(intent_mask), int(product_mask))] += count
+    return parsed
+
+def marginals(combos):
+    """Sesiones por intención y por producto (una prueba de bit por máscara distinta)"""
+    intent_counts = {name: sum(n for (i, _), n in combos.items() if i & bit) for name, bit in INTENT_BITS.items()}
+    product_counts = {name: sum(n for (_, p), n in combos.items() if p & bit) for name, bit in PRODUCT_BITS.items()}
+    return intent_counts, product_counts
+
+def _pair_row(a, b, both, count_a, count_b, total):
+    return {
+        'a': a,
+        'b': b,
+        'sessions': both,
+        'support': both / total,
+        'confidence': both / count_a,
+        'lift': both * total / (count_a * count_b),
+    }
+
+def _top(rows):
+    # Solo asociaciones positivas: lift <= 1 significa que no se piden juntos más de lo esperado
+    rows = [r for r in rows if r['lift'] > 1]
+    rows.sort(key=lambda r: (-r['lift'], -r['sessions'], r['a'], r['b']))
+    return rows[:TOP_PAIRS]
+
+def product_pairs(combos, total_sessions, product_counts):
+    """Pares de productos pedidos en la misma sesión, ordenados por lift"""
+    # Solo importan las máscaras con al menos dos productos
+    multi = Counter()
+    for (_, product_mask), n in combos.items():
+        if product_mask & (product_mask - 1):
+            multi[product_mask] += n
+
+    rows = []
+    for (a, bit_a), (b, bit_b) in combinations(sorted(PRODUCT_BITS.items()), 2):
+        pair = bit_a | bit_b
+        both = sum(n for m, n in multi.items() if m & pair == pair)
+        if both < MIN_PAIR_SESSIONS:
+            continue
+        # Se reporta en la dirección del producto más consultado (confianza de a -> b)
+        if product_counts[a] < product_counts[b]:
+            a, b = b, a
+        rows.append(_pair_row(a, b, both, product_counts[a], product_counts[b], total_sessions))
+    return _top(rows)
+
+def intent_product_pairs(combos, total_sessions, intent_counts, product_counts):
+    """Intención × producto en la misma sesión, ordenados por lift"""
+    rows = []
+    for intent, intent_bit in sorted(INTENT_BITS.items()):
+        if intent_counts[intent] < MIN_PAIR_SESSIONS:
+            continue
+        for product, product_bit in sorted(PRODUCT_BITS.items()):
+            both = sum(n for (i, p), n in combos.items() if i & intent_bit and p & product_bit)
+            if both < MIN_PAIR_SESSIONS:
+                continue
+            rows.append(_pair_row(intent, product, both, intent_counts[intent], product_counts[product],
+                                  total_sessions))
+    return _top(rows)
+
+def cross_demand(combos, total_sessions):
+    """Tablas de demanda cruzada a partir del histograma combinado de todos los días"""
+    if not total_sessions:
+        return {'product_pairs': [], 'intent_product_pairs': []}
+    intent_counts, product_counts = marginals(combos)
+    return {
+        'product_pairs': product_pairs(combos, total_sessions, product_counts),
+        'intent_product_pairs': intent_product_pairs(combos, total_sessions, intent_counts, product_counts),
+    }
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Detección de conversaciones casi duplicadas (sesiones de plantilla del bot).
+
+Muchas sesiones solo tienen el saludo del bot y un clic predefinido del visitante.
+Se agrupan con MinHash sobre shingles de caracteres del texto del visitante y
+LSH por bandas, así cada sesión nueva solo se compara con los grupos candidatos.
+"""
+
+import random
+import re
+import zlib
+
+from odoo_chat_common import email_pattern
+
+# Solo textos cortos y sin email se consideran plantilla; el resto son conversaciones reales
+TEMPLATE_MAX_CHARS = 160
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+NUM_BANDS = 16
+SIMILARITY_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+def normalize_text(text):
+    """Minúsculas, sin emails, dígitos ni puntuación y con espacios colapsados"""
+    text = re.sub(email_pattern, ' ', text.lower())
+    text = re.sub(r'[\d\W_]+', ' ', text)
+    return ' '.join(text.split())
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Conjunto de n-gramas de caracteres (el texto completo si es más corto)"""
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+class MinHasher:
+    """Firmas MinHash con permutaciones (a*x + b) mod p de semilla fija (reproducibles entre corridas)"""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(_MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+    def signature(self, items):
+        hashes = [zlib.crc32(item.encode('utf-8')) for item in items]
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self.params)
+
+def similarity(sig_a, sig_b):
+    """Estimación de Jaccard: fracción de posiciones iguales en las firmas"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+class TemplateClusters:
+    """Agrupa textos casi iguales; `assign()` devuelve el id del grupo.
+
+    Los textos idénticos (ya normalizados) se resuelven con un diccionario sin
+    calcular firma; los demás buscan candidatos en las bandas LSH y se unen al
+    grupo más parecido si supera `threshold`.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERM, bands=NUM_BANDS):
+        self.threshold = threshold
+        self.rows_per_band = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = []
+        self.sizes = []
+        self._by_text = {}
+
+    def _band_keys(self, sig):
+        r = self.rows_per_band
+        return [sig[i * r:(i + 1) * r] for i in range(len(self.buckets))]
+
+    def assign(self, text):
+        if text in self._by_text:
+            cluster_id = self._by_text[text]
+            self.sizes[cluster_id] += 1
+            return cluster_id
+
+        sig = self.hasher.signature(shingles(text))
+        keys = self._band_keys(sig)
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            candidates.update(bucket.get(key, ()))
+
+        best, best_sim = None, 0.0
+        for cluster_id in sorted(candidates):
+            sim = similarity(sig, self.signatures[cluster_id])
+            if sim > best_sim:
+                best, best_sim = cluster_id, sim
+
+        if best is not None and best_sim >= self.threshold:
+            cluster_id = best
+            self.sizes[cluster_id] += 1
+        else:
+            cluster_id = len(self.signatures)
+            self.signatures.append(sig)
+            self.sizes.append(1)
+            for bucket, key in zip(self.buckets, keys):
+                bucket.setdefault(key, []).append(cluster_id)
+        self._by_text[text] = cluster_id
+        return cluster_id
+
+def is_template_row(row):
+    """Fila de detalle candidata a plantilla: texto corto del visitante y sin email"""
+    return not row['emails'] and len(row['visitor_messages']) <= TEMPLATE_MAX_CHARS
+
+def collapse_conversations(rows, threshold=SIMILARITY_THRESHOLD):
+    """Junta las filas de plantilla casi iguales en una sola fila por grupo.
+
+    Cada fila resultante lleva `sesiones_en_grupo`; la fila del grupo es la de su
+    primera sesión. Devuelve (filas, sesiones agrupadas, grupos con más de una sesión).
+    """
+    clusters = TemplateClusters(threshold)
+    collapsed = []
+    group_rows = {}
+    for row in rows:
+        if not is_template_row(row):
+            collapsed.append(dict(row, sesiones_en_grupo=1))
+            continue
+        cluster_id = clusters.assign(normalize_text(row['visitor_messages']))
+        if cluster_id in group_rows:
+            group_rows[cluster_id]['sesiones_en_grupo'] += 1
+        else:
+            group_rows[cluster_id] = dict(row, sesiones_en_grupo=1)
+            collapsed.append(group_rows[cluster_id])
+
+    grouped = [size for size in clusters.sizes if size > 1]
+    return collapsed, sum(grouped), len(grouped)
@@ -4,109 +4,117 @@ Script para generar reporte de seguimiento de leads del chat proconsa.online.
 Extrae leads con email, cruza con Odoo, prioriza y genera reporte para marketing.
 """
 
-import xmlrpc.client
-import json
-import os
 import re
 import csv
-from collections import defaultdict
+import argparse
+import heapq
+import hashlib
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
-from html.parser import HTMLParser
-
-# Leer credenciales
-CONFIG_PATH = os.path.expanduser("~/Dev/mcp/mcp-odoo/odoo_config.json")
-with open(CONFIG_PATH) as f:
-    cfg = json.load(f)
-
-URL = cfg["url"]
-DB = cfg["db"]
-USERNAME = cfg["username"]
-PASSWORD = cfg["password"]
-
-OUTPUT_DIR = os.path.expanduser("~/Dev/wix-tasks/reports")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-NOW = datetime.utcnow()
-
-class HTMLStripper(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.result = []
-    def handle_data(self, d):
-        self.result.append(d)
-    def get_data(self):
-        return ''.join(self.result)
-
-def strip_html(html):
-    s = HTMLStripper()
-    s.feed(html or "")
-    return s.get_data().strip()
-
-def connect():
-    common = xmlrpc.client.ServerProxy(f"{URL}/xmlrpc/2/common")
-    uid = common.authenticate(DB, USERNAME, PASSWORD, {})
-    if not uid:
-        raise Exception("No se pudo autenticar")
-    models = xmlrpc.client.ServerProxy(f"{URL}/xmlrpc/2/object")
-    print(f"Conectado a Odoo. UID: {uid}")
-    return uid, models
-
-def get_all_sessions(uid, models):
-    print("Obteniendo sesiones de chat...")
-    sessions = []
-    offset = 0
-    batch = 200
-    while True:
-        chunk = models.execute_kw(
-            DB, uid, PASSWORD,
-            'discuss.channel', 'search_read',
-            [[['livechat_channel_id', '=', 1]]],
-            {'fields': ['name', 'create_date', 'livechat_operator_id', 'anonymous_name',
-                        'country_id', 'message_ids', 'livechat_active'],
-             'limit': batch, 'offset': offset, 'order': 'create_date desc'}
-        )
-        if not chunk:
-            break
-        sessions.extend(chunk)
-        offset += batch
-        print(f"  Sesiones: {len(sessions)}")
-    return sessions
-
-def get_messages_batch(uid, models, message_ids):
-    all_msgs = []
-    batch = 500
-    for i in range(0, len(message_ids), batch):
-        chunk_ids = message_ids[i:i+batch]
-        msgs = models.execute_kw(
-            DB, uid, PASSWORD,
-            'mail.message', 'read',
-            [chunk_ids],
-            {'fields': ['body', 'author_id', 'date', 'res_id', 'message_type']}
-        )
-        all_msgs.extend(msgs)
-    return all_msgs
 
+import odoo_rpc
+import odoo_profile
+from odoo_chat_common import (
+    OUTPUT_DIR, LIVECHAT_CHANNEL_IDS, connect, fetch_and_classify, parse_channel_ids,
+    patterns_fingerprint,
+)
+from odoo_chat_columnar import LEAD_COLUMNS, LEADS_STEM, columnar_backend, columnar_filename, write_columnar
+from odoo_chat_manifest import ReportManifest, models_fingerprint, sessions_fingerprint, source_fingerprint
+from odoo_chat_output import (
+    add_compress_argument, set_compression, zstd_module, report_filename, report_output_path, open_report, report_batch,
+)
+from odoo_chat_replay import add_replay_arguments, redirect_output, replay_and_classify, replay_enrichment
+from odoo_metrics import METRICS, write_metrics, print_summary
+
+# Archivos de cada grupo de reportes (ver odoo_chat_manifest)
+ARTIFACTS = {
+    'leads': ['LEADS_SEGUIMIENTO_MARKETING.csv', 'LEADS_CONVERSACIONES_COMPLETAS.csv',
+              'REPORTE_SEGUIMIENTO_MARKETING.md'],
+    'sin_email': ['LEADS_SIN_EMAIL_OPORTUNIDADES.csv'],
+}
+SOURCE_FILES = ['odoo_chat_leads_report.py', 'odoo_chat_common.py', 'odoo_chat_columnar.py', 'odoo_chat_output.py']
+
+PARTNER_FIELDS = ['name', 'email', 'phone', 'mobile', 'street', 'city', 'state_id', 'country_id', 'company_name',
+                  'function', 'category_id', 'comment', 'type', 'is_company']
+ENRICH_BATCH = 50  # Emails por búsqueda de res.partner
+# Modelos de los que sale el enriquecimiento: si cambian, los leads con email se regeneran
+ENRICHMENT_MODELS = ['res.partner', 'sale.order', 'account.move']
+# Facturas que suma res.partner.total_invoiced (account.invoice.report: sin borradores ni canceladas)
+INVOICED_DOMAIN = [('move_type', 'in', ['out_invoice', 'out_refund']), ('state', '=', 'posted')]
+
+def email_domain(emails):
+    """Dominio OR con un 'ilike' por email (la misma condición que la búsqueda de a uno)"""
+    return ['|'] * (len(emails) - 1) + [['email', 'ilike', email] for email in emails]
+
+def customer_value(uid, models, partner_ids):
+    """{partner_id: (órdenes de venta, total facturado)} con dos read_group en lugar de los campos calculados.
+
+    sale_order_count y total_invoiced de res.partner no están almacenados: Odoo
+    los calcula partner por partner. Aquí la base agrupa sale.order y account.move
+    por partner_id en una consulta cada uno. Como esos campos, cada partner suma
+    también lo de sus contactos hijos.
+    """
+    if not partner_ids:
+        return {}
+    family = models.execute_kw(
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+        'res.partner', 'search_read',
+        [[['id', 'child_of', partner_ids]]],
+        {'fields': ['parent_id'], 'context': {'active_test': False}}
+    )
+    parents = {p['id']: p['parent_id'][0] if p['parent_id'] else None for p in family}
+    family_ids = list(parents)
+    orders = models.execute_kw(
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+        'sale.order', 'read_group',
+        [[['partner_id', 'in', family_ids]], ['partner_id'], ['partner_id']],
+        {'lazy': False}
+    )
+    invoiced = models.execute_kw(
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+        'account.move', 'read_group',
+        [[['partner_id', 'in', family_ids]] + [list(term) for term in INVOICED_DOMAIN],
+         ['amount_untaxed_signed:sum'], ['partner_id']],
+        {'lazy': False}
+    )
+    
+    # Cada grupo se suma al partner y a sus ancestros que estén entre los buscados
+    wanted = set(partner_ids)
+    values = {pid: [0, 0.0] for pid in partner_ids}
+    def roll_up(partner_id, index, amount):
+        seen = set()
+        while partner_id is not None and partner_id not in seen:
+            seen.add(partner_id)
+            if partner_id in wanted:
+                values[partner_id][index] += amount
+            partner_id = parents.get(partner_id)
+    for group in orders:
+        if group['partner_id']:
+            roll_up(group['partner_id'][0], 0, group['__count'])
+    for group in invoiced:
+        if group['partner_id']:
+            roll_up(group['partner_id'][0], 1, group['amount_untaxed_signed'] or 0.0)
+    return {pid: tuple(v) for pid, v in values.items()}
+
+@METRICS.timed('enrichment')
 def enrich_from_odoo(uid, models, emails):
-    """Busca información adicional de los emails en res.partner"""
+    """Busca información adicional de los emails en res.partner (una búsqueda por lote de emails)"""
     print(f"Enriqueciendo {len(emails)} emails con datos de Odoo...")
     enriched = {}
-    batch = 50
     email_list = list(emails)
-    for i in range(0, len(email_list), batch):
-        chunk = email_list[i:i+batch]
+    for i in range(0, len(email_list), ENRICH_BATCH):
+        chunk = email_list[i:i+ENRICH_BATCH]
+        # Sin límite y en el orden del modelo: el primer partner que contiene el email
+        # es el mismo que daba search_read(limit=1) por email
+        partners = models.execute_kw(
+            odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+            'res.partner', 'search_read',
+            [email_domain(chunk)],
+            {'fields': PARTNER_FIELDS}
+        )
         for email in chunk:
-            partners = models.execute_kw(
-                DB, uid, PASSWORD,
-                'res.partner', 'search_read',
-                [[['email', 'ilike', email]]],
-                {'fields': ['name', 'email', 'phone', 'mobile', 'street', 'city',
-                            'state_id', 'country_id', 'company_name', 'function',
-                            'category_id', 'comment', 'type', 'is_company',
-                            'sale_order_count', 'total_invoiced'],
-                 'limit': 1}
-            )
-            if partners:
-                p = partners[0]
+            p = next((p for p in partners if email.lower() in (p.get('email') or '').lower()), None)
+            if p:
                 enriched[email.lower()] = {
                     'odoo_id': p['id'],
                     'name': p['name'],
@@ -119,49 +127,19 @@ def enrich_from_odoo(uid, models, emails):
                     'function': p.get('function') or '',
                     'is_company': p.get('is_company', False),
                     'categories': ', '.join([str(c) for c in p.get('category_id', [])]) if p.get('category_id') else '',
-                    'sale_orders': p.get('sale_order_count', 0),
-                    'total_invoiced': p.get('total_invoiced', 0),
                 }
             else:
                 enriched[email.lower()] = None
         if i % 100 == 0 and i > 0:
             print(f"  Procesados: {i}/{len(email_list)}")
+    
+    matched = [data for data in enriched.values() if data]
+    value = customer_value(uid, models, sorted({data['odoo_id'] for data in matched}))
+    for data in matched:
+        data['sale_orders'], data['total_invoiced'] = value[data['odoo_id']]
+    METRICS.add_items('enrichment', len(email_list))
     return enriched
 
-# Patrones
-email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-
-intent_patterns = {
-    'cotizacion_mayoreo': r'cotizaci[oó]n.*mayoreo|mayoreo|precio.*mayoreo',
-    'talleres_clinicas': r'taller|cl[ií]nica|capacitaci[oó]n|curso|inscrib',
-    'problema_sitio': r'problema.*sitio|no.*funciona|error|no.*carga|no.*puedo',
-    'solo_viendo': r'solo.*viendo|nada.*gracias|no.*gracias|solo.*mirando',
-    'busca_producto': r'busco|necesito|quiero|donde.*encuentro|tienen',
-    'precio': r'precio|costo|cu[aá]nto.*cuesta|cu[aá]nto.*vale',
-    'disponibilidad': r'disponib|hay.*en.*stock|tienen.*en.*existencia',
-    'envio': r'env[ií]o|entrega|domicilio|mandan',
-    'horario': r'horario|abren|cierran|hora',
-    'ubicacion': r'ubicaci[oó]n|direcci[oó]n|donde.*est[aá]n|sucursal',
-    'devolucion': r'devoluci[oó]n|cambio|garant[ií]a',
-    'factura': r'factura|facturaci[oó]n|cfdi|rfc',
-    'contratista': r'contratista|constructor|obra|proyecto',
-}
-
-product_patterns = {
-    'Varilla/Acero': r'varilla|acero|alambre|clavo|malla|solera|perfil.*met[aá]l',
-    'Cemento/Concreto': r'cemento|concreto|mortero|mezcla|block|tabique|tabic[oó]n',
-    'Pintura': r'pintura|rodillo|brocha|impermeabilizante|sellador|esmalte',
-    'Pisos/Loseta': r'piso|loseta|porcelanato|azulejo|cer[aá]mica|adocreto',
-    'Plomería': r'tubo|tuber[ií]a|v[aá]lvula|llave|conector|plomer[ií]a|tinaco',
-    'Electricidad': r'cable|el[eé]ctric|interruptor|contacto|l[aá]mpara|foco',
-    'Herramientas': r'herramienta|taladro|sierra|martillo|llave|desarmador',
-    'Madera': r'madera|triplay|plywood|tabla|poste|viga',
-    'Ferretería': r'tornillo|pija|ancla|bisagra|jaladera|chapa|cerradura',
-    'Impermeabilizante': r'impermeabilizante|impermeable|membrana|asfalto',
-    'Vigueta/Estructura': r'vigueta|bovedilla|castillo|armex|estructura',
-    'Arena/Grava': r'arena|grava|piedra|material.*p[eé]treo',
-}
-
 def classify_client_type(intents, products, visitor_texts_joined):
     """Clasifica el tipo de cliente potencial"""
     text = visitor_texts_joined.lower()
@@ -274,125 +252,162 @@ def suggest_approach(intents, products, client_type, visitor_texts):
     
     return ' | '.join(suggestions)
 
-def main():
-    print("=" * 70)
-    print("GENERACIÓN DE REPORTE DE SEGUIMIENTO DE LEADS")
-    print("=" * 70)
-    
-    uid, models = connect()
-    
-    # 1. Obtener sesiones
-    sessions = get_all_sessions(uid, models)
-    print(f"Total sesiones: {len(sessions)}")
-    
-    # 2. Obtener mensajes
-    all_msg_ids = set()
-    for s in sessions:
-        all_msg_ids.update(s['message_ids'])
-    print(f"Obteniendo {len(all_msg_ids)} mensajes...")
-    all_messages = get_messages_batch(uid, models, list(all_msg_ids))
-    print(f"Mensajes obtenidos: {len(all_messages)}")
-    
-    # Organizar mensajes por sesión
-    msgs_by_session = defaultdict(list)
-    for m in all_messages:
-        msgs_by_session[m['res_id']].append(m)
-    
-    # 3. Extraer leads con datos completos
-    print("\nExtrayendo leads de las conversaciones...")
+def scoring_fingerprint():
+    """Huella de las reglas y pesos de clasificación, prioridad y abordaje"""
+    import inspect  # solo lo necesita el manifiesto; cuesta ~10 ms al importar
+
+    source = ''.join(inspect.getsource(fn) for fn in (classify_client_type, calculate_priority, suggest_approach))
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+def artifact_inputs(group, fingerprint, now, since=None, top=None, columnar=False, channel_ids=None,
+                    enrichment=None):
+    """Entradas de las que depende un grupo de ARTIFACTS (para el manifiesto).
+
+    Incluye el día: los días transcurridos (y con ellos la prioridad) cambian
+    aunque no haya sesiones nuevas. Los leads con email incluyen además
+    `enrichment` (models_fingerprint de ENRICHMENT_MODELS): un partner, pedido o
+    factura modificado los regenera aunque las sesiones sean las mismas.
+    """
+    inputs = {
+        'sessions': fingerprint['digest'],
+        'patterns': patterns_fingerprint(),
+        'scoring': scoring_fingerprint(),
+        'version': source_fingerprint(*SOURCE_FILES),
+        'day': now.strftime('%Y-%m-%d'),
+        'since': since,
+        'top': top,
+    }
+    if channel_ids and len(channel_ids) > 1:
+        inputs['channels'] = channel_ids
+    if group == 'leads' and columnar:
+        inputs['columnar'] = columnar_backend()
+    if group == 'leads' and enrichment is not None:
+        inputs['enrichment'] = enrichment
+    return inputs
+
+def artifact_files(group, columnar=False):
+    """Archivos de un grupo (con la extensión de --compress), incluidos los leads en formato columnar si se pidió"""
+    files = [report_filename(name) for name in ARTIFACTS[group]]
+    if group == 'leads' and columnar:
+        files.append(columnar_filename(LEADS_STEM))
+    return files
+
+def lead_from_session(c, now=None):
+    """Lead (sin enriquecer) de una sesión clasificada, o None si el visitante no escribió.
+
+    `now` debe fijarse una vez por corrida para que todos los leads usen la misma referencia.
+    """
+    now = now or datetime.utcnow()
+    session = c['session']
+    sid = session['id']
+    days_ago = (now - c['create_dt']).days
+    
+    visitor_texts = c['visitor_texts']
+    session_emails = c['emails']
+    session_products = c['products']
+    session_intents = c['intents']
+    full_conversation = c['full_conversation']
+    num_messages = c['num_messages']
+    
+    # Solo incluir sesiones donde el visitante escribió algo
+    if not visitor_texts:
+        return None
+    
+    visitor_joined = ' '.join(visitor_texts)
+    client_type = classify_client_type(session_intents, session_products, visitor_joined)
+    has_email = len(session_emails) > 0
+    priority_num, priority_label = calculate_priority(
+        days_ago, has_email, session_intents, session_products, num_messages
+    )
+    approach = suggest_approach(session_intents, session_products, client_type, visitor_texts)
+    
+    primary_email = session_emails[0].lower().strip() if session_emails else ''
+    
+    return {
+        'session_id': sid,
+        'canal': c['channel_id'],
+        'fecha_chat': session['create_date'],
+        'dias_transcurridos': days_ago,
+        'priority_num': priority_num,
+        'prioridad': priority_label,
+        'email': primary_email,
+        'tipo_cliente': client_type,
+        'intenciones': ', '.join(sorted(session_intents)) if session_intents else 'sin_clasificar',
+        'productos_solicitados': ', '.join(sorted(session_products)) if session_products else 'No especificado',
+        'resumen_visitante': ' | '.join(visitor_texts[:6]),
+        'sugerencia_abordaje': approach,
+        'num_mensajes': num_messages,
+        'conversacion_completa': '\n'.join(full_conversation),
+        # Campos para enriquecer después
+        'nombre_odoo': '',
+        'telefono': '',
+        'celular': '',
+        'ciudad': '',
+        'estado': '',
+        'empresa': '',
+        'puesto': '',
+        'es_empresa': False,
+        'ordenes_venta': 0,
+        'total_facturado': 0,
+        'es_cliente_existente': False,
+    }
+
+def build_leads(classified, now=None):
+    """Convierte sesiones clasificadas en leads priorizados (sin enriquecer)"""
+    now = now or datetime.utcnow()
     leads = []
     all_lead_emails = set()
     
-    for session in sessions:
-        sid = session['id']
-        create_dt = datetime.strptime(session['create_date'], '%Y-%m-%d %H:%M:%S')
-        days_ago = (NOW - create_dt).days
-        
-        msgs = sorted(msgs_by_session.get(sid, []), key=lambda x: x['date'])
-        
-        visitor_texts = []
-        session_emails = []
-        session_products = set()
-        session_intents = set()
-        full_conversation = []
-        
-        for msg in msgs:
-            text = strip_html(msg['body'])
-            if not text or 'Reiniciando' in text or 'abandonó' in text:
-                continue
-            
-            is_visitor = msg['author_id'] == False or (isinstance(msg['author_id'], list) and msg['author_id'][0] not in [7, 8, 2])
-            
-            if is_visitor:
-                visitor_texts.append(text)
-                text_lower = text.lower()
-                
-                found_emails = re.findall(email_pattern, text)
-                session_emails.extend(found_emails)
-                
-                for intent, pattern in intent_patterns.items():
-                    if re.search(pattern, text_lower):
-                        session_intents.add(intent)
-                
-                for product, pattern in product_patterns.items():
-                    if re.search(pattern, text_lower):
-                        session_products.add(product)
-                
-                full_conversation.append(f"[Visitante]: {text}")
-            else:
-                author_name = msg['author_id'][1] if isinstance(msg['author_id'], list) else 'Bot'
-                full_conversation.append(f"[{author_name}]: {text}")
-        
-        # Solo incluir sesiones donde el visitante escribió algo
-        if not visitor_texts:
+    for c in classified:
+        lead = lead_from_session(c, now)
+        if lead is None:
             continue
-        
-        visitor_joined = ' '.join(visitor_texts)
-        client_type = classify_client_type(session_intents, session_products, visitor_joined)
-        has_email = len(session_emails) > 0
-        priority_num, priority_label = calculate_priority(
-            days_ago, has_email, session_intents, session_products, len(msgs)
-        )
-        approach = suggest_approach(session_intents, session_products, client_type, visitor_texts)
-        
-        primary_email = session_emails[0].lower().strip() if session_emails else ''
-        if primary_email:
-            all_lead_emails.add(primary_email)
-        
-        leads.append({
-            'session_id': sid,
-            'fecha_chat': session['create_date'],
-            'dias_transcurridos': days_ago,
-            'priority_num': priority_num,
-            'prioridad': priority_label,
-            'email': primary_email,
-            'tipo_cliente': client_type,
-            'intenciones': ', '.join(sorted(session_intents)) if session_intents else 'sin_clasificar',
-            'productos_solicitados': ', '.join(sorted(session_products)) if session_products else 'No especificado',
-            'resumen_visitante': ' | '.join(visitor_texts[:6]),
-            'sugerencia_abordaje': approach,
-            'num_mensajes': len(msgs),
-            'conversacion_completa': '\n'.join(full_conversation),
-            # Campos para enriquecer después
-            'nombre_odoo': '',
-            'telefono': '',
-            'celular': '',
-            'ciudad': '',
-            'estado': '',
-            'empresa': '',
-            'puesto': '',
-            'es_empresa': False,
-            'ordenes_venta': 0,
-            'total_facturado': 0,
-            'es_cliente_existente': False,
-        })
-    
-    print(f"Leads extraídos: {len(leads)}")
-    print(f"Leads con email: {len(all_lead_emails)}")
-    
-    # 4. Enriquecer con datos de Odoo
-    enriched = enrich_from_odoo(uid, models, all_lead_emails)
+        if lead['email']:
+            all_lead_emails.add(lead['email'])
+        leads.append(lead)
     
+    return leads, all_lead_emails
+
+class TopLeads:
+    """Conserva solo los N mejores leads con email y los N mejores sin email.
+
+    Recibe las sesiones en orden cronológico y mantiene un heap por grupo cuya
+    raíz es el peor lead conservado; el orden final es el mismo que daría
+    split_leads sobre todos los leads (prioridad, días y, a igualdad, el más reciente).
+    """
+
+    def __init__(self, limit, now=None):
+        self.limit = limit
+        self.now = now or datetime.utcnow()
+        self.seen = 0
+        self._heaps = {True: [], False: []}
+
+    def add(self, c):
+        lead = lead_from_session(c, self.now)
+        if lead is None:
+            return
+        self.seen += 1
+        # Clave invertida: en la raíz queda el de mayor (prioridad, días) y, a igualdad, el más antiguo
+        entry = (-lead['priority_num'], -lead['dias_transcurridos'], self.seen, lead)
+        heap = self._heaps[bool(lead['email'])]
+        if len(heap) < self.limit:
+            heapq.heappush(heap, entry)
+        elif entry[:3] > heap[0][:3]:
+            heapq.heapreplace(heap, entry)
+
+    def consume(self, classified):
+        for c in classified:
+            self.add(c)
+        return self
+
+    def leads(self):
+        """(leads, emails) del más reciente al más antiguo, listos para enriquecer"""
+        entries = sorted(self._heaps[True] + self._heaps[False], key=lambda e: e[2], reverse=True)
+        leads = [e[3] for e in entries]
+        return leads, {l['email'] for l in leads if l['email']}
+
+def apply_enrichment(leads, enriched):
+    """Copia a cada lead los datos encontrados en Odoo para su email"""
     for lead in leads:
         email = lead['email']
         if email and email in enriched and enriched[email]:
@@ -408,19 +423,54 @@ def main():
             lead['ordenes_venta'] = data['sale_orders']
             lead['total_facturado'] = data['total_invoiced']
             lead['es_cliente_existente'] = data['sale_orders'] > 0 or data['total_invoiced'] > 0
-    
-    # 5. Ordenar por prioridad y recencia
+
+def split_leads(leads):
+    """Ordena por prioridad y recencia y separa leads con y sin email"""
     leads.sort(key=lambda x: (x['priority_num'], x['dias_transcurridos']))
     
-    # Filtrar solo leads con email para el reporte principal
-    leads_with_email = [l for l in leads if l['email']]
-    leads_without_email = [l for l in leads if not l['email']]
-    
-    print(f"\nLeads con email (para seguimiento directo): {len(leads_with_email)}")
-    print(f"Leads sin email (para análisis): {len(leads_without_email)}")
+    # Separar en una sola pasada: con email va al reporte principal
+    leads_with_email = []
+    leads_without_email = []
+    for l in leads:
+        (leads_with_email if l['email'] else leads_without_email).append(l)
+    return leads_with_email, leads_without_email
+
+def lead_stats(leads_with_email):
+    """Conteos por prioridad y tipo, y clientes existentes vs. prospectos nuevos"""
+    priority_counts = defaultdict(int)
+    type_counts = defaultdict(int)
+    existing_clients = 0
+    new_prospects = 0
     
+    for l in leads_with_email:
+        priority_counts[l['prioridad']] += 1
+        type_counts[l['tipo_cliente']] += 1
+        if l['es_cliente_existente']:
+            existing_clients += 1
+        else:
+            new_prospects += 1
+    return priority_counts, type_counts, existing_clients, new_prospects
+
+def write_marketing_reports(leads_with_email, leads_without_email, now=None, columnar=False, by_channel=False):
+    """CSV de seguimiento, CSV de conversaciones completas y reporte Markdown para marketing.
+
+    Con columnar=True el seguimiento se escribe además en Parquet/npz para BI.
+    Con by_channel=True (varios canales) los CSVs llevan la columna 'canal' y
+    el reporte el conteo de leads por canal.
+    """
+    write_marketing_csvs(leads_with_email, by_channel)
+    if columnar:
+        write_columnar(LEADS_STEM, leads_with_email, LEAD_COLUMNS + [('canal', 'int')] if by_channel else LEAD_COLUMNS)
+    return write_marketing_markdown(leads_with_email, leads_without_email, now, by_channel)
+
+def channel_column(fields, by_channel):
+    """Agrega 'canal' a las columnas de un CSV de leads cuando se analizan varios canales"""
+    return fields + ['canal'] if by_channel else fields
+
+@METRICS.timed('csv_write')
+def write_marketing_csvs(leads_with_email, by_channel=False):
     # 6. Generar CSV principal de seguimiento
-    csv_path = os.path.join(OUTPUT_DIR, 'LEADS_SEGUIMIENTO_MARKETING.csv')
+    csv_path = report_output_path('LEADS_SEGUIMIENTO_MARKETING.csv')
     csv_fields = [
         'prioridad', 'fecha_chat', 'dias_transcurridos', 'email', 'nombre_odoo',
         'telefono', 'celular', 'tipo_cliente', 'productos_solicitados',
@@ -429,55 +479,38 @@ def main():
         'es_cliente_existente', 'ordenes_venta', 'total_facturado',
         'num_mensajes', 'session_id'
     ]
-    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+    csv_fields = channel_column(csv_fields, by_channel)
+    with open_report(csv_path, newline='') as f:
         writer = csv.DictWriter(f, fieldnames=csv_fields, extrasaction='ignore')
         writer.writeheader()
         writer.writerows(leads_with_email)
     print(f"CSV seguimiento: {csv_path}")
     
     # 7. CSV de conversaciones completas (para referencia)
-    conv_path = os.path.join(OUTPUT_DIR, 'LEADS_CONVERSACIONES_COMPLETAS.csv')
-    with open(conv_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=[
+    conv_path = report_output_path('LEADS_CONVERSACIONES_COMPLETAS.csv')
+    with open_report(conv_path, newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=channel_column([
             'prioridad', 'fecha_chat', 'email', 'nombre_odoo', 'tipo_cliente',
             'productos_solicitados', 'conversacion_completa'
-        ], extrasaction='ignore')
+        ], by_channel), extrasaction='ignore')
         writer.writeheader()
         writer.writerows(leads_with_email)
     print(f"CSV conversaciones: {conv_path}")
-    
-    # 8. CSV de leads sin email (oportunidades perdidas)
-    no_email_path = os.path.join(OUTPUT_DIR, 'LEADS_SIN_EMAIL_OPORTUNIDADES.csv')
-    with open(no_email_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=[
-            'prioridad', 'fecha_chat', 'dias_transcurridos', 'tipo_cliente',
-            'productos_solicitados', 'intenciones', 'resumen_visitante', 'num_mensajes'
-        ], extrasaction='ignore')
-        writer.writeheader()
-        writer.writerows([l for l in leads_without_email if l['priority_num'] <= 3])
-    print(f"CSV sin email: {no_email_path}")
-    
+    METRICS.add_items('csv_write', 2 * len(leads_with_email))
+
+@METRICS.timed('markdown_write')
+def write_marketing_markdown(leads_with_email, leads_without_email, now=None, by_channel=False):
     # 9. Generar reporte Markdown para marketing
-    report_path = os.path.join(OUTPUT_DIR, 'REPORTE_SEGUIMIENTO_MARKETING.md')
+    now = now or datetime.utcnow()
+    report_path = report_output_path('REPORTE_SEGUIMIENTO_MARKETING.md')
     
     # Estadísticas para el reporte
-    priority_counts = defaultdict(int)
-    type_counts = defaultdict(int)
-    existing_clients = 0
-    new_prospects = 0
-    
-    for l in leads_with_email:
-        priority_counts[l['prioridad']] += 1
-        type_counts[l['tipo_cliente']] += 1
-        if l['es_cliente_existente']:
-            existing_clients += 1
-        else:
-            new_prospects += 1
+    priority_counts, type_counts, existing_clients, new_prospects = lead_stats(leads_with_email)
     
-    with open(report_path, 'w', encoding='utf-8') as f:
+    with open_report(report_path) as f:
         f.write("# REPORTE DE SEGUIMIENTO DE LEADS - Equipo de Marketing\n")
         f.write(f"## Chat proconsa.online\n\n")
-        f.write(f"**Generado:** {NOW.strftime('%Y-%m-%d %H:%M')} UTC\n\n")
+        f.write(f"**Generado:** {now.strftime('%Y-%m-%d %H:%M')} UTC\n\n")
         f.write(f"**Período de datos:** Octubre 2025 - Febrero 2026\n\n")
         f.write("---\n\n")
         
@@ -490,7 +523,11 @@ def main():
         f.write(f"| Leads con email para seguimiento | **{len(leads_with_email)}** |\n")
         f.write(f"| Clientes existentes en Odoo | **{existing_clients}** |\n")
         f.write(f"| Prospectos nuevos | **{new_prospects}** |\n")
-        f.write(f"| Leads sin email (oportunidades perdidas) | **{len(leads_without_email)}** |\n\n")
+        f.write(f"| Leads sin email (oportunidades perdidas) | **{len(leads_without_email)}** |\n")
+        if by_channel:
+            for channel, count in sorted(Counter(l['canal'] for l in leads_with_email).items()):
+                f.write(f"| Leads con email del canal {channel} | **{count}** |\n")
+        f.write("\n")
         
         # Distribución por prioridad
         f.write("## DISTRIBUCIÓN POR PRIORIDAD\n\n")
@@ -648,6 +685,173 @@ def main():
         f.write("| `REPORTE_SEGUIMIENTO_MARKETING.md` | Este reporte | Guía de trabajo para el equipo |\n")
     
     print(f"Reporte marketing: {report_path}")
+    METRICS.add_items('markdown_write', 1)
+    return report_path
+
+@METRICS.timed('csv_write')
+def write_no_email_opportunities(leads_without_email, by_channel=False):
+    """CSV de sesiones sin email pero con intención de compra (prioridad 1-3)"""
+    # 8. CSV de leads sin email (oportunidades perdidas)
+    no_email_path = report_output_path('LEADS_SIN_EMAIL_OPORTUNIDADES.csv')
+    with open_report(no_email_path, newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=channel_column([
+            'prioridad', 'fecha_chat', 'dias_transcurridos', 'tipo_cliente',
+            'productos_solicitados', 'intenciones', 'resumen_visitante', 'num_mensajes'
+        ], by_channel), extrasaction='ignore')
+        writer.writeheader()
+        rows = [l for l in leads_without_email if l['priority_num'] <= 3]
+        writer.writerows(rows)
+    print(f"CSV sin email: {no_email_path}")
+    METRICS.add_items('csv_write', len(rows))
+    
+    return no_email_path
+
+def parse_day(value):
+    """Tipo de argparse para fechas YYYY-MM-DD"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida: {value} (formato YYYY-MM-DD)")
+
+def window_start(since=None, days=None, now=None):
+    """Primer día (YYYY-MM-DD) de la ventana a analizar, o None para todo el historial"""
+    if since:
+        return since
+    if days:
+        return ((now or datetime.utcnow()) - timedelta(days=days)).strftime('%Y-%m-%d')
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de seguimiento de leads del chat")
+    window = parser.add_mutually_exclusive_group()
+    window.add_argument('--since', type=parse_day, metavar='YYYY-MM-DD',
+                        help="Solo sesiones creadas desde esta fecha (filtra en Odoo)")
+    window.add_argument('--days', type=int, metavar='N',
+                        help="Solo sesiones de los últimos N días (filtra en Odoo)")
+    parser.add_argument('--top', type=int, metavar='N',
+                        help="Conserva solo los N mejores leads con email y los N mejores sin email")
+    parser.add_argument('--force', action='store_true',
+                        help="Regenera los reportes aunque sus entradas no hayan cambiado")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Escribe también los leads con email en Parquet (pyarrow) o .npz (numpy) para BI")
+    parser.add_argument('--channels', type=parse_channel_ids, default=LIVECHAT_CHANNEL_IDS, metavar='IDS',
+                        help="Canales de livechat separados por coma; con varios los CSVs llevan la columna 'canal' "
+                             f"(default: {','.join(map(str, LIVECHAT_CHANNEL_IDS))})")
+    parser.add_argument('--metrics', metavar='PREFIJO',
+                        help="Escribe PREFIJO.json y PREFIJO.prom (textfile de node_exporter) con métricas por etapa")
+    add_compress_argument(parser)
+    add_replay_arguments(parser)
+    odoo_profile.add_profile_argument(parser)
+    odoo_rpc.add_priority_argument(parser)
+    odoo_rpc.add_cache_argument(parser)
+    odoo_rpc.add_transport_argument(parser)
+    odoo_rpc.add_deadline_arguments(parser)
+    args = parser.parse_args()
+    odoo_rpc.set_transport(args.transport)
+    odoo_rpc.set_cache(args.rpc_cache)
+    odoo_rpc.set_call_timeout(args.rpc_timeout)
+    odoo_rpc.set_hedging(args.hedge)
+    odoo_rpc.set_deadline(args.deadline)
+    odoo_rpc.set_priority(args.priority)
+    odoo_profile.start(args.profile)
+    set_compression(args.compress)
+    if args.top is not None and args.top < 1:
+        parser.error("--top debe ser mayor que 0")
+    if args.days is not None and args.days < 1:
+        parser.error("--days debe ser mayor que 0")
+    if args.columnar and columnar_backend() is None:
+        parser.error("--columnar requiere pyarrow o numpy")
+    if args.compress == 'zstd' and zstd_module() is None:
+        parser.error("--compress zstd requiere Python 3.14 o el paquete zstandard")
+    if args.replay and args.snapshot:
+        parser.error("--replay no se combina con --snapshot")
+    
+    # Referencia única para días transcurridos y fecha del reporte
+    now = datetime.utcnow()
+    since = window_start(args.since, args.days, now)
+    
+    print("=" * 70)
+    print("GENERACIÓN DE REPORTE DE SEGUIMIENTO DE LEADS")
+    print("=" * 70)
+    if since and not args.replay:
+        print(f"Ventana: sesiones desde {since}")
+    
+    if args.replay:
+        # 1-2. Sin Odoo: sesiones del replay, con su fecha de descarga como referencia
+        output_dir = redirect_output()
+        classified, _, now = replay_and_classify(args.replay, channel_ids=args.channels)
+        since = window_start(args.since, args.days, now)
+        if since:
+            classified = [c for c in classified if c['session']['create_date'] >= since]
+            print(f"Ventana del replay: {len(classified)} sesiones desde {since}")
+        stale = list(ARTIFACTS)
+    else:
+        output_dir = OUTPUT_DIR
+        uid, models = connect()
+        
+        # Huella de entradas: si ningún reporte cambió no hay nada que hacer
+        manifest = ReportManifest()
+        fingerprint = sessions_fingerprint(uid, models, since, args.channels)
+        enrichment = models_fingerprint(uid, models, ENRICHMENT_MODELS)
+        inputs = {group: artifact_inputs(group, fingerprint, now, since, args.top, args.columnar, args.channels,
+                                         enrichment)
+                  for group in ARTIFACTS}
+        files = {group: artifact_files(group, args.columnar) for group in ARTIFACTS}
+        stale = [group for group in ARTIFACTS
+                 if args.force or not manifest.is_fresh(group, inputs[group], files[group])]
+        if not stale:
+            print(f"\nSin cambios desde la última corrida ({fingerprint['sessions']} sesiones, "
+                  f"última modificación {fingerprint['max_write_date']}); no se regenera nada")
+            if args.metrics:
+                print_summary(write_metrics(args.metrics, 'odoo_chat_leads_report'))
+            return
+        
+        # 1-2. Obtener y clasificar sesiones y mensajes
+        classified, _ = fetch_and_classify(uid, models, since=since, channel_ids=args.channels,
+                                           snapshot=args.snapshot)
+    
+    # 3. Extraer leads con datos completos (más recientes primero)
+    print("\nExtrayendo leads de las conversaciones...")
+    with METRICS.stage('lead_scoring', items=len(classified)):
+        if args.top:
+            top = TopLeads(args.top, now).consume(classified)
+            leads, all_lead_emails = top.leads()
+            print(f"Leads evaluados: {top.seen} (se conservan los {args.top} mejores por grupo)")
+        else:
+            leads, all_lead_emails = build_leads(reversed(classified), now)
+    
+    print(f"Leads extraídos: {len(leads)}")
+    print(f"Leads con email: {len(all_lead_emails)}")
+    
+    # 4. Enriquecer con datos de Odoo (solo el reporte con email los usa)
+    if 'leads' in stale:
+        if args.replay:
+            enriched = replay_enrichment(args.replay)
+        else:
+            enriched = enrich_from_odoo(uid, models, all_lead_emails)
+        apply_enrichment(leads, enriched)
+    
+    # 5. Ordenar por prioridad y recencia
+    leads_with_email, leads_without_email = split_leads(leads)
+    
+    print(f"\nLeads con email (para seguimiento directo): {len(leads_with_email)}")
+    print(f"Leads sin email (para análisis): {len(leads_without_email)}")
+    
+    by_channel = len(args.channels) > 1
+    
+    # 6-9. Generar CSVs y reporte (solo los grupos cuyas entradas cambiaron), publicados juntos
+    with report_batch():
+        if 'leads' in stale:
+            write_marketing_reports(leads_with_email, leads_without_email, now, columnar=args.columnar,
+                                    by_channel=by_channel)
+        if 'sin_email' in stale:
+            write_no_email_opportunities(leads_without_email, by_channel)
+    if not args.replay:
+        for group in stale:
+            manifest.record(group, inputs[group], files[group])
+        manifest.save()
+    
+    priority_counts, _, existing_clients, new_prospects = lead_stats(leads_with_email)
     
     # Resumen final
     print("\n" + "=" * 70)
@@ -661,7 +865,10 @@ def main():
     print(f"  ⚪ Prioridad MUY BAJA: {priority_counts.get('⚪ MUY BAJA', 0)}")
     print(f"\nClientes existentes: {existing_clients}")
     print(f"Prospectos nuevos:   {new_prospects}")
-    print(f"\nArchivos en: {OUTPUT_DIR}/")
+    print(f"\nArchivos en: {output_dir}/")
+    
+    if args.metrics:
+        print_summary(write_metrics(args.metrics, 'odoo_chat_leads_report'))
 
 if __name__ == "__main__":
     main()
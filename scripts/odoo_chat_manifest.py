@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Manifiesto de reportes generados: huella de las entradas de cada grupo de archivos.
+
+Antes de descargar nada se hace una búsqueda barata (id y write_date de las
+sesiones, y el último write_date de los modelos con que se enriquecen los leads). Si la huella de entradas de un grupo coincide con la guardada y sus
+archivos siguen en OUTPUT_DIR, ese grupo no se regenera; si ningún grupo cambió,
+la corrida termina sin análisis ni escritura.
+"""
+
+import hashlib
+import json
+import os
+
+import odoo_rpc
+from odoo_chat_common import OUTPUT_DIR, STATE_DIR, session_domain
+from odoo_metrics import METRICS
+
+MANIFEST_PATH = os.path.join(STATE_DIR, 'report_manifest.json')
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@METRICS.timed('fingerprint')
+def sessions_fingerprint(uid, models, since=None, channel_ids=None):
+    """Huella de las sesiones (ids y write_date) en una sola llamada sin mensajes"""
+    rows = models.execute_kw(
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+        'discuss.channel', 'search_read',
+        [session_domain(since, channel_ids)],
+        {'fields': ['write_date'], 'order': 'id asc'}
+    )
+    METRICS.add_items('fingerprint', len(rows))
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(f"{row['id']}:{row['write_date']}\n".encode('utf-8'))
+    return {
+        'sessions': len(rows),
+        'max_write_date': max((row['write_date'] for row in rows), default=None),
+        'digest': digest.hexdigest(),
+    }
+
+@METRICS.timed('fingerprint')
+def models_fingerprint(uid, models, model_names):
+    """Último write_date de cada modelo (un registro por modelo): cambia si se modificó cualquiera"""
+    latest = {}
+    for model in model_names:
+        rows = models.execute_kw(
+            odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+            model, 'search_read',
+            [[]],
+            {'fields': ['write_date'], 'order': 'write_date desc', 'limit': 1,
+             'context': {'active_test': False}}
+        )
+        latest[model] = rows[0]['write_date'] if rows else None
+    return latest
+
+def source_fingerprint(*filenames):
+    """Versión de los scripts: huella del código fuente de los archivos indicados (en scripts/)"""
+    digest = hashlib.sha1()
+    for name in filenames:
+        with open(os.path.join(SCRIPTS_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def inputs_digest(inputs):
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+class ReportManifest:
+    """Huella de entradas y archivos de cada grupo de reportes ya generado"""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.groups = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.groups = json.load(f).get('groups', {})
+
+    def is_fresh(self, group, inputs, files):
+        entry = self.groups.get(group)
+        # La lista de archivos cambia con --columnar o --compress (otro nombre, otro archivo)
+        return (entry is not None
+                and entry['inputs'] == inputs_digest(inputs)
+                and entry['files'] == list(files)
+                and all(os.path.exists(os.path.join(OUTPUT_DIR, name)) for name in files))
+
+    def record(self, group, inputs, files):
+        self.groups[group] = {'inputs': inputs_digest(inputs), 'files': list(files)}
+
+    def save(self):
+        """Escribe el manifiesto de forma atómica (archivo temporal + rename)"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'groups': self.groups}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Escritura de reportes en OUTPUT_DIR: temporal + rename, compresión opcional y lotes.
+
+Cada reporte se escribe en streaming a un temporal oculto del mismo directorio
+('.tmp-<pid>-<nombre>') y solo se renombra al nombre final cuando se cerró sin
+errores: un proceso que se cae a la mitad nunca deja un CSV cortado donde el
+scheduler lo adjunta.
+
+Dentro de `with report_batch():` los renombres se posponen hasta el final del
+bloque y se hacen todos juntos (tras fsync de cada temporal); si algo falla se
+borran los temporales y quedan los reportes de la corrida anterior. Así los CSVs
+y el Markdown de una corrida siempre corresponden a los mismos datos.
+
+Con --compress gzip|zstd los CSVs se escriben comprimidos ('.csv.gz' /
+'.csv.zst'); el Markdown queda en texto. zstd usa compression.zstd (Python 3.14)
+o el paquete zstandard.
+"""
+
+import gzip
+import io
+import os
+from contextlib import contextmanager, suppress
+
+import odoo_chat_common
+
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+COMPRESSED_EXTENSIONS = ('.csv',)  # Los reportes que se comprimen con --compress
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+WRITE_BUFFER = 1 << 20
+
+_compression = None
+_batches = []  # pilas de [(temporal, final)] de los report_batch() abiertos
+
+def add_compress_argument(parser):
+    parser.add_argument('--compress', choices=sorted(COMPRESSIONS),
+                        help="Escribe los CSVs comprimidos (.csv.gz / .csv.zst); el Markdown queda en texto")
+
+def zstd_module():
+    """compression.zstd (3.14+) o zstandard; None si no hay ninguno"""
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+def set_compression(compression):
+    """Compresión de los CSVs de esta corrida (None, 'gzip' o 'zstd')"""
+    global _compression
+    _compression = compression
+
+def report_filename(filename):
+    """Nombre final de un reporte: 'x.csv' -> 'x.csv.gz' con --compress gzip"""
+    if _compression and filename.endswith(COMPRESSED_EXTENSIONS):
+        return filename + COMPRESSIONS[_compression]
+    return filename
+
+def report_output_path(filename):
+    """Ruta final en OUTPUT_DIR de un reporte (con la extensión de compresión si aplica)"""
+    return odoo_chat_common.output_path(report_filename(filename))
+
+def _temp_path(path):
+    # Mismo directorio (rename atómico) y misma extensión (np.savez la agrega si falta)
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".tmp-{os.getpid()}-{name}")
+
+def _compression_of(path):
+    for compression, suffix in COMPRESSIONS.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _commit(pairs):
+    for tmp_path, _ in pairs:
+        _fsync(tmp_path)
+    for tmp_path, path in pairs:
+        os.replace(tmp_path, path)
+
+def _discard(pairs):
+    for tmp_path, _ in pairs:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _finish(tmp_path, path):
+    """Publica un temporal ya cerrado, o lo deja pendiente si hay un lote abierto"""
+    if _batches:
+        _batches[-1].append((tmp_path, path))
+    else:
+        _commit([(tmp_path, path)])
+
+@contextmanager
+def report_batch():
+    """Los reportes escritos dentro del bloque se publican juntos al salir sin errores"""
+    pairs = []
+    _batches.append(pairs)
+    try:
+        yield
+    except BaseException:
+        _batches.pop()
+        _discard(pairs)
+        raise
+    _batches.pop()
+    if _batches:
+        _batches[-1].extend(pairs)  # lote anidado: se publica con el exterior
+    else:
+        _commit(pairs)
+
+def _open_compressed(raw, compression):
+    """Flujo binario que comprime hacia `raw` (sin cerrarlo)"""
+    if compression == 'gzip':
+        # Sin nombre ni fecha en la cabecera: el mismo contenido da el mismo archivo
+        return gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0)
+    zstd = zstd_module()
+    if hasattr(zstd, 'ZstdFile'):
+        return zstd.ZstdFile(raw, 'wb', level=ZSTD_LEVEL)
+    return zstd.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+
+@contextmanager
+def open_report(path, newline=None):
+    """Archivo de texto UTF-8 para escribir un reporte en `path` (de report_output_path).
+
+    La compresión sale de la extensión. Se escribe en un temporal que se
+    publica al cerrar (o al terminar el report_batch() abierto); si el bloque
+    falla, el temporal se borra y el reporte anterior queda intacto.
+    """
+    tmp_path = _temp_path(path)
+    compression = _compression_of(path)
+    raw = f = None
+    written = False
+    try:
+        raw = open(tmp_path, 'wb', buffering=WRITE_BUFFER)
+        stream = _open_compressed(raw, compression) if compression else raw
+        f = io.TextIOWrapper(stream, encoding='utf-8', newline=newline)
+        yield f
+        f.close()  # también cierra el compresor; raw queda abierto
+        raw.close()
+        written = True
+    finally:
+        if not written:
+            # Se propaga el error original aunque cerrar también falle (disco lleno al vaciar el compresor)
+            for handle in (f, raw):
+                if handle is not None and not handle.closed:
+                    with suppress(Exception):
+                        handle.close()
+            _discard([(tmp_path, path)])
+    _finish(tmp_path, path)
+
+@contextmanager
+def staged_path(path):
+    """Ruta temporal para bibliotecas que escriben por nombre (Parquet, npz); se publica igual que open_report"""
+    tmp_path = _temp_path(path)
+    try:
+        yield tmp_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _finish(tmp_path, path)
+
+def find_report(directory, filename):
+    """Ruta existente de un reporte en `directory`: sin comprimir, .gz o .zst; None si no está"""
+    for suffix in ('', *COMPRESSIONS.values()):
+        path = os.path.join(directory, filename + suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+def read_report(path, newline=None):
+    """Abre un reporte para leer como texto, descomprimiendo según la extensión"""
+    compression = _compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8', newline=newline)
+    if compression == 'zstd':
+        zstd = zstd_module()
+        if zstd is None:
+            raise Exception(f"Leer {path} requiere Python 3.14 o el paquete zstandard")
+        return zstd.open(path, 'rt', encoding='utf-8', newline=newline)
+    return open(path, encoding='utf-8', newline=newline, buffering=WRITE_BUFFER)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Modo pipeline para los reportes de chat: descarga y clasificación solapadas.
+
+Hilos descargadores traen páginas de sesiones con sus mensajes, hilos analizadores
+las clasifican conforme llegan y el consumidor las recibe en orden cronológico.
+Un semáforo limita las páginas en vuelo (contrapresión), así los mensajes crudos
+en memoria quedan acotados a unas cuantas páginas sin importar el tamaño del
+historial. Lo que el consumidor conserva de cada sesión ya clasificada (ver
+ChatDataset en odoo_chat_reports) sí crece con el historial.
+"""
+
+import csv
+import queue
+import threading
+
+import odoo_rpc
+from odoo_chat_common import (
+    SESSION_FIELDS, SESSION_PAGE_SIZE,
+    session_domain, get_messages_batch, classify_sessions,
+)
+from odoo_chat_output import open_report
+from odoo_metrics import METRICS
+
+_DONE = object()
+
+class ChatPipeline:
+    """Iterable de sesiones clasificadas (orden create_date asc) con descarga en paralelo"""
+
+    def __init__(self, uid, since=None, fetchers=4, analyzers=2, max_pages_in_flight=8, channel_ids=None):
+        self.uid = uid
+        self.since = since
+        self.channel_ids = channel_ids
+        self.fetchers = max(1, fetchers)
+        self.analyzers = max(1, analyzers)
+        self.max_pages_in_flight = max(1, max_pages_in_flight)
+        self.total_sessions = 0
+        self.total_messages = 0
+        self._error = None
+
+    def _count_sessions(self):
+        models = odoo_rpc.models_proxy()
+        return models.execute_kw(
+            odoo_rpc.DB, self.uid, odoo_rpc.PASSWORD,
+            'discuss.channel', 'search_count',
+            [session_domain(self.since, self.channel_ids)]
+        )
+
+    def _fail(self, exc, results):
+        if self._error is None:
+            self._error = exc
+        results.put(_DONE)
+
+    def _dispatch(self, num_pages, in_flight, pages):
+        # El semáforo se libera cuando el consumidor termina de usar la página
+        for page in range(num_pages):
+            in_flight.acquire()
+            pages.put(page)
+        for _ in range(self.fetchers):
+            pages.put(_DONE)
+
+    def _fetch(self, pages, fetched, results):
+        models = odoo_rpc.models_proxy()
+        domain = session_domain(self.since, self.channel_ids)
+        try:
+            while True:
+                page = pages.get()
+                if page is _DONE:
+                    break
+                with METRICS.stage('session_paging'):
+                    sessions = models.execute_kw(
+                        odoo_rpc.DB, self.uid, odoo_rpc.PASSWORD,
+                        'discuss.channel', 'search_read',
+                        [domain],
+                        {'fields': SESSION_FIELDS, 'limit': SESSION_PAGE_SIZE,
+                         'offset': page * SESSION_PAGE_SIZE, 'order': 'create_date asc'}
+                    )
+                METRICS.add_items('session_paging', len(sessions))
+                message_ids = sorted({mid for s in sessions for mid in s['message_ids']})
+                messages = get_messages_batch(self.uid, models, message_ids)
+                fetched.put((page, sessions, messages))
+        except Exception as exc:
+            self._fail(exc, results)
+
+    def _analyze(self, fetched, results):
+        try:
+            while True:
+                item = fetched.get()
+                if item is _DONE:
+                    break
+                page, sessions, messages = item
+                results.put((page, classify_sessions(sessions, messages), len(messages)))
+        except Exception as exc:
+            self._fail(exc, results)
+
+    def __iter__(self):
+        total = self._count_sessions()
+        num_pages = (total + SESSION_PAGE_SIZE - 1) // SESSION_PAGE_SIZE
+        print(f"Pipeline: {total} sesiones en {num_pages} páginas "
+              f"({self.fetchers} descargadores, {self.analyzers} analizadores)")
+
+        in_flight = threading.Semaphore(self.max_pages_in_flight)
+        pages = queue.Queue()
+        fetched = queue.Queue(maxsize=self.max_pages_in_flight)
+        results = queue.Queue()
+
+        threading.Thread(target=self._dispatch, args=(num_pages, in_flight, pages), daemon=True).start()
+        fetch_threads = [threading.Thread(target=self._fetch, args=(pages, fetched, results), daemon=True)
+                         for _ in range(self.fetchers)]
+        analyze_threads = [threading.Thread(target=self._analyze, args=(fetched, results), daemon=True)
+                           for _ in range(self.analyzers)]
+        for t in fetch_threads + analyze_threads:
+            t.start()
+
+        # Reordenar páginas: los hilos terminan en cualquier orden
+        pending = {}
+        next_page = 0
+        while next_page < num_pages:
+            item = results.get()
+            if item is _DONE:
+                raise self._error
+            page, classified, num_messages = item
+            pending[page] = (classified, num_messages)
+            while next_page in pending:
+                classified, num_messages = pending.pop(next_page)
+                self.total_sessions += len(classified)
+                self.total_messages += num_messages
+                yield from classified
+                in_flight.release()
+                next_page += 1
+                if next_page % 10 == 0 or next_page == num_pages:
+                    print(f"  Páginas procesadas: {next_page}/{num_pages} ({self.total_sessions} sesiones)")
+
+        for t in fetch_threads:
+            t.join()
+        for _ in analyze_threads:
+            fetched.put(_DONE)
+        for t in analyze_threads:
+            t.join()
+
+class StreamingCsvWriter:
+    """Etapa escritora: un hilo escribe filas CSV desde una cola acotada.
+
+    `write()` se bloquea si la cola está llena, lo que frena a quien produce las filas.
+    El archivo se publica (odoo_chat_output) solo si close() termina sin errores.
+    """
+
+    def __init__(self, path, fieldnames, maxsize=1000):
+        self.path = path
+        self.rows = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._report = open_report(path, newline='')
+        self._file = self._report.__enter__()
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        self._writer.writeheader()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            row = self._queue.get()
+            if row is _DONE:
+                break
+            if self._error is not None:
+                continue
+            try:
+                with METRICS.stage('csv_write', items=1):
+                    self._writer.writerow(row)
+            except Exception as exc:
+                self._error = exc
+
+    def write(self, row):
+        self.rows += 1
+        self._queue.put(row)
+
+    def close(self, exc=None):
+        """Termina de escribir; con `exc` (o si falló una fila) el archivo se descarta"""
+        self._queue.put(_DONE)
+        self._thread.join()
+        error = exc or self._error
+        if error is None:
+            self._report.__exit__(None, None, None)
+        else:
+            self._report.__exit__(type(error), error, error.__traceback__)
+        if self._error is not None:
+            raise self._error
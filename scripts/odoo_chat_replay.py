@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Modo --replay de los scripts de chat: analizar sin Odoo.
+
+Fuentes de datos:
+    snapshot    PATH.jsonl.gz que escribe la etapa de descarga con --snapshot:
+                sesiones y mensajes crudos tal como los devolvió Odoo. El replay
+                reproduce exactamente la corrida original.
+    directorio  reportes ya exportados (chat_conversaciones_detalle.csv y, si
+                están, LEADS_SEGUIMIENTO_MARKETING.csv / LEADS_CONVERSACIONES_COMPLETAS.csv;
+                también comprimidos con --compress).
+                Los mensajes se reconstruyen desde el texto: conversación completa
+                para los leads con email, los primeros 5 textos del visitante para
+                el resto. Es aproximado, pero alcanza para probar patrones y pesos.
+
+En ambos casos las sesiones pasan por la misma clasificación (classify_sessions)
+y los mismos análisis y puntajes que una corrida contra Odoo. Los reportes se
+escriben en REPLAY_OUTPUT_DIR para no pisar los reales, y el enriquecimiento de
+leads sale de LEADS_SEGUIMIENTO_MARKETING.csv en lugar de res.partner.
+"""
+
+import csv
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+from html import escape
+
+import odoo_chat_common
+from odoo_chat_common import OUTPUT_DIR, BOT_AUTHOR_IDS, LIVECHAT_CHANNEL_IDS, session_channel, classify_sessions
+from odoo_chat_output import find_report, read_report
+from odoo_metrics import METRICS
+
+REPLAY_OUTPUT_DIR = os.path.expanduser(os.environ.get('ODOO_REPLAY_OUTPUT_DIR', os.path.join(OUTPUT_DIR, 'replay')))
+SNAPSHOT_VERSION = 1
+
+CONVERSATIONS_EXPORT = 'chat_conversaciones_detalle.csv'
+LEADS_EXPORT = 'LEADS_SEGUIMIENTO_MARKETING.csv'
+LEAD_CONVERSATIONS_EXPORT = 'LEADS_CONVERSACIONES_COMPLETAS.csv'
+
+VISITOR_LABEL = 'Visitante'
+
+def add_replay_arguments(parser):
+    parser.add_argument('--snapshot', metavar='PATH',
+                        help="Guarda las sesiones y mensajes descargados en PATH (.jsonl.gz) para --replay")
+    parser.add_argument('--replay', metavar='ORIGEN',
+                        help="Analiza sin Odoo desde un snapshot de --snapshot o un directorio de reportes "
+                             f"exportados; escribe en {REPLAY_OUTPUT_DIR}")
+
+def redirect_output():
+    """Los reportes de un replay van a REPLAY_OUTPUT_DIR (output_path lee OUTPUT_DIR al escribir)"""
+    odoo_chat_common.OUTPUT_DIR = REPLAY_OUTPUT_DIR
+    return REPLAY_OUTPUT_DIR
+
+@METRICS.timed('snapshot_write')
+def write_snapshot(path, sessions, messages, since=None, channel_ids=None):
+    """Una línea JSON por sesión y por mensaje tras una cabecera; escritura atómica"""
+    path = os.path.expanduser(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    header = {
+        'snapshot': SNAPSHOT_VERSION,
+        'fetched_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+        'since': since,
+        'channels': channel_ids or LIVECHAT_CHANNEL_IDS,
+    }
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write(json.dumps(header) + '\n')
+        for session in sessions:
+            f.write(json.dumps({'s': session}, ensure_ascii=False) + '\n')
+        for message in messages:
+            f.write(json.dumps({'m': message}, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, path)
+    METRICS.add_items('snapshot_write', len(sessions) + len(messages))
+    print(f"Snapshot: {len(sessions)} sesiones y {len(messages)} mensajes en {path}")
+    return path
+
+def iter_csv(path):
+    """Filas de un CSV (o .csv.gz / .csv.zst) como dicts, en streaming (csv.reader + zip, más rápido que DictReader)"""
+    # Las conversaciones completas superan el límite por campo de 128 KiB
+    csv.field_size_limit(sys.maxsize)
+    with read_report(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        for values in reader:
+            yield dict(zip(header, values))
+
+@METRICS.timed('replay_read')
+def read_snapshot(path, channel_ids=None):
+    """(sesiones, mensajes, fecha de descarga) de un snapshot, solo de los canales pedidos"""
+    channel_ids = channel_ids or LIVECHAT_CHANNEL_IDS
+    sessions = []
+    messages = []
+    with gzip.open(os.path.expanduser(path), 'rt', encoding='utf-8') as f:
+        header = json.loads(next(f))
+        if header.get('snapshot') != SNAPSHOT_VERSION:
+            raise Exception(f"Snapshot con versión {header.get('snapshot')} (se espera {SNAPSHOT_VERSION}): {path}")
+        missing = sorted(set(channel_ids) - set(header['channels']))
+        if missing:
+            raise Exception(f"El snapshot no incluye los canales {missing} (tiene {header['channels']})")
+        if header['since']:
+            print(f"  Aviso: el snapshot solo tiene sesiones desde {header['since']}")
+        wanted_ids = set()
+        for line in f:
+            record = json.loads(line)
+            if 's' in record:
+                session = record['s']
+                if session_channel(session) in channel_ids:
+                    sessions.append(session)
+                    wanted_ids.add(session['id'])
+            elif record['m']['res_id'] in wanted_ids:
+                # Los mensajes van después de todas las sesiones
+                messages.append(record['m'])
+    METRICS.add_items('replay_read', len(sessions) + len(messages))
+    return sessions, messages, datetime.strptime(header['fetched_at'], '%Y-%m-%d %H:%M:%S')
+
+def _many2one(value):
+    return False if value in ('', 'N/A') else [0, value]
+
+def _body(text):
+    # strip_html deshace las entidades: el texto vuelve a salir igual
+    return escape(text, quote=False)
+
+def _conversation_messages(conversation):
+    """[(autor, texto)] de 'conversacion_completa' ('[Autor]: texto' por línea)"""
+    turns = []
+    for line in conversation.split('\n'):
+        author, sep, text = line.partition(']: ')
+        if line.startswith('[') and sep:
+            turns.append([author[1:], text])
+        elif turns:
+            turns[-1][1] += '\n' + line  # texto con saltos de línea
+    return turns
+
+def _lead_conversations(directory):
+    """{session_id: conversación completa} uniendo los dos CSVs de leads (mismo orden de filas)"""
+    leads_path = find_report(directory, LEADS_EXPORT)
+    conversations_path = find_report(directory, LEAD_CONVERSATIONS_EXPORT)
+    if not (leads_path and conversations_path):
+        return {}
+    result = {}
+    for lead, conv in zip(iter_csv(leads_path), iter_csv(conversations_path)):
+        if (lead['email'], lead['fecha_chat']) != (conv['email'], conv['fecha_chat']):
+            print(f"  Aviso: {LEADS_EXPORT} y {LEAD_CONVERSATIONS_EXPORT} no coinciden; "
+                  "se usan solo los textos del detalle")
+            return {}
+        result[int(lead['session_id'])] = conv['conversacion_completa']
+    return result
+
+@METRICS.timed('replay_read')
+def read_exports(directory, channel_ids=None):
+    """(sesiones, mensajes reconstruidos, fecha de referencia) desde los CSVs de un directorio de reportes.
+
+    La fecha de referencia es la de la última sesión del detalle: el mtime del
+    archivo no sirve (en un checkout de git es la fecha del checkout). Las
+    columnas country/active/channel_id faltan en exports anteriores.
+    """
+    channel_ids = channel_ids or LIVECHAT_CHANNEL_IDS
+    detail_path = find_report(directory, CONVERSATIONS_EXPORT)
+    if detail_path is None:
+        raise Exception(f"No existe {os.path.join(directory, CONVERSATIONS_EXPORT)}: "
+                        "el replay desde reportes necesita el detalle por sesión")
+    conversations = _lead_conversations(directory)
+    sessions = []
+    messages = []
+    for row in iter_csv(detail_path):
+        if 'sesiones_en_grupo' in row:
+            raise Exception(f"{detail_path} se exportó con --collapse-templates (sin una fila por sesión)")
+        sid = int(row['session_id'])
+        session = {
+            'id': sid,
+            'name': '',
+            'create_date': row['date'],
+            'livechat_operator_id': _many2one(row['operator']),
+            'anonymous_name': False,
+            'country_id': _many2one(row.get('country') or ''),
+            'livechat_active': (row.get('active') or '').lower() == 'true',
+            # Exports de un solo canal no llevan la columna
+            'livechat_channel_id': int(row.get('channel_id') or LIVECHAT_CHANNEL_IDS[0]),
+            'message_ids': [],
+            # Los mensajes reconstruidos llevan la fecha de la sesión y un solo autor del
+            # staff: no sirven para tiempos de respuesta (odoo_chat_timing)
+            'untimed': True,
+        }
+        if session['livechat_channel_id'] not in channel_ids:
+            continue
+        if sid in conversations:
+            turns = _conversation_messages(conversations[sid])
+        else:
+            turns = [(VISITOR_LABEL, text) for text in row['visitor_messages'].split(' | ') if text]
+        # Mensajes vacíos completan num_messages: classify_session los cuenta pero los salta
+        turns += [(VISITOR_LABEL, '')] * (int(row['num_messages']) - len(turns))
+        for author, text in turns:
+            message_id = len(messages) + 1
+            session['message_ids'].append(message_id)
+            messages.append({
+                'id': message_id,
+                'body': _body(text),
+                'author_id': False if author == VISITOR_LABEL else [BOT_AUTHOR_IDS[0], author],
+                'date': row['date'],
+                'res_id': sid,
+                'message_type': 'comment',
+            })
+        sessions.append(session)
+    sessions.sort(key=lambda s: s['create_date'])
+    METRICS.add_items('replay_read', len(sessions) + len(messages))
+    if sessions:
+        now = datetime.strptime(sessions[-1]['create_date'], '%Y-%m-%d %H:%M:%S')
+    else:
+        now = datetime.utcfromtimestamp(os.path.getmtime(detail_path))
+    return sessions, messages, now
+
+def replay_and_classify(source, channel_ids=None):
+    """Equivalente de fetch_and_classify sin Odoo.
+
+    Devuelve (sesiones clasificadas en orden cronológico, total de mensajes,
+    fecha de referencia): la de la descarga del snapshot o la del export, así
+    los días transcurridos y las prioridades salen como en la corrida original
+    (las ventanas --since/--days se aplican sobre el resultado).
+    """
+    source = os.path.expanduser(source)
+    print(f"Replay desde {source} (sin Odoo)")
+    if os.path.isdir(source):
+        sessions, messages, now = read_exports(source, channel_ids)
+    else:
+        sessions, messages, now = read_snapshot(source, channel_ids)
+    print(f"Sesiones: {len(sessions)}, mensajes: {len(messages)} (datos del {now:%Y-%m-%d %H:%M} UTC)")
+    print("\nClasificando conversaciones...")
+    return classify_sessions(sessions, messages), len(messages), now
+
+def replay_enrichment(source):
+    """Datos de res.partner por email (forma de enrich_from_odoo) tomados de LEADS_SEGUIMIENTO_MARKETING.csv.
+
+    Se busca junto al directorio de replay o, para un snapshot, en los reportes reales.
+    """
+    source = os.path.expanduser(source)
+    directory = source if os.path.isdir(source) else OUTPUT_DIR
+    path = find_report(directory, LEADS_EXPORT)
+    if path is None:
+        print(f"  Sin {os.path.join(directory, LEADS_EXPORT)}: los leads del replay quedan sin enriquecer")
+        return {}
+    enriched = {}
+    for row in iter_csv(path):
+        email = row['email'].lower()
+        if not row['nombre_odoo']:
+            enriched.setdefault(email, None)
+            continue
+        enriched[email] = {
+            'odoo_id': None,
+            'name': row['nombre_odoo'],
+            'phone': row['telefono'],
+            'mobile': row['celular'],
+            'street': '',
+            'city': row['ciudad'],
+            'state': row['estado'],
+            'company': row['empresa'],
+            'function': row['puesto'],
+            'is_company': False,
+            'categories': '',
+            'sale_orders': int(row['ordenes_venta'] or 0),
+            'total_invoiced': float(row['total_facturado'] or 0),
+        }
+    print(f"Enriquecimiento del replay: {sum(1 for v in enriched.values() if v)} contactos de {path}")
+    return enriched
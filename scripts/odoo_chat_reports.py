@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Driver único para los reportes de chat de proconsa.online.
+Descarga y clasifica cada sesión una sola vez y la entrega a los reportes seleccionados:
+ejecutivo (Markdown), métricas (CSVs), leads de marketing y oportunidades sin email.
+"""
+
+import argparse
+from datetime import datetime
+
+import odoo_rpc
+import odoo_profile
+from odoo_chat_common import OUTPUT_DIR, LIVECHAT_CHANNEL_IDS, connect, fetch_and_classify, parse_channel_ids
+from odoo_chat_pipeline import ChatPipeline, StreamingCsvWriter
+from odoo_chat_manifest import ReportManifest, models_fingerprint, sessions_fingerprint
+from odoo_chat_columnar import columnar_backend
+from odoo_chat_output import add_compress_argument, set_compression, zstd_module, report_output_path, report_batch
+from odoo_metrics import write_metrics, print_summary
+import odoo_chat_analysis as analysis_report
+import odoo_chat_leads_report as leads_report
+
+class ChatDataset:
+    """Resultado intermedio compartido.
+
+    Cada sesión clasificada se acumula al llegar (parciales diarios y/o lead) y
+    se descarta; así el dataset puede alimentarse desde una lista o en streaming.
+
+    Lo que queda en memoria crece con el número de sesiones, también con
+    --pipeline:
+        new_days       parciales de los días que aún no están en el almacén; en
+                       corridas incrementales son solo los días nuevos
+        conversations  filas de detalle de la ventana `detail_from` (con el CSV
+                       en streaming solo si además se pide --columnar)
+        raw_leads      un lead por sesión con señales, con su conversación completa;
+                       los reportes de leads los ordenan todos juntos, así que con
+                       'leads' o 'sin_email' se retiene todo el historial de leads
+    """
+
+    def __init__(self, uid, models, store, want_analysis=True, want_leads=True, conversations_writer=None,
+                 collapse_templates=False, now=None, columnar=False, detail_from=None):
+        self.uid = uid
+        self.models = models
+        self.store = store
+        self.want_analysis = want_analysis
+        self.want_leads = want_leads
+        self.by_channel = analysis_report.multi_channel(store)
+        self.conversations_writer = conversations_writer
+        self.collapse_templates = collapse_templates
+        self.columnar = columnar
+        self.now = now or datetime.utcnow()
+        self.detail_from = detail_from
+        self.new_days = {}
+        self.conversations = []
+        self.raw_leads = []
+        self.lead_emails = set()
+        self._analysis = None
+        self._leads = None
+
+    def add(self, c):
+        if self.want_analysis:
+            day_key = c['create_dt'].strftime('%Y-%m-%d')
+            if day_key not in self.store['days']:
+                analysis_report.add_session_to_partials(self.new_days, c, self.by_channel)
+            if self.detail_from is None or day_key >= self.detail_from:
+                row = analysis_report.conversation_row(c, self.by_channel)
+                if self.conversations_writer is not None:
+                    self.conversations_writer.write(row)
+                if self.conversations_writer is None or self.columnar:
+                    self.conversations.append(row)
+        if self.want_leads:
+            lead = leads_report.lead_from_session(c, self.now)
+            if lead is not None:
+                if lead['email']:
+                    self.lead_emails.add(lead['email'])
+                self.raw_leads.append(lead)
+
+    def consume(self, classified):
+        for c in classified:
+            self.add(c)
+        return self
+
+    @property
+    def analysis(self):
+        """Agregados de odoo_chat_analysis (combinados con el almacén de días cerrados)"""
+        if self._analysis is None:
+            self._analysis = analysis_report.finalize_with_store(self.new_days, self.store, self.conversations)
+        return self._analysis
+
+    @property
+    def leads(self):
+        """(leads con email, leads sin email) ya enriquecidos y ordenados"""
+        if self._leads is None:
+            # Los leads se acumulan en orden cronológico; el reporte los quiere
+            # del más reciente al más antiguo antes del ordenamiento estable
+            leads = self.raw_leads[::-1]
+            print(f"Leads extraídos: {len(leads)}")
+            enriched = leads_report.enrich_from_odoo(self.uid, self.models, self.lead_emails)
+            leads_report.apply_enrichment(leads, enriched)
+            self._leads = leads_report.split_leads(leads)
+        return self._leads
+
+def executive_sink(dataset):
+    analysis_report.write_executive_report(dataset.analysis)
+
+def metrics_sink(dataset):
+    # En modo pipeline el detalle por sesión ya se escribió en streaming
+    analysis_report.write_metrics_csvs(dataset.analysis,
+                                       include_conversations=dataset.conversations_writer is None,
+                                       collapse_templates=dataset.collapse_templates)
+    if dataset.columnar:
+        analysis_report.write_conversations_columnar(dataset.analysis)
+
+def marketing_leads_sink(dataset):
+    leads_report.write_marketing_reports(*dataset.leads, now=dataset.now, columnar=dataset.columnar,
+                                         by_channel=dataset.by_channel)
+
+def no_email_sink(dataset):
+    _, leads_without_email = dataset.leads
+    leads_report.write_no_email_opportunities(leads_without_email, dataset.by_channel)
+
+# Reportes disponibles: nombre -> (función que consume el dataset, necesita historial completo)
+SINKS = {
+    'ejecutivo': (executive_sink, False),
+    'metricas': (metrics_sink, False),
+    'leads': (marketing_leads_sink, True),
+    'sin_email': (no_email_sink, True),
+}
+
+def sink_inputs(name, fingerprint, now, collapse_templates=False, columnar=False, channel_ids=None,
+                enrichment=None, detail_from=None):
+    """Entradas de las que depende un reporte, para compararlas con el manifiesto"""
+    if name in analysis_report.ARTIFACTS:
+        return analysis_report.artifact_inputs(name, fingerprint, collapse_templates, columnar, channel_ids,
+                                               detail_from)
+    return leads_report.artifact_inputs(name, fingerprint, now, columnar=columnar, channel_ids=channel_ids,
+                                        enrichment=enrichment)
+
+def sink_files(name, columnar=False, channel_ids=None):
+    if name in analysis_report.ARTIFACTS:
+        return analysis_report.artifact_files(name, columnar, channel_ids)
+    return leads_report.artifact_files(name, columnar)
+
+def open_conversations_stream(store):
+    """Abre el CSV de detalle; las filas llegan en streaming con las sesiones de la ventana"""
+    path = report_output_path(analysis_report.CONVERSATIONS_CSV)
+    return StreamingCsvWriter(path, analysis_report.conversation_fields(analysis_report.multi_channel(store)))
+
+def run_reports(sink_names, rebuild_aggregates=False, pipeline=False, fetchers=4, analyzers=2,
+                collapse_templates=False, force=False, columnar=False, channel_ids=None,
+                detail_days=analysis_report.DETAIL_DAYS):
+    """Descarga una vez y ejecuta en orden los reportes indicados cuyas entradas cambiaron.
+
+    Con varios `channel_ids` las sesiones de todos los canales se descargan y
+    clasifican juntas; los reportes salen etiquetados por canal y combinados.
+    El CSV de detalle cubre las sesiones de los últimos `detail_days` días.
+    """
+    channel_ids = channel_ids or LIVECHAT_CHANNEL_IDS
+    unknown = [name for name in sink_names if name not in SINKS]
+    if unknown:
+        raise ValueError(f"Reportes desconocidos: {', '.join(unknown)}")
+
+    uid, models = connect()
+    now = datetime.utcnow()
+    detail_from = analysis_report.detail_start(now, detail_days)
+
+    # Una llamada barata decide qué reportes hay que regenerar
+    manifest = ReportManifest()
+    fingerprint = sessions_fingerprint(uid, models, channel_ids=channel_ids)
+    enrichment = models_fingerprint(uid, models, leads_report.ENRICHMENT_MODELS) if 'leads' in sink_names else None
+    inputs = {name: sink_inputs(name, fingerprint, now, collapse_templates, columnar, channel_ids, enrichment,
+                                detail_from)
+              for name in sink_names}
+    fresh = [name for name in sink_names
+             if not force and manifest.is_fresh(name, inputs[name], sink_files(name, columnar, channel_ids))]
+    if fresh:
+        print(f"Sin cambios (no se regeneran): {', '.join(fresh)}")
+    sink_names = [name for name in sink_names if name not in fresh]
+    if not sink_names:
+        print(f"Nada que regenerar ({fingerprint['sessions']} sesiones, "
+              f"última modificación {fingerprint['max_write_date']})")
+        return None
+
+    store = analysis_report.load_aggregate_store(channel_ids)
+    if rebuild_aggregates:
+        store['days'] = {}
+
+    # Los leads necesitan todo el historial; solo los agregados pueden partir del almacén
+    needs_full_history = any(SINKS[name][1] for name in sink_names)
+    want_analysis = any(name in ('ejecutivo', 'metricas') for name in sink_names)
+    since = None if needs_full_history else analysis_report.stored_days_cutoff(store, detail_from)
+
+    # Todos los archivos de la corrida (incluido el detalle en streaming) se publican juntos
+    with report_batch():
+        if pipeline:
+            # Agrupar plantillas requiere todas las filas: en ese caso el detalle se escribe al final
+            stream_conversations = 'metricas' in sink_names and not collapse_templates
+            writer = open_conversations_stream(store) if stream_conversations else None
+            dataset = ChatDataset(uid, models, store, want_analysis, needs_full_history, writer,
+                                  collapse_templates, now, columnar, detail_from)
+            try:
+                dataset.consume(ChatPipeline(uid, since=since, fetchers=fetchers, analyzers=analyzers,
+                                             channel_ids=channel_ids))
+            except BaseException as exc:
+                if writer is not None:
+                    writer.close(exc)
+                raise
+            if writer is not None:
+                writer.close()
+                print(f"  CSV conversaciones (streaming): {writer.path}")
+        else:
+            classified, _ = fetch_and_classify(uid, models, since=since, channel_ids=channel_ids)
+            dataset = ChatDataset(uid, models, store, want_analysis, needs_full_history,
+                                  collapse_templates=collapse_templates, now=now,
+                                  columnar=columnar, detail_from=detail_from).consume(classified)
+
+        for name in sink_names:
+            print(f"\nGenerando reporte: {name}")
+            SINKS[name][0](dataset)
+            manifest.record(name, inputs[name], sink_files(name, columnar, channel_ids))
+    manifest.save()
+    return dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Reportes de chat de proconsa.online (una sola descarga)")
+    parser.add_argument('--reports', default=','.join(SINKS),
+                        help=f"Reportes a generar, separados por coma (default: {','.join(SINKS)})")
+    parser.add_argument('--rebuild-aggregates', action='store_true',
+                        help="Ignora los parciales guardados y recalcula todo el historial")
+    parser.add_argument('--force', action='store_true',
+                        help="Regenera los reportes aunque sus entradas no hayan cambiado")
+    parser.add_argument('--collapse-templates', action='store_true',
+                        help="Agrupa en una fila del CSV de detalle las sesiones de plantilla casi iguales")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Escribe también detalle y leads en Parquet (pyarrow) o .npz (numpy) para BI")
+    parser.add_argument('--metrics', metavar='PREFIJO',
+                        help="Escribe PREFIJO.json y PREFIJO.prom (textfile de node_exporter) con métricas por etapa")
+    parser.add_argument('--channels', type=parse_channel_ids, default=LIVECHAT_CHANNEL_IDS, metavar='IDS',
+                        help="Canales de livechat separados por coma, descargados en paralelo; con varios "
+                             "se generan reportes por canal además del combinado "
+                             f"(default: {','.join(map(str, LIVECHAT_CHANNEL_IDS))})")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Descarga y clasifica en paralelo con colas acotadas: los mensajes en vuelo "
+                             "quedan acotados, pero los parciales de días nuevos y los leads siguen en memoria")
+    parser.add_argument('--fetchers', type=int, default=4, help="Hilos descargadores en modo pipeline")
+    parser.add_argument('--analyzers', type=int, default=2, help="Hilos analizadores en modo pipeline")
+    analysis_report.add_detail_argument(parser)
+    add_compress_argument(parser)
+    odoo_profile.add_profile_argument(parser)
+    odoo_rpc.add_priority_argument(parser)
+    odoo_rpc.add_cache_argument(parser)
+    odoo_rpc.add_transport_argument(parser)
+    odoo_rpc.add_deadline_arguments(parser)
+    args = parser.parse_args()
+    odoo_rpc.set_transport(args.transport)
+    odoo_rpc.set_cache(args.rpc_cache)
+    odoo_rpc.set_call_timeout(args.rpc_timeout)
+    odoo_rpc.set_hedging(args.hedge)
+    odoo_rpc.set_deadline(args.deadline)
+    odoo_rpc.set_priority(args.priority)
+    odoo_profile.start(args.profile)
+    set_compression(args.compress)
+    if args.columnar and columnar_backend() is None:
+        parser.error("--columnar requiere pyarrow o numpy")
+    if args.compress == 'zstd' and zstd_module() is None:
+        parser.error("--compress zstd requiere Python 3.14 o el paquete zstandard")
+    if args.detail_days < 1:
+        parser.error("--detail-days debe ser mayor que 0")
+
+    print("=" * 70)
+    print("REPORTES DE CHAT - proconsa.online")
+    print("=" * 70)
+
+    sink_names = [name.strip() for name in args.reports.split(',') if name.strip()]
+    run_reports(sink_names, rebuild_aggregates=args.rebuild_aggregates,
+                pipeline=args.pipeline, fetchers=args.fetchers, analyzers=args.analyzers,
+                collapse_templates=args.collapse_templates, force=args.force, columnar=args.columnar,
+                channel_ids=args.channels, detail_days=args.detail_days)
+
+    print("\n" + "=" * 70)
+    print("REPORTES COMPLETADOS")
+    print("=" * 70)
+    print(f"\nArchivos generados en: {OUTPUT_DIR}/")
+
+    if args.metrics:
+        print_summary(write_metrics(args.metrics, 'odoo_chat_reports'))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Modo aproximado del análisis de chat: muestra aleatoria estratificada por mes.
+
+Solo se descargan `id` y `create_date` de todas las sesiones (sin mensajes); se
+eligen n sesiones repartidas proporcionalmente entre meses y solo esas se
+descargan y clasifican. Los porcentajes de intenciones y productos se estiman
+con el estimador estratificado y un intervalo de confianza normal con corrección
+por población finita.
+"""
+
+import math
+import random
+from collections import defaultdict
+from datetime import datetime
+
+import odoo_rpc
+from odoo_chat_common import (
+    SESSION_FIELDS,
+    intent_patterns, product_patterns, session_domain, get_messages_batch, classify_sessions,
+)
+from odoo_chat_output import report_output_path, open_report
+from odoo_metrics import METRICS
+
+SAMPLE_REPORT = 'REPORTE_MUESTRA_CHAT.md'
+Z_95 = 1.96
+
+@METRICS.timed('session_paging')
+def session_months(uid, models, since=None, channel_ids=None):
+    """{YYYY-MM: [ids]} con una búsqueda que solo trae id y create_date"""
+    rows = models.execute_kw(
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+        'discuss.channel', 'search_read',
+        [session_domain(since, channel_ids)],
+        {'fields': ['create_date'], 'order': 'create_date asc'}
+    )
+    METRICS.add_items('session_paging', len(rows))
+    strata = defaultdict(list)
+    for row in rows:
+        strata[row['create_date'][:7]].append(row['id'])
+    return dict(sorted(strata.items()))
+
+def allocate(strata, sample_size):
+    """Asignación proporcional por mes (al menos 2 por estrato para poder estimar varianza)"""
+    total = sum(len(ids) for ids in strata.values())
+    return {
+        month: min(len(ids), max(2, round(sample_size * len(ids) / total)))
+        for month, ids in strata.items()
+    }
+
+def draw_sample(strata, sample_size, seed=None):
+    """{mes: ids muestreados} según la asignación proporcional"""
+    rng = random.Random(seed)
+    sizes = allocate(strata, sample_size)
+    return {month: sorted(rng.sample(ids, sizes[month])) for month, ids in strata.items()}
+
+@METRICS.timed('session_paging')
+def read_sessions(uid, models, ids):
+    sessions = models.execute_kw(
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+        'discuss.channel', 'read',
+        [ids],
+        {'fields': SESSION_FIELDS}
+    )
+    METRICS.add_items('session_paging', len(sessions))
+    return sorted(sessions, key=lambda s: (s['create_date'], s['id']))
+
+def stratified_share(hits, strata_sizes, sample_sizes):
+    """Proporción estratificada y semiamplitud del IC 95%.
+
+    `hits`, `strata_sizes` y `sample_sizes` son {mes: n}; la varianza de cada
+    estrato lleva la corrección por población finita (1 - n_h/N_h).
+    """
+    total = sum(strata_sizes.values())
+    share = 0.0
+    variance = 0.0
+    for month, population in strata_sizes.items():
+        n = sample_sizes[month]
+        if not n:
+            continue
+        weight = population / total
+        p = hits.get(month, 0) / n
+        share += weight * p
+        if n > 1:
+            variance += weight ** 2 * (1 - n / population) * p * (1 - p) / (n - 1)
+    return share, Z_95 * math.sqrt(variance)
+
+def estimate_shares(classified, strata, sample):
+    """Estimaciones {'intents': {...}, 'products_mentioned': {...}} con (porcentaje, ± IC) ordenadas"""
+    strata_sizes = {month: len(ids) for month, ids in strata.items()}
+    sample_sizes = {month: len(ids) for month, ids in sample.items()}
+    intent_hits = defaultdict(lambda: defaultdict(int))
+    product_hits = defaultdict(lambda: defaultdict(int))
+    for c in classified:
+        month = c['session']['create_date'][:7]
+        for intent in c['intents']:
+            intent_hits[intent][month] += 1
+        for product in c['products']:
+            product_hits[product][month] += 1
+
+    def shares(names, hits):
+        estimates = {name: stratified_share(hits.get(name, {}), strata_sizes, sample_sizes) for name in names}
+        return dict(sorted(estimates.items(), key=lambda x: (-x[1][0], x[0])))
+
+    return {
+        'intents': shares(intent_patterns, intent_hits),
+        'products_mentioned': shares(product_patterns, product_hits),
+    }
+
+def run_sample(uid, models, sample_size, seed=None, since=None, channel_ids=None):
+    """Muestrea, clasifica y estima; devuelve el resultado que consume write_sample_report()"""
+    print("Obteniendo ids de sesiones por mes...")
+    strata = session_months(uid, models, since, channel_ids)
+    population = sum(len(ids) for ids in strata.values())
+    if not population:
+        raise Exception("No hay sesiones para muestrear")
+    sample = draw_sample(strata, sample_size, seed)
+    ids = [sid for month_ids in sample.values() for sid in month_ids]
+    print(f"Muestra: {len(ids)} de {population} sesiones en {len(strata)} meses")
+
+    sessions = read_sessions(uid, models, ids)
+    message_ids = sorted({mid for s in sessions for mid in s['message_ids']})
+    print(f"Obteniendo {len(message_ids)} mensajes de la muestra...")
+    messages = get_messages_batch(uid, models, message_ids)
+    classified = classify_sessions(sessions, messages)
+
+    return {
+        'population': population,
+        'sample_size': len(ids),
+        'strata': {month: (len(strata[month]), len(sample[month])) for month in strata},
+        'estimates': estimate_shares(classified, strata, sample),
+    }
+
+def write_sample_report(result):
+    """Reporte Markdown con porcentajes estimados e intervalos de confianza"""
+    report_path = report_output_path(SAMPLE_REPORT)
+    with open_report(report_path) as f:
+        f.write("# REPORTE APROXIMADO (MUESTRA) - Chat proconsa.online\n\n")
+        f.write(f"**Fecha de generación:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n")
+        f.write(f"**Muestra:** {result['sample_size']:,} de {result['population']:,} sesiones, "
+                f"estratificada por mes. Intervalos de confianza al 95%.\n\n")
+        f.write("> Cifras estimadas. Para números exactos ejecutar el análisis completo.\n\n")
+
+        f.write("## Muestra por mes\n\n| Mes | Sesiones | En la muestra |\n|---|---|---|\n")
+        for month, (population, sampled) in result['strata'].items():
+            f.write(f"| {month} | {population} | {sampled} |\n")
+        f.write("\n")
+
+        for title, key in (("Intenciones de los visitantes", 'intents'),
+                           ("Productos mencionados", 'products_mentioned')):
+            f.write(f"## {title}\n\n| Categoría | % estimado | IC 95% |\n|---|---|---|\n")
+            for name, (share, half_width) in result['estimates'][key].items():
+                low, high = max(0.0, share - half_width), min(1.0, share + half_width)
+                f.write(f"| {name} | {share*100:.1f}% | {low*100:.1f}% – {high*100:.1f}% |\n")
+            f.write("\n")
+    print(f"  Reporte muestra: {report_path}")
+    return report_path
+
+def print_estimates(result):
+    for title, key in (("Intenciones", 'intents'), ("Productos", 'products_mentioned')):
+        print(f"\n{title} (estimado ± IC 95%):")
+        for name, (share, half_width) in result['estimates'][key].items():
+            print(f"  {name:<22} {share*100:5.1f}% ± {half_width*100:4.1f}")
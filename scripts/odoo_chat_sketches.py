@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Sketches de tamaño fijo para tendencias del chat: términos emergentes y conteos distintos.
+
+Cada parcial diario lleva un DaySketches:
+    terms     count-min sketch + lista de heavy hitters de unigramas y bigramas
+              del visitante (cada término cuenta una vez por sesión)
+    visitors  HyperLogLog de visitantes distintos (ver visitor_key)
+    emails    HyperLogLog de emails distintos
+
+Todos se combinan sumando (count-min) o con máximo por registro (HyperLogLog),
+así los parciales guardados, las corridas nuevas y los workers se mezclan sin
+volver a ver los mensajes. En memoria solo se conservan las últimas semanas
+necesarias para comparar (TrendAccumulator), sin importar cuánto historial haya.
+
+Los hashes son blake2b (no hash() de Python, que cambia entre procesos).
+"""
+
+import base64
+import hashlib
+import math
+import operator
+import re
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+from odoo_chat_common import email_pattern, product_patterns
+
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+HEAVY_HITTERS = 64       # Candidatos conservados por sketch de términos
+HLL_PRECISION = 10       # 1024 registros: ~3% de error relativo
+
+EMERGING_BASELINE_WEEKS = 4  # Semanas previas contra las que se compara la última
+EMERGING_MIN_SESSIONS = 3    # Sesiones mínimas en la última semana
+EMERGING_MIN_GROWTH = 2.0    # Veces por encima del ritmo de la línea base
+EMERGING_TOP = 15
+RECENT_DAYS = 14             # Días con visitantes/emails distintos en el reporte
+
+# Los términos se comparan sin acentos ('cotización' y 'cotizacion' son el mismo)
+_FOLD = str.maketrans('áéíóúü', 'aeiouu')
+TOKEN_RE = re.compile(r"[a-zñ0-9]+")
+STOPWORDS = frozenset("""
+    a al algo algun alguna ante aqui asi bien buen buena buenas buenos cada como con cual cuando
+    cuanto de del dia dias donde el ella en entre era es esa ese eso esta estan este esto estoy favor
+    fue gracias ha hay hola la las le les lo los mas me mi mis muy nada ni no nos o otra otro para pero
+    poco por porque puede pueden puedo que quiero saber se sea si sin sobre solo son su sus tal tambien
+    tardes te tengo tiene tienen todo tu tus un una unas uno unos usted y ya yo
+""".split())
+
+_PRODUCT_RES = [re.compile(pattern) for pattern in product_patterns.values()]
+
+def _digest(value, size):
+    return hashlib.blake2b(value.encode('utf-8'), digest_size=size).digest()
+
+def _pack(data):
+    return base64.b64encode(zlib.compress(data)).decode('ascii')
+
+def _unpack(text):
+    return zlib.decompress(base64.b64decode(text))
+
+class CountMinSketch:
+    """Conteos aproximados por término (nunca subestima) en CMS_DEPTH filas de CMS_WIDTH contadores"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = array('I', bytes(4 * width * depth))
+
+    def _cells(self, term):
+        digest = _digest(term, 4 * self.depth)
+        return [row * self.width + int.from_bytes(digest[4 * row:4 * row + 4], 'little') % self.width
+                for row in range(self.depth)]
+
+    def add(self, term, count=1):
+        """Suma y devuelve la estimación actualizada"""
+        table = self.table
+        estimate = None
+        for cell in self._cells(term):
+            table[cell] += count
+            estimate = table[cell] if estimate is None else min(estimate, table[cell])
+        return estimate
+
+    def estimate(self, term):
+        return min(self.table[cell] for cell in self._cells(term))
+
+    def merge(self, other):
+        self.table = array('I', map(operator.add, self.table, other.table))
+        return self
+
+    def to_dict(self):
+        return {'width': self.width, 'depth': self.depth, 'table': _pack(self.table.tobytes())}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['width'], data['depth'])
+        sketch.table = array('I', _unpack(data['table']))
+        return sketch
+
+class TermSketch:
+    """Count-min sketch más los HEAVY_HITTERS términos de mayor estimación"""
+
+    def __init__(self, k=HEAVY_HITTERS, cms=None):
+        self.k = k
+        self.cms = cms or CountMinSketch()
+        self.top = {}
+        self._floor = 0  # estimación mínima entre los candidatos cuando la lista está llena
+
+    def add(self, term):
+        estimate = self.cms.add(term)
+        top = self.top
+        if term in top or len(top) < self.k:
+            top[term] = estimate
+        elif estimate > self._floor:
+            del top[min(top, key=top.get)]
+            top[term] = estimate
+        else:
+            return
+        if len(top) == self.k:
+            self._floor = min(top.values())
+
+    def merge(self, other):
+        """Suma los contadores y vuelve a elegir candidatos entre ambas listas"""
+        self.cms.merge(other.cms)
+        candidates = {term: self.cms.estimate(term) for term in set(self.top) | set(other.top)}
+        self.top = dict(sorted(candidates.items(), key=lambda x: (-x[1], x[0]))[:self.k])
+        self._floor = min(self.top.values()) if len(self.top) == self.k else 0
+        return self
+
+    def heavy_hitters(self, n=None):
+        """[(término, estimación)] de mayor a menor"""
+        return sorted(self.top.items(), key=lambda x: (-x[1], x[0]))[:n]
+
+    def to_dict(self):
+        return {'cms': self.cms.to_dict(), 'top': self.top}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(cms=CountMinSketch.from_dict(data['cms']))
+        sketch.top = dict(data['top'])
+        sketch._floor = min(sketch.top.values()) if len(sketch.top) == sketch.k else 0
+        return sketch
+
+class HyperLogLog:
+    """Conteo aproximado de valores distintos en 2**precision registros de un byte"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        h = int.from_bytes(_digest(value, 8), 'little')
+        bits = 64 - self.precision
+        index = h >> bits
+        rest = h & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # corrección para pocos valores (linear counting)
+        return round(estimate)
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': _pack(bytes(self.registers))}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['precision'])
+        sketch.registers = bytearray(_unpack(data['registers']))
+        return sketch
+
+def session_terms(visitor_texts):
+    """Unigramas y bigramas de los textos del visitante (sin emails, números ni palabras vacías)"""
+    terms = set()
+    for text in visitor_texts:
+        words = [w for w in TOKEN_RE.findall(re.sub(email_pattern, ' ', text).lower().translate(_FOLD))
+                 if len(w) > 2 and not w.isdigit() and w not in STOPWORDS]
+        terms.update(words)
+        terms.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return terms
+
+def visitor_key(c):
+    """Identidad del visitante para el conteo distinto.
+
+    Primero el email que dejó; luego el nombre anónimo numerado de Odoo
+    ('Visitor #1234'); si no hay ninguno, cada sesión cuenta como un visitante.
+    """
+    if c['emails']:
+        return f"email:{c['emails'][0].lower()}"
+    name = c['session'].get('anonymous_name')
+    if name and any(ch.isdigit() for ch in name):
+        return f"anonimo:{name}"
+    return f"sesion:{c['session']['id']}"
+
+class DaySketches:
+    """Sketches de un parcial (día o canal), combinables y serializables en el almacén"""
+
+    def __init__(self, terms=None, visitors=None, emails=None):
+        self.terms = terms or TermSketch()
+        self.visitors = visitors or HyperLogLog()
+        self.emails = emails or HyperLogLog()
+
+    def add_session(self, c):
+        for term in session_terms(c['visitor_texts']):
+            self.terms.add(term)
+        self.visitors.add(visitor_key(c))
+        for email in c['emails']:
+            self.emails.add(email.lower())
+
+    def merge(self, other):
+        self.terms.merge(other.terms)
+        self.visitors.merge(other.visitors)
+        self.emails.merge(other.emails)
+        return self
+
+    def to_dict(self):
+        return {'terms': self.terms.to_dict(), 'visitors': self.visitors.to_dict(), 'emails': self.emails.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(TermSketch.from_dict(data['terms']), HyperLogLog.from_dict(data['visitors']),
+                   HyperLogLog.from_dict(data['emails']))
+
+    @classmethod
+    def load(cls, value):
+        """DaySketches de un parcial: objeto vivo o su forma serializada del almacén"""
+        if isinstance(value, cls):
+            return value
+        return cls.from_dict(value) if value else cls()
+
+def sketch_json(value):
+    """`default` de json.dump para parciales con sketches"""
+    if isinstance(value, DaySketches):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+def known_product(term):
+    """True si algún patrón de product_patterns ya cubre el término"""
+    return any(regex.search(term) for regex in _PRODUCT_RES)
+
+class TrendAccumulator:
+    """Combina los sketches diarios en orden cronológico con memoria acotada.
+
+    Conserva EMERGING_BASELINE_WEEKS + 1 sketches semanales de términos, los
+    HyperLogLog totales y los de los últimos RECENT_DAYS días.
+    """
+
+    def __init__(self):
+        self.weeks = OrderedDict()  # lunes YYYY-MM-DD -> [TermSketch, primer día, último día]
+        self.visitors = HyperLogLog()
+        self.emails = HyperLogLog()
+        self.recent = deque(maxlen=RECENT_DAYS)
+
+    def add(self, day_key, value):
+        sketches = DaySketches.load(value)
+        day_dt = datetime.strptime(day_key, '%Y-%m-%d')
+        week_key = (day_dt - timedelta(days=day_dt.weekday())).strftime('%Y-%m-%d')
+        week = self.weeks.get(week_key)
+        if week is None:
+            week = self.weeks[week_key] = [TermSketch(), day_dt, day_dt]
+            while len(self.weeks) > EMERGING_BASELINE_WEEKS + 1:
+                self.weeks.popitem(last=False)
+        week[0].merge(sketches.terms)
+        week[2] = day_dt
+        self.visitors.merge(sketches.visitors)
+        self.emails.merge(sketches.emails)
+        self.recent.append((day_key, sketches))
+
+    def emerging_terms(self):
+        """Términos de la última semana que crecen respecto del ritmo de las semanas previas.
+
+        Se comparan sesiones por día (la última semana puede estar incompleta);
+        `growth` usa suavizado +1 para que los términos nuevos no dividan entre cero.
+        """
+        if not self.weeks:
+            return []
+        weeks = list(self.weeks.values())
+        latest, first_day, last_day = weeks[-1]
+        latest_days = (last_day - first_day).days + 1
+        baseline = TermSketch()
+        baseline_days = 0
+        for sketch, week_first, week_last in weeks[:-1]:
+            baseline.merge(sketch)
+            baseline_days += (week_last - week_first).days + 1
+        rows = []
+        for term, count in latest.heavy_hitters():
+            if count < EMERGING_MIN_SESSIONS:
+                continue
+            weekly_rate = count / latest_days * 7
+            baseline_rate = baseline.cms.estimate(term) / baseline_days * 7 if baseline_days else 0.0
+            growth = (weekly_rate + 1) / (baseline_rate + 1)
+            if growth >= EMERGING_MIN_GROWTH:
+                rows.append({'term': term, 'sessions': count, 'weekly_rate': weekly_rate,
+                             'baseline_rate': baseline_rate, 'growth': growth, 'known': known_product(term)})
+        rows.sort(key=lambda r: (-r['growth'], -r['sessions'], r['term']))
+        return rows[:EMERGING_TOP]
+
+    def result(self):
+        """Resumen listo para el reporte (solo datos simples, serializable en JSON)"""
+        latest_week = next(reversed(self.weeks), None)
+        return {
+            'week': latest_week,
+            'baseline_weeks': max(len(self.weeks) - 1, 0),
+            'emerging': self.emerging_terms(),
+            'top_terms': self.weeks[latest_week][0].heavy_hitters(10) if latest_week else [],
+            'distinct_visitors': self.visitors.count(),
+            'distinct_emails': self.emails.count(),
+            'recent_days': [(day_key, s.visitors.count(), s.emails.count()) for day_key, s in self.recent],
+        }
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Tiempos de respuesta del chat: bot, operadores humanos y visitantes que esperan.
+
+classify_session deja en cada sesión su línea de tiempo (fecha y clase de autor
+de cada mensaje con texto). session_timings() concatena las de un lote completo
+en arreglos planos y calcula con diferencias vectorizadas (numpy si está
+instalado; si no, el mismo cálculo en Python):
+
+    first_response   del primer mensaje del visitante a la primera respuesta (bot u operador)
+    time_to_human    del primer mensaje del visitante al primer mensaje de un operador humano
+    wait_gaps        espera de cada racha de mensajes del visitante hasta la respuesta siguiente
+    outcome          cómo terminó la sesión: 'sin_respuesta' (último mensaje del visitante),
+                     'abandono_tras_bot' (último del bot) o 'humano' (último de un operador)
+
+Los parciales diarios guardan, por hora de creación de la sesión (UTC), un
+histograma de tamaño acotado de cada duración: segundos exactos por debajo de
+EXACT_SECONDS y cubetas logarítmicas de BUCKET_GROWTH por encima (error relativo
+de a lo más ~2.5% en los percentiles). Así el almacén no crece con el número de
+sesiones; merge_response_times() suma los histogramas y da percentiles y tasas
+por hora. Las sesiones sin horas reales por mensaje (replay desde exports) solo
+se cuentan en 'untimed'.
+"""
+
+import math
+from datetime import datetime
+
+VISITOR, BOT, HUMAN = 0, 1, 2
+OUTCOMES = ('sin_respuesta', 'abandono_tras_bot', 'humano')
+DURATIONS = ('first_response', 'time_to_human', 'wait_gaps')
+PERCENTILES = (50, 90, 95)
+EXACT_SECONDS = 60     # Duraciones menores se guardan al segundo
+BUCKET_GROWTH = 1.05   # Por encima, cada cubeta es 5% más ancha que la anterior
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _numpy():
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+def _timings_numpy(np, timelines):
+    """Métricas de todas las sesiones con operaciones sobre arreglos planos"""
+    lengths = np.array([len(dates) for dates, _ in timelines], dtype=np.int64)
+    results = [None] * len(timelines)
+    present = np.flatnonzero(lengths)
+    if not len(present):
+        return results
+    t = np.array([d for dates, _ in timelines for d in dates], dtype='datetime64[s]').astype(np.int64)
+    k = np.array([c for _, classes in timelines for c in classes], dtype=np.int8)
+    n = len(t)
+    idx = np.arange(n)
+    starts = np.concatenate(([0], np.cumsum(lengths[present])[:-1]))
+    ends = starts + lengths[present] - 1
+    session = np.repeat(np.arange(len(present)), lengths[present])
+
+    visitor = k == VISITOR
+    # Primer mensaje del visitante y primeras respuestas posteriores, por sesión
+    first_visitor = np.minimum.reduceat(np.where(visitor, idx, n), starts)
+    after = idx > first_visitor[session]
+    first_reply = np.minimum.reduceat(np.where(~visitor & after, idx, n), starts)
+    first_human = np.minimum.reduceat(np.where((k == HUMAN) & after, idx, n), starts)
+    t_pad = np.append(t, 0)
+    first_response = t_pad[first_reply] - t_pad[first_visitor]
+    time_to_human = t_pad[first_human] - t_pad[first_visitor]
+
+    # Rachas del visitante: la espera termina en el siguiente mensaje del bot u operador
+    previous = np.concatenate(([VISITOR], k[:-1]))
+    run_start = visitor & ((idx == starts[session]) | (previous != VISITOR))
+    next_staff = np.minimum.accumulate(np.where(~visitor, idx, n)[::-1])[::-1]
+    next_staff_session = np.append(session, -1)[next_staff]
+    answered = run_start & (next_staff_session == session)
+    gap_sessions = session[answered]
+    gaps = (t_pad[next_staff[answered]] - t[answered]).tolist()
+    gap_bounds = np.searchsorted(gap_sessions, np.arange(len(present) + 1)).tolist()
+
+    last_class = k[ends].tolist()
+    first_visitor = first_visitor.tolist()
+    first_reply = first_reply.tolist()
+    first_human = first_human.tolist()
+    first_response = first_response.tolist()
+    time_to_human = time_to_human.tolist()
+    for j, i in enumerate(present.tolist()):
+        if first_visitor[j] == n:
+            continue
+        results[i] = {
+            'first_response': first_response[j] if first_reply[j] < n else None,
+            'time_to_human': time_to_human[j] if first_human[j] < n else None,
+            'wait_gaps': gaps[gap_bounds[j]:gap_bounds[j + 1]],
+            'outcome': OUTCOMES[last_class[j]],
+        }
+    return results
+
+def _seconds(date):
+    return int((datetime.fromisoformat(date) - _EPOCH).total_seconds())
+
+def _timings_python(timelines):
+    """Mismo resultado que _timings_numpy, sesión por sesión"""
+    results = []
+    for dates, classes in timelines:
+        if VISITOR not in classes:
+            results.append(None)
+            continue
+        t = [_seconds(d) for d in dates]
+        first_visitor = classes.index(VISITOR)
+        first_response = time_to_human = None
+        for i in range(first_visitor + 1, len(classes)):
+            if classes[i] != VISITOR and first_response is None:
+                first_response = t[i] - t[first_visitor]
+            if classes[i] == HUMAN:
+                time_to_human = t[i] - t[first_visitor]
+                break
+        gaps = []
+        run_start = None
+        for i, cls in enumerate(classes):
+            if cls == VISITOR:
+                if run_start is None:
+                    run_start = i
+            elif run_start is not None:
+                gaps.append(t[i] - t[run_start])
+                run_start = None
+        results.append({
+            'first_response': first_response,
+            'time_to_human': time_to_human,
+            'wait_gaps': gaps,
+            'outcome': OUTCOMES[classes[-1]],
+        })
+    return results
+
+def session_timings(classified):
+    """Calcula c['timing'] de cada sesión clasificada (None si el visitante no escribió o no hay línea de tiempo)"""
+    timelines = [c.pop('timeline') for c in classified]
+    timed = [i for i, timeline in enumerate(timelines) if timeline is not None]
+    timelines = [timelines[i] for i in timed]
+    np = _numpy()
+    timings = _timings_numpy(np, timelines) if np is not None else _timings_python(timelines)
+    for c in classified:
+        c['timing'] = None
+    for i, timing in zip(timed, timings):
+        classified[i]['timing'] = timing
+    return classified
+
+def new_response_times():
+    return {'first_response': {}, 'time_to_human': {}, 'wait_gaps': {}, 'outcomes': {}}
+
+def duration_bucket(seconds):
+    """Cubeta del histograma de una duración en segundos"""
+    if seconds < EXACT_SECONDS:
+        return max(0, int(seconds))
+    return EXACT_SECONDS + int(math.log(seconds / EXACT_SECONDS, BUCKET_GROWTH))
+
+def bucket_value(bucket):
+    """Segundos que representa una cubeta (el centro geométrico en las logarítmicas)"""
+    if bucket < EXACT_SECONDS:
+        return bucket
+    return EXACT_SECONDS * BUCKET_GROWTH ** (bucket - EXACT_SECONDS + 0.5)
+
+def add_durations(histogram, values):
+    """Suma duraciones a un histograma {cubeta: veces} (claves de texto, como quedan en JSON)"""
+    for value in values:
+        key = str(duration_bucket(value))
+        histogram[key] = histogram.get(key, 0) + 1
+
+def merge_histograms(target, histogram):
+    for key, count in histogram.items():
+        target[key] = target.get(key, 0) + count
+
+def add_session_timing(response_times, c):
+    """Acumula los tiempos de una sesión en el parcial, bajo la hora UTC de creación"""
+    if c['session'].get('untimed'):
+        response_times['untimed'] = response_times.get('untimed', 0) + 1
+        return
+    timing = c.get('timing')
+    if timing is None:
+        return
+    hour = str(c['create_dt'].hour)
+    for name in ('first_response', 'time_to_human'):
+        if timing[name] is not None:
+            add_durations(response_times[name].setdefault(hour, {}), [timing[name]])
+    if timing['wait_gaps']:
+        add_durations(response_times['wait_gaps'].setdefault(hour, {}), timing['wait_gaps'])
+    outcomes = response_times['outcomes'].setdefault(hour, {})
+    outcomes[timing['outcome']] = outcomes.get(timing['outcome'], 0) + 1
+
+def histogram_percentiles(histogram):
+    """{50: p50, 90: p90, 95: p95} en segundos de un histograma, o None si está vacío.
+
+    Interpola entre posiciones igual que numpy.percentile; cada valor es el de su cubeta.
+    """
+    buckets = sorted((int(key), count) for key, count in histogram.items() if count)
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+
+    def value_at(rank):
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if rank < seen:
+                return bucket_value(bucket)
+        return bucket_value(buckets[-1][0])
+
+    result = {}
+    for q in PERCENTILES:
+        position = (total - 1) * q / 100
+        low = int(position)
+        low_value = value_at(low)
+        high_value = value_at(min(low + 1, total - 1))
+        result[q] = low_value + (high_value - low_value) * (position - low)
+    return result
+
+def _summary(durations, outcomes):
+    sessions = sum(outcomes.values())
+    summary = {'sessions': sessions}
+    for name in DURATIONS:
+        summary[name] = histogram_percentiles(durations[name])
+    humans = sum(durations['time_to_human'].values())
+    summary['human_rate'] = humans / sessions if sessions else 0.0
+    for outcome in OUTCOMES:
+        summary[outcome] = outcomes.get(outcome, 0) / sessions if sessions else 0.0
+    return summary
+
+def merge_response_times(partials):
+    """Percentiles y tasas por hora UTC (y del total) a partir de los parciales diarios.
+
+    'untimed' cuenta las sesiones sin línea de tiempo, que no entran en los percentiles.
+    """
+    durations = {}
+    outcomes = {}
+    untimed = 0
+    for day in partials:
+        rt = day.get('response_times')
+        if not rt:
+            continue
+        untimed += rt.get('untimed', 0)
+        for name in DURATIONS:
+            for hour, histogram in rt[name].items():
+                hour_durations = durations.setdefault(int(hour), {n: {} for n in DURATIONS})
+                merge_histograms(hour_durations[name], histogram)
+        for hour, counts in rt['outcomes'].items():
+            hour_outcomes = outcomes.setdefault(int(hour), {})
+            for outcome, count in counts.items():
+                hour_outcomes[outcome] = hour_outcomes.get(outcome, 0) + count
+
+    empty = {name: {} for name in DURATIONS}
+    total_durations = {name: {} for name in DURATIONS}
+    total_outcomes = {}
+    by_hour = {}
+    for hour in sorted(outcomes):
+        hour_durations = durations.get(hour, empty)
+        by_hour[hour] = _summary(hour_durations, outcomes[hour])
+        for name in DURATIONS:
+            merge_histograms(total_durations[name], hour_durations[name])
+        for outcome, count in outcomes[hour].items():
+            total_outcomes[outcome] = total_outcomes.get(outcome, 0) + count
+    return {'by_hour': by_hour, 'overall': _summary(total_durations, total_outcomes), 'untimed': untimed}
+
+def format_duration(seconds):
+    """45s, 3.2 min, 1.5 h"""
+    if seconds is None:
+        return '—'
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Worker persistente de análisis de chat para las tareas programadas de Node.
+
+Mantiene en memoria la sesión de Odoo, los clasificadores compilados y sus cachés,
+así cada llamada del scheduler solo paga la descarga y el análisis. Escucha HTTP
+en 127.0.0.1 (o en un socket Unix con --socket) y responde JSON:
+
+    GET  /health            estado, uid y tiempo en marcha
+    GET  /metrics           métricas por etapa y por RPC (textfile de Prometheus)
+    POST /analysis          {"since": "YYYY-MM-DD[ HH:MM:SS]", "channels": [ids]} -> agregados de odoo_chat_analysis
+    POST /leads             {"since": ..., "channels": [ids], "top": N} -> leads enriquecidos y ordenados
+
+Con varios canales /analysis incluye además "channels": {canal: agregados}.
+--deadline es el plazo de cada petición (no del proceso, que sigue en marcha).
+Con --rpc-cache cada petición vuelve a revisar write_date antes de usar la caché.
+"""
+
+import argparse
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import odoo_rpc
+from odoo_chat_common import fetch_and_classify
+from odoo_metrics import METRICS, to_prometheus
+import odoo_chat_analysis as analysis_report
+import odoo_chat_leads_report as leads_report
+
+DEFAULT_PORT = 8765
+# Clase de prioridad frente al limitador de RPC: cada petición tiene a una tarea del scheduler esperando
+WORKER_PRIORITY = 'critical'
+
+class ChatWorker:
+    """Sesión de Odoo compartida; cada hilo del servidor usa su propio proxy"""
+
+    def __init__(self, deadline=None):
+        self.started = time.time()
+        self.deadline = deadline  # segundos por petición de /analysis o /leads
+        self.uid = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def models(self):
+        with self._lock:
+            if self.uid is None:
+                self.uid, models = odoo_rpc.connect()
+                self._local.models = models
+                print(f"Conectado a Odoo. UID: {self.uid}")
+        if getattr(self._local, 'models', None) is None:
+            self._local.models = odoo_rpc.models_proxy()
+        return self.uid, self._local.models
+
+    def reset(self):
+        """Descarta el proxy del hilo (y la sesión) tras un error de conexión"""
+        self._local.models = None
+        with self._lock:
+            self.uid = None
+
+    def health(self):
+        return {'status': 'ok', 'uid': self.uid, 'uptime_s': round(time.time() - self.started, 1),
+                'transport': odoo_rpc.TRANSPORT}
+
+    def analysis(self, since=None, channels=None):
+        uid, models = self.models()
+        classified, _ = fetch_and_classify(uid, models, since=since, channel_ids=channels)
+        by_channel = channels is not None and len(channels) > 1
+        conversations = []
+        partials = analysis_report.summarize_sessions(classified, by_channel, conversations)
+        analysis = analysis_report.merge_partials(partials, conversations)
+        if by_channel:
+            analysis['channels'] = analysis_report.channel_analyses(partials, channels, conversations)
+        return {**analysis, 'since': since}
+
+    def leads(self, since=None, top=None, channels=None):
+        uid, models = self.models()
+        now = datetime.utcnow()
+        classified, _ = fetch_and_classify(uid, models, since=since, channel_ids=channels)
+        if top:
+            leads, emails = leads_report.TopLeads(top, now).consume(classified).leads()
+        else:
+            leads, emails = leads_report.build_leads(reversed(classified), now)
+        leads_report.apply_enrichment(leads, leads_report.enrich_from_odoo(uid, models, emails))
+        with_email, without_email = leads_report.split_leads(leads)
+        return {'since': since, 'generated_at': now.strftime('%Y-%m-%d %H:%M:%S'),
+                'leads_with_email': with_email, 'leads_without_email': without_email}
+
+class WorkerHandler(BaseHTTPRequestHandler):
+    worker = None
+
+    def address_string(self):
+        # En socket Unix client_address es una cadena vacía
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def _send(self, status, body, content_type='application/json'):
+        data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, self.worker.health())
+        elif self.path == '/metrics':
+            snap = METRICS.snapshot('odoo_chat_worker')
+            self._send(200, to_prometheus(snap).encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': f'Ruta desconocida: {self.path}'})
+
+    def do_POST(self):
+        routes = {'/analysis': self.worker.analysis, '/leads': self.worker.leads}
+        handler = routes.get(self.path)
+        if handler is None:
+            self._send(404, {'error': f'Ruta desconocida: {self.path}'})
+            return
+        # Solo los errores al leer la petición son del cliente; los del análisis van por el 500
+        try:
+            params = self._read_json()
+            if not isinstance(params, dict):
+                raise ValueError("el cuerpo debe ser un objeto JSON")
+            kwargs = {'since': params.get('since'), 'channels': params.get('channels')}
+            if kwargs['channels'] is not None:
+                kwargs['channels'] = sorted({int(channel) for channel in kwargs['channels']}) or None
+            if self.path == '/leads' and params.get('top') is not None:
+                kwargs['top'] = int(params['top'])
+        except (ValueError, TypeError) as exc:
+            self._send(400, {'error': f'Petición inválida: {exc}'})
+            return
+        try:
+            cache = odoo_rpc.rpc_cache()
+            if cache is not None:
+                # Como una corrida nueva de los scripts: nada cambiado en Odoo sale de la caché
+                cache.expire_checks()
+            with odoo_rpc.request_deadline(self.worker.deadline):
+                result = handler(**kwargs)
+        except Exception as exc:
+            traceback.print_exc()
+            self.worker.reset()
+            self._send(500, {'error': str(exc)})
+        else:
+            self._send(200, result)
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(worker, port=DEFAULT_PORT, socket_path=None):
+    handler = type('Handler', (WorkerHandler,), {'worker': worker})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker persistente de análisis de chat (HTTP local o socket Unix)")
+    parser.add_argument('--port', type=int, default=int(os.environ.get('ODOO_CHAT_WORKER_PORT', DEFAULT_PORT)),
+                        help=f"Puerto en 127.0.0.1 (default: {DEFAULT_PORT})")
+    parser.add_argument('--socket', metavar='RUTA', help="Escucha en un socket Unix en lugar de TCP")
+    odoo_rpc.add_priority_argument(parser, default=WORKER_PRIORITY)
+    odoo_rpc.add_cache_argument(parser)
+    odoo_rpc.add_transport_argument(parser)
+    odoo_rpc.add_deadline_arguments(parser, scope='cada petición')
+    args = parser.parse_args()
+    odoo_rpc.set_transport(args.transport)
+    odoo_rpc.set_cache(args.rpc_cache)
+    odoo_rpc.set_call_timeout(args.rpc_timeout)
+    odoo_rpc.set_hedging(args.hedge)
+    odoo_rpc.set_priority(args.priority or os.environ.get('ODOO_RPC_PRIORITY') or WORKER_PRIORITY)
+
+    worker = ChatWorker(args.deadline)
+    worker.models()  # autenticar al arrancar: la primera llamada ya encuentra la sesión lista
+    server = make_server(worker, args.port, args.socket)
+    print(f"Worker de chat escuchando en {args.socket or f'http://127.0.0.1:{args.port}'}")
+    # SIGTERM (systemd, pm2) termina igual que Ctrl+C y limpia el socket
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
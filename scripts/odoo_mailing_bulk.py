@@ -1,60 +1,110 @@
 #!/usr/bin/env python3
 """
-Script para agregar masivamente contactos con email a la mailing list de Odoo.
-Mailing List: "Contactos con Email" (ID: 3)
+Script para agregar masivamente contactos con email a mailing lists de Odoo.
+Por defecto llena la lista "Contactos con Email" (ID: 3); con --list o --targets
+llena varias listas en una sola corrida: un solo escaneo de partners, una sola
+descarga de contactos existentes y, por lista, creación y vinculación en lotes.
 """
 
-import xmlrpc.client
-import sys
-import time
 import json
 import os
+import sys
+import time
+import argparse
+from collections import defaultdict
 
-# Leer credenciales desde odoo_config.json del MCP
-CONFIG_PATH = os.path.expanduser("~/Dev/mcp/mcp-odoo/odoo_config.json")
-with open(CONFIG_PATH) as f:
-    cfg = json.load(f)
-
-URL = cfg["url"]
-DB = cfg["db"]
-USERNAME = cfg["username"]
-PASSWORD = cfg["password"]
+import odoo_rpc
+import odoo_profile
+from odoo_metrics import METRICS, write_metrics, print_summary
 
 MAILING_LIST_ID = 3
 BATCH_SIZE = 50  # Contactos por lote
+# Clase de prioridad frente al limitador de RPC: cede presupuesto a las sincronizaciones
+MAILING_PRIORITY = 'bulk'
+
+# Listas destino. Cada una puede acotar los partners con:
+#   'domain':    dominio extra sobre res.partner (se resuelve en Odoo con `search`, solo ids)
+#   'predicate': función partner -> bool evaluada sobre el escaneo (solo desde Python)
+MAILING_TARGETS = [
+    {'list_id': MAILING_LIST_ID, 'name': 'Contactos con Email', 'domain': [], 'predicate': None},
+]
+
+PARTNER_DOMAIN = [['email', '!=', False]]
+PARTNER_FIELDS = ['name', 'email']
 
 def connect():
-    common = xmlrpc.client.ServerProxy(f"{URL}/xmlrpc/2/common")
-    uid = common.authenticate(DB, USERNAME, PASSWORD, {})
-    if not uid:
+    try:
+        uid, models = odoo_rpc.connect()
+    except Exception:
         print("ERROR: No se pudo autenticar con Odoo")
         sys.exit(1)
     print(f"Autenticado correctamente. UID: {uid}")
-    models = xmlrpc.client.ServerProxy(f"{URL}/xmlrpc/2/object")
     return uid, models
 
-def get_partners_with_email(uid, models):
+def load_targets(path):
+    """Lee listas destino de un JSON: [{"list_id": 4, "name": "...", "domain": [...]}, ...]"""
+    with open(path, encoding='utf-8') as f:
+        targets = json.load(f)
+    for target in targets:
+        if 'list_id' not in target:
+            raise ValueError(f"Lista sin list_id en {path}: {target}")
+        target.setdefault('name', f"Lista {target['list_id']}")
+        target.setdefault('domain', [])
+        target.setdefault('predicate', None)
+    return targets
+
+@METRICS.timed('partner_scan')
+def get_partners_with_email(uid, models, fields=PARTNER_FIELDS):
     """Obtiene todos los partners con email"""
     partners = models.execute_kw(
-        DB, uid, PASSWORD,
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
         'res.partner', 'search_read',
-        [[['email', '!=', False]]],
-        {'fields': ['name', 'email'], 'order': 'id asc'}
+        [PARTNER_DOMAIN],
+        {'fields': fields, 'order': 'id asc'}
     )
     print(f"Total de contactos con email encontrados: {len(partners)}")
+    METRICS.add_items('partner_scan', len(partners))
     return partners
 
-def get_existing_mailing_contacts(uid, models):
-    """Obtiene emails ya existentes en la mailing list para evitar duplicados"""
+@METRICS.timed('partner_scan')
+def target_members(uid, models, targets, partners):
+    """{list_id: ids de partners que van a esa lista}; un dominio vacío acepta todo el escaneo"""
+    members = {}
+    for target in targets:
+        ids = {p['id'] for p in partners}
+        if target.get('domain'):
+            ids &= set(models.execute_kw(
+                odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+                'res.partner', 'search',
+                [PARTNER_DOMAIN + target['domain']]
+            ))
+        if target.get('predicate'):
+            ids = {p['id'] for p in partners if p['id'] in ids and target['predicate'](p)}
+        members[target['list_id']] = ids
+        print(f"  {target['name']} (lista {target['list_id']}): {len(ids)} partners")
+    return members
+
+@METRICS.timed('contact_scan')
+def get_existing_mailing_contacts(uid, models, list_ids=(MAILING_LIST_ID,)):
+    """{email: (id del contacto, listas destino en las que ya está)} en una sola búsqueda"""
     contacts = models.execute_kw(
-        DB, uid, PASSWORD,
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
         'mailing.contact', 'search_read',
-        [[['list_ids', 'in', [MAILING_LIST_ID]]]],
-        {'fields': ['email']}
+        [[['list_ids', 'in', list(list_ids)]]],
+        {'fields': ['email', 'list_ids']}
     )
-    existing_emails = set(c['email'].strip().lower() for c in contacts if c['email'])
-    print(f"Contactos ya existentes en la mailing list: {len(existing_emails)}")
-    return existing_emails
+    wanted = set(list_ids)
+    existing = {}
+    for c in contacts:
+        if not c['email']:
+            continue
+        email = c['email'].strip().lower()
+        # Si hay contactos repetidos se vincula al primero; las listas se combinan
+        contact_id, lists = existing.get(email, (c['id'], set()))
+        existing[email] = (contact_id, lists | (set(c['list_ids']) & wanted))
+    print(f"Contactos ya existentes en las mailing lists: {len(existing)}")
+    METRICS.add_items('contact_scan', len(contacts))
+    return existing
 
 def clean_email(email_str):
     """Limpia el email, tomando solo el primero si hay varios"""
@@ -70,63 +120,144 @@ def clean_email(email_str):
         return None
     return email
 
-def create_mailing_contacts(uid, models, partners, existing_emails):
-    """Crea contactos de mailing en lotes"""
+def _flush_creates(uid, models, batch, stats, existing):
+    """Crea un lote de contactos; sus ids quedan en `existing` para vincular listas posteriores del mismo email"""
+    try:
+        contact_ids = models.execute_kw(
+            odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+            'mailing.contact', 'create',
+            [batch]
+        )
+        for vals, contact_id in zip(batch, contact_ids):
+            existing[vals['email'].lower()] = (contact_id, set(vals['list_ids'][0][2]))
+            for list_id in vals['list_ids'][0][2]:
+                stats[list_id]['created'] += 1
+        return len(batch), 0
+    except Exception as e:
+        print(f"  Error en lote: {e}")
+        return 0, len(batch)
+
+def _flush_links(uid, models, list_id, contact_ids, stats):
+    """Agrega una lista a contactos existentes con un solo write (comando 4 = vincular)"""
+    try:
+        models.execute_kw(
+            odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+            'mailing.contact', 'write',
+            [contact_ids, {'list_ids': [[4, list_id]]}]
+        )
+        stats[list_id]['linked'] += len(contact_ids)
+        return 0
+    except Exception as e:
+        print(f"  Error vinculando a la lista {list_id}: {e}")
+        return len(contact_ids)
+
+@METRICS.timed('contact_create')
+def create_mailing_contacts(uid, models, partners, existing, members=None):
+    """Crea contactos nuevos (con todas sus listas) y vincula existentes, en lotes.
+
+    `members` es {list_id: ids de partners}; sin él todos van a MAILING_LIST_ID.
+    Devuelve (creados, omitidos, errores, estadísticas por lista).
+    """
+    members = members or {MAILING_LIST_ID: {p['id'] for p in partners}}
     total = len(partners)
     created = 0
     skipped = 0
     errors = 0
+    stats = {list_id: defaultdict(int) for list_id in members}
     
     batch = []
+    pending = {}  # email -> valores del contacto nuevo que todavía está en `batch`
+    links = defaultdict(list)  # list_id -> ids de contactos por vincular
     
     for i, partner in enumerate(partners):
         email = clean_email(partner['email'])
         if not email:
             skipped += 1
             continue
-            
-        if email.lower() in existing_emails:
+        
+        targets = [list_id for list_id, ids in members.items() if partner['id'] in ids]
+        if not targets:
+            continue
+        contact_id, in_lists = existing.get(email.lower(), (None, set()))
+        missing = [list_id for list_id in targets if list_id not in in_lists]
+        for list_id in targets:
+            if list_id in in_lists:
+                stats[list_id]['skipped'] += 1
+        if not missing:
             skipped += 1
             continue
+        # Evitar duplicados dentro del mismo proceso
+        existing[email.lower()] = (contact_id, in_lists | set(missing))
         
-        batch.append({
-            'name': partner['name'],
-            'email': email,
-            'list_ids': [[6, 0, [MAILING_LIST_ID]]]
-        })
-        existing_emails.add(email.lower())  # Evitar duplicados dentro del mismo proceso
-        
-        if len(batch) >= BATCH_SIZE:
-            try:
-                models.execute_kw(
-                    DB, uid, PASSWORD,
-                    'mailing.contact', 'create',
-                    [batch]
-                )
-                created += len(batch)
+        if contact_id is None and email.lower() in pending:
+            # Otro partner con el mismo email: sus listas van al contacto que aún no se creó
+            pending[email.lower()]['list_ids'][0][2].extend(missing)
+        elif contact_id is None:
+            # Contacto nuevo: un solo registro con todas sus listas destino
+            pending[email.lower()] = {
+                'name': partner['name'],
+                'email': email,
+                'list_ids': [[6, 0, missing]]
+            }
+            batch.append(pending[email.lower()])
+            if len(batch) >= BATCH_SIZE:
+                ok, failed = _flush_creates(uid, models, batch, stats, existing)
+                created += ok
+                errors += failed
                 progress = ((i + 1) / total) * 100
                 print(f"  Progreso: {progress:.1f}% - Creados: {created} | Omitidos: {skipped} | Errores: {errors}")
-            except Exception as e:
-                errors += len(batch)
-                print(f"  Error en lote: {e}")
-            batch = []
+                batch = []
+                pending = {}
+        else:
+            for list_id in missing:
+                links[list_id].append(contact_id)
+                if len(links[list_id]) >= BATCH_SIZE:
+                    errors += _flush_links(uid, models, list_id, links.pop(list_id), stats)
     
-    # Procesar último lote
+    # Procesar últimos lotes
     if batch:
-        try:
-            models.execute_kw(
-                DB, uid, PASSWORD,
-                'mailing.contact', 'create',
-                [batch]
-            )
-            created += len(batch)
-        except Exception as e:
-            errors += len(batch)
-            print(f"  Error en último lote: {e}")
+        ok, failed = _flush_creates(uid, models, batch, stats, existing)
+        created += ok
+        errors += failed
+    for list_id, contact_ids in links.items():
+        errors += _flush_links(uid, models, list_id, contact_ids, stats)
     
-    return created, skipped, errors
+    METRICS.add_items('contact_create', created)
+    return created, skipped, errors, stats
 
 def main():
+    parser = argparse.ArgumentParser(description="Carga masiva de contactos a mailing lists de Odoo")
+    targets_group = parser.add_mutually_exclusive_group()
+    targets_group.add_argument('--list', type=int, action='append', metavar='ID', dest='list_ids',
+                               help=f"Mailing list destino (repetible; default: {MAILING_LIST_ID})")
+    targets_group.add_argument('--targets', metavar='ARCHIVO.json',
+                               help="Listas destino con dominio de partners: "
+                                    "[{\"list_id\": 4, \"name\": \"...\", \"domain\": [[\"city\", \"=\", \"Tijuana\"]]}]")
+    parser.add_argument('--metrics', metavar='PREFIJO',
+                        help="Escribe PREFIJO.json y PREFIJO.prom (textfile de node_exporter) con métricas por etapa")
+    odoo_profile.add_profile_argument(parser)
+    odoo_rpc.add_priority_argument(parser, default=MAILING_PRIORITY)
+    odoo_rpc.add_cache_argument(parser)
+    odoo_rpc.add_transport_argument(parser)
+    odoo_rpc.add_deadline_arguments(parser)
+    args = parser.parse_args()
+    odoo_rpc.set_transport(args.transport)
+    odoo_rpc.set_cache(args.rpc_cache)
+    odoo_rpc.set_call_timeout(args.rpc_timeout)
+    odoo_rpc.set_hedging(args.hedge)
+    odoo_rpc.set_deadline(args.deadline)
+    odoo_rpc.set_priority(args.priority or os.environ.get('ODOO_RPC_PRIORITY') or MAILING_PRIORITY)
+    odoo_profile.start(args.profile)
+    
+    if args.targets:
+        targets = load_targets(args.targets)
+    elif args.list_ids:
+        targets = [{'list_id': list_id, 'name': f"Lista {list_id}", 'domain': [], 'predicate': None}
+                   for list_id in dict.fromkeys(args.list_ids)]
+    else:
+        targets = MAILING_TARGETS
+    list_ids = [t['list_id'] for t in targets]
+    
     print("=" * 60)
     print("CARGA MASIVA DE CONTACTOS A MAILING LIST DE ODOO")
     print("=" * 60)
@@ -136,13 +267,14 @@ def main():
     
     print("\n2. Obteniendo contactos con email...")
     partners = get_partners_with_email(uid, models)
+    members = target_members(uid, models, targets, partners)
     
-    print("\n3. Verificando contactos existentes en la mailing list...")
-    existing_emails = get_existing_mailing_contacts(uid, models)
+    print("\n3. Verificando contactos existentes en las mailing lists...")
+    existing = get_existing_mailing_contacts(uid, models, list_ids)
     
     print(f"\n4. Creando contactos de mailing en lotes de {BATCH_SIZE}...")
     start_time = time.time()
-    created, skipped, errors = create_mailing_contacts(uid, models, partners, existing_emails)
+    created, skipped, errors, stats = create_mailing_contacts(uid, models, partners, existing, members)
     elapsed = time.time() - start_time
     
     print("\n" + "=" * 60)
@@ -153,7 +285,16 @@ def main():
     print(f"  Contactos omitidos:       {skipped} (duplicados o email inválido)")
     print(f"  Errores:                  {errors}")
     print(f"  Tiempo total:             {elapsed:.1f} segundos")
+    if len(targets) > 1:
+        print("\n  Por lista:")
+        for target in targets:
+            counts = stats[target['list_id']]
+            print(f"    {target['name']:<28} creados {counts['created']:>6} | vinculados {counts['linked']:>6} "
+                  f"| ya estaban {counts['skipped']:>6}")
     print("=" * 60)
+    
+    if args.metrics:
+        print_summary(write_metrics(args.metrics, 'odoo_mailing_bulk'))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Instrumentación de los scripts de Odoo: tiempo por etapa (wall/CPU), elementos
+procesados, llamadas RPC con histograma de latencia por modelo/método y bytes recibidos.
+Los percentiles p50/p95/p99 salen de las latencias recientes de cada método (también
+los usa odoo_rpc para decidir cuándo duplicar una lectura lenta).
+Se exporta como JSON y como textfile de node_exporter (formato Prometheus).
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Límites (segundos) del histograma de latencia RPC
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+LATENCY_SAMPLES = 2048  # latencias recientes (sin error) que se guardan por modelo/método
+
+METRIC_PREFIX = 'odoo_report'
+
+def _quantile(ordered, q):
+    # Rango más cercano: siempre es una latencia observada
+    return ordered[max(0, min(len(ordered), math.ceil(round(q * len(ordered), 9))) - 1)]
+
+class Metrics:
+    """Acumulador de métricas de una ejecución (seguro entre hilos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Recibe enter(etapa)/exit(etapa) de cada etapa (ver odoo_profile)
+        self.observer = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._start_wall = time.perf_counter()
+            self._start_cpu = time.process_time()
+            self.stages = {}
+            self.rpc = {}
+            self._latencies = {}
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'items': 0, 'calls': 0})
+
+    def add_time(self, name, wall, cpu, items=0):
+        with self._lock:
+            stage = self._stage(name)
+            stage['wall_seconds'] += wall
+            stage['cpu_seconds'] += cpu
+            stage['items'] += items
+            stage['calls'] += 1
+
+    def add_items(self, name, items):
+        with self._lock:
+            self._stage(name)['items'] += items
+
+    @contextmanager
+    def stage(self, name, items=0):
+        """Mide una etapa; el CPU es del hilo actual para no contar trabajo de otros hilos"""
+        observer = self.observer
+        if observer is not None:
+            observer.enter(name)
+        wall0 = time.perf_counter()
+        cpu0 = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall0, time.thread_time() - cpu0, items)
+            if observer is not None:
+                observer.exit(name)
+
+    def timed(self, name):
+        """Decorador equivalente a `with stage(name)`"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _rpc_entry(self, model, method):
+        return self.rpc.setdefault(f'{model}.{method}', {
+            'model': model, 'method': method, 'calls': 0, 'errors': 0,
+            'seconds_sum': 0.0, 'bytes_received': 0, 'throttled_seconds': 0.0, 'cache_hits': 0,
+            'hedges': 0, 'hedge_wins': 0,
+            'buckets': [0] * len(LATENCY_BUCKETS),
+        })
+
+    def record_rpc(self, model, method, seconds, bytes_received=0, error=False, throttled=0.0, hedge=None):
+        """`throttled`: segundos esperando al limitador antes de la llamada (no cuentan en la latencia).
+        `hedge`: None si no se duplicó la llamada; si se duplicó, True cuando ganó el duplicado.
+        """
+        with self._lock:
+            entry = self._rpc_entry(model, method)
+            entry['calls'] += 1
+            entry['errors'] += int(error)
+            if hedge is not None:
+                entry['hedges'] += 1
+                entry['hedge_wins'] += int(hedge)
+            if not error:
+                key = f'{model}.{method}'
+                if key not in self._latencies:
+                    self._latencies[key] = deque(maxlen=LATENCY_SAMPLES)
+                self._latencies[key].append(seconds)
+            entry['seconds_sum'] += seconds
+            entry['throttled_seconds'] += throttled
+            entry['bytes_received'] += bytes_received
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+
+    def latency_quantile(self, model, method, q, min_samples=1):
+        """Cuantil `q` (0-1) de las latencias recientes de model.method; None con menos de `min_samples`"""
+        with self._lock:
+            samples = self._latencies.get(f'{model}.{method}')
+            if samples is None or len(samples) < min_samples:
+                return None
+            return _quantile(sorted(samples), q)
+
+    def record_cache_hit(self, model, method):
+        """Llamada respondida por odoo_rpc_cache (no cuenta como llamada RPC)"""
+        with self._lock:
+            self._rpc_entry(model, method)['cache_hits'] += 1
+
+    def snapshot(self, job):
+        with self._lock:
+            rpc = json.loads(json.dumps(self.rpc))
+            for key, entry in rpc.items():
+                ordered = sorted(self._latencies.get(key, ()))
+                for q in LATENCY_QUANTILES:
+                    entry[f'p{q * 100:g}'] = _quantile(ordered, q) if ordered else None
+            return {
+                'job': job,
+                'started_at': self.started_at,
+                'wall_seconds': time.perf_counter() - self._start_wall,
+                'cpu_seconds': time.process_time() - self._start_cpu,
+                'stages': json.loads(json.dumps(self.stages)),
+                'rpc': rpc,
+                'latency_buckets': LATENCY_BUCKETS,
+            }
+
+METRICS = Metrics()
+
+def _labels(**labels):
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+def to_prometheus(snap):
+    """Serializa un snapshot en formato de exposición de texto de Prometheus"""
+    p = METRIC_PREFIX
+    job = snap['job']
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {p}_{name} {help_text}')
+        lines.append(f'# TYPE {p}_{name} {kind}')
+
+    header('last_run_timestamp_seconds', 'gauge', 'Inicio de la última ejecución (epoch)')
+    lines.append(f'{p}_last_run_timestamp_seconds{_labels(job=job)} {snap["started_at"]:.3f}')
+    header('run_wall_seconds', 'gauge', 'Duración total de la ejecución')
+    lines.append(f'{p}_run_wall_seconds{_labels(job=job)} {snap["wall_seconds"]:.6f}')
+    header('run_cpu_seconds', 'gauge', 'CPU total del proceso')
+    lines.append(f'{p}_run_cpu_seconds{_labels(job=job)} {snap["cpu_seconds"]:.6f}')
+
+    for metric, key, help_text in [
+        ('stage_wall_seconds', 'wall_seconds', 'Tiempo de reloj por etapa'),
+        ('stage_cpu_seconds', 'cpu_seconds', 'Tiempo de CPU por etapa'),
+        ('stage_items', 'items', 'Elementos procesados por etapa'),
+    ]:
+        header(metric, 'gauge', help_text)
+        for name, stage in sorted(snap['stages'].items()):
+            value = stage[key]
+            value = f'{value:.6f}' if isinstance(value, float) else str(value)
+            lines.append(f'{p}_{metric}{_labels(job=job, stage=name)} {value}')
+
+    rpc = sorted(snap['rpc'].values(), key=lambda e: (e['model'], e['method']))
+    header('rpc_calls_total', 'counter', 'Llamadas RPC por modelo/método')
+    for e in rpc:
+        lines.append(f'{p}_rpc_calls_total{_labels(job=job, model=e["model"], method=e["method"])} {e["calls"]}')
+    header('rpc_errors_total', 'counter', 'Llamadas RPC con error')
+    for e in rpc:
+        lines.append(f'{p}_rpc_errors_total{_labels(job=job, model=e["model"], method=e["method"])} {e["errors"]}')
+    header('rpc_received_bytes_total', 'counter', 'Bytes recibidos (aprox., tal como llegan por la red)')
+    for e in rpc:
+        lines.append(f'{p}_rpc_received_bytes_total{_labels(job=job, model=e["model"], method=e["method"])} {e["bytes_received"]}')
+    header('rpc_cache_hits_total', 'counter', 'Lecturas respondidas desde la caché en disco')
+    for e in rpc:
+        lines.append(f'{p}_rpc_cache_hits_total{_labels(job=job, model=e["model"], method=e["method"])} {e["cache_hits"]}')
+    header('rpc_throttled_seconds_total', 'counter', 'Tiempo esperando al limitador de RPC')
+    for e in rpc:
+        lines.append(f'{p}_rpc_throttled_seconds_total{_labels(job=job, model=e["model"], method=e["method"])} '
+                     f'{e["throttled_seconds"]:.6f}')
+    header('rpc_hedges_total', 'counter', 'Lecturas lentas duplicadas por otra conexión')
+    for e in rpc:
+        lines.append(f'{p}_rpc_hedges_total{_labels(job=job, model=e["model"], method=e["method"])} {e["hedges"]}')
+    header('rpc_hedge_wins_total', 'counter', 'Lecturas duplicadas en las que respondió primero el duplicado')
+    for e in rpc:
+        lines.append(f'{p}_rpc_hedge_wins_total{_labels(job=job, model=e["model"], method=e["method"])} {e["hedge_wins"]}')
+    header('rpc_latency_quantile_seconds', 'gauge', 'Percentiles de latencia de las llamadas RPC recientes')
+    for e in rpc:
+        for q in LATENCY_QUANTILES:
+            value = e[f'p{q * 100:g}']
+            if value is not None:
+                lines.append(f'{p}_rpc_latency_quantile_seconds'
+                             f'{_labels(job=job, model=e["model"], method=e["method"], quantile=q)} {value:.6f}')
+    header('rpc_latency_seconds', 'histogram', 'Latencia de llamadas RPC')
+    for e in rpc:
+        base = dict(job=job, model=e['model'], method=e['method'])
+        for bound, count in zip(snap['latency_buckets'], e['buckets']):
+            lines.append(f'{p}_rpc_latency_seconds_bucket{_labels(**base, le=bound)} {count}')
+        lines.append(f'{p}_rpc_latency_seconds_bucket{_labels(**base, le="+Inf")} {e["calls"]}')
+        lines.append(f'{p}_rpc_latency_seconds_sum{_labels(**base)} {e["seconds_sum"]:.6f}')
+        lines.append(f'{p}_rpc_latency_seconds_count{_labels(**base)} {e["calls"]}')
+
+    return '\n'.join(lines) + '\n'
+
+def _write_atomic(path, content):
+    # node_exporter puede leer el textfile en cualquier momento: escribir y renombrar
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def write_metrics(prefix, job):
+    """Escribe `{prefix}.json` y `{prefix}.prom` con las métricas de la ejecución"""
+    snap = METRICS.snapshot(job)
+    directory = os.path.dirname(os.path.abspath(prefix))
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(f'{prefix}.json', json.dumps(snap, indent=2, ensure_ascii=False))
+    _write_atomic(f'{prefix}.prom', to_prometheus(snap))
+    return snap
+
+def print_summary(snap):
+    """Resumen legible de etapas y RPC al final de la ejecución"""
+    print(f"\nMétricas ({snap['job']}): {snap['wall_seconds']:.1f}s reloj, {snap['cpu_seconds']:.1f}s CPU")
+    for name, stage in sorted(snap['stages'].items(), key=lambda x: x[1]['wall_seconds'], reverse=True):
+        print(f"  {name:<18} {stage['wall_seconds']:8.2f}s  CPU {stage['cpu_seconds']:8.2f}s  items {stage['items']}")
+    for key, e in sorted(snap['rpc'].items()):
+        avg = e['seconds_sum'] / max(e['calls'], 1)
+        extra = f"  caché {e['cache_hits']}" if e['cache_hits'] else ""
+        if e['throttled_seconds']:
+            extra += f"  limitador {e['throttled_seconds']:.1f}s"
+        if e['hedges']:
+            extra += f"  duplicadas {e['hedges']} (ganó el duplicado {e['hedge_wins']})"
+        if e['p50'] is not None:
+            extra = f"  p50/p95/p99 {e['p50'] * 1000:.0f}/{e['p95'] * 1000:.0f}/{e['p99'] * 1000:.0f} ms" + extra
+        print(f"  RPC {key:<30} {e['calls']:6d} llamadas  prom {avg * 1000:7.1f} ms  "
+              f"{e['bytes_received'] / 1024:10.1f} KiB{extra}")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Modo --profile de los scripts de Odoo: perfil por etapa de METRICS.
+
+Cada etapa (session_paging, message_fetch, classification, csv_write, ...) se
+perfila con su propio cProfile, uno por hilo, y el trabajo fuera de etapas del
+hilo principal queda en 'fuera_de_etapa'. Un hilo muestreador toma además la
+pila de cada hilo cada PROFILE_INTERVAL segundos y la atribuye a su etapa en curso.
+
+Al terminar la ejecución se escriben:
+    PREFIJO.<etapa>.pstats       estadísticas de cProfile (python -m pstats, snakeviz)
+    PREFIJO.<etapa>.collapsed    pilas colapsadas 'a;b;c N' (flamegraph.pl, speedscope)
+    PREFIJO.<función>.collapsed  pilas a partir de cada función de PROFILE_FOCUS
+y se imprimen las funciones más costosas de cada etapa.
+
+En Python 3.12+ solo puede haber un cProfile activo por intérprete: las etapas
+que se solapan entre hilos (modo pipeline) se quedan sin perfil determinista y
+se cuentan como omitidas; el muestreo sí las cubre.
+"""
+
+import atexit
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+
+from odoo_metrics import METRICS
+
+PROFILE_INTERVAL = 0.005  # Segundos entre muestras de pilas
+PROFILE_TOP = 8           # Funciones por etapa en el resumen
+OUTSIDE_STAGE = 'fuera_de_etapa'
+
+# Funciones calientes conocidas: resumen propio y pilas colapsadas desde ellas
+PROFILE_FOCUS = ['strip_html', 'classify_session', 'calculate_priority']
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', metavar='PREFIJO',
+                        help="Perfila cada etapa: PREFIJO.<etapa>.pstats y .collapsed (flamegraph) "
+                             "y resumen de funciones más costosas al terminar")
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+def collapse_stack(frame):
+    """Pila de un frame en formato colapsado (raíz primero, separada por ';')"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+def _function_label(key):
+    filename, line, name = key
+    if filename == '~':  # funciones built-in
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+class StageProfiler:
+    """Un cProfile por etapa y hilo, más muestreo de pilas para flamegraphs"""
+
+    def __init__(self, prefix, interval=PROFILE_INTERVAL):
+        self.prefix = prefix
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles = defaultdict(list)    # etapa -> [cProfile.Profile] (uno por hilo)
+        self._current = {}                    # id de hilo -> etapa en curso (lo lee el muestreador)
+        self._samples = defaultdict(Counter)  # etapa -> {pila colapsada: muestras}
+        self._skipped = Counter()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._finished = False
+
+    def start(self):
+        METRICS.observer = self
+        self.enter(OUTSIDE_STAGE)
+        self._sampler = threading.Thread(target=self._sample_loop, name='odoo-profile-sampler', daemon=True)
+        self._sampler.start()
+        return self
+
+    def _thread_state(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+            self._local.profiles = {}
+        return self._local
+
+    def _enable(self, state, name):
+        import cProfile
+
+        profile = state.profiles.get(name)
+        if profile is None:
+            profile = state.profiles[name] = cProfile.Profile()
+            with self._lock:
+                self._profiles[name].append(profile)
+        try:
+            profile.enable()
+        except ValueError:
+            # Otro cProfile activo en el intérprete (Python 3.12+)
+            with self._lock:
+                self._skipped[name] += 1
+            return None
+        return profile
+
+    def enter(self, name):
+        """Entrada a una etapa: pausa el perfil de la etapa exterior y activa el de esta"""
+        state = self._thread_state()
+        if state.stack and state.stack[-1][1] is not None:
+            state.stack[-1][1].disable()
+        state.stack.append((name, self._enable(state, name)))
+        self._current[threading.get_ident()] = name
+
+    def exit(self, name):
+        state = self._thread_state()
+        _, profile = state.stack.pop()
+        if profile is not None:
+            profile.disable()
+        if state.stack:
+            outer = state.stack[-1][0]
+            state.stack[-1] = (outer, self._enable(state, outer))
+            self._current[threading.get_ident()] = outer
+        else:
+            self._current.pop(threading.get_ident(), None)
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, stage in list(self._current.items()):
+                frame = frames.get(ident)
+                if frame is not None and ident != own:
+                    self._samples[stage][collapse_stack(frame)] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        if self._thread_state().stack:
+            self.exit(OUTSIDE_STAGE)
+        METRICS.observer = None
+
+    def stage_stats(self):
+        """{etapa: pstats.Stats} combinando los perfiles de todos los hilos"""
+        import pstats  # trae inspect y dataclasses (~20 ms): solo al terminar un --profile
+
+        result = {}
+        for name, profiles in sorted(self._profiles.items()):
+            stats = None
+            for profile in profiles:
+                profile.create_stats()
+                if not profile.stats:
+                    continue
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            if stats is not None:
+                result[name] = stats
+        return result
+
+    def _write_collapsed(self, path, samples):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(samples.items()):
+                f.write(f"{stack} {count}\n")
+
+    def focus_samples(self, func_name):
+        """Pilas colapsadas que pasan por `func_name`, recortadas para empezar en ella"""
+        suffix = f":{func_name}"
+        focused = Counter()
+        for samples in self._samples.values():
+            for stack, count in samples.items():
+                frames = stack.split(';')
+                for i, label in enumerate(frames):
+                    if label.endswith(suffix):
+                        focused[';'.join(frames[i:])] += count
+                        break
+        return focused
+
+    def write(self, stats_by_stage):
+        """Escribe .pstats y .collapsed por etapa y por función de PROFILE_FOCUS"""
+        directory = os.path.dirname(os.path.abspath(self.prefix))
+        os.makedirs(directory, exist_ok=True)
+        written = []
+        for name, stats in stats_by_stage.items():
+            path = f"{self.prefix}.{name}.pstats"
+            stats.dump_stats(path)
+            written.append(path)
+        for name, samples in sorted(self._samples.items()):
+            path = f"{self.prefix}.{name}.collapsed"
+            self._write_collapsed(path, samples)
+            written.append(path)
+        for func_name in PROFILE_FOCUS:
+            samples = self.focus_samples(func_name)
+            if samples:
+                path = f"{self.prefix}.{func_name}.collapsed"
+                self._write_collapsed(path, samples)
+                written.append(path)
+        return written
+
+    def finish(self, top=PROFILE_TOP):
+        """Detiene el perfil, escribe los archivos e imprime el resumen (una sola vez)"""
+        if self._finished:
+            return
+        self._finished = True
+        self.stop()
+        stats_by_stage = self.stage_stats()
+        written = self.write(stats_by_stage)
+        print_profile_summary(stats_by_stage, self._samples, self._skipped, top)
+        print(f"\nPerfil: {len(written)} archivos en {os.path.dirname(os.path.abspath(self.prefix))}/")
+
+def print_profile_summary(stats_by_stage, samples, skipped, top=PROFILE_TOP):
+    """Funciones con más tiempo propio por etapa y resumen de las funciones de PROFILE_FOCUS"""
+    print("\nPerfil por etapa (tiempo propio / acumulado / llamadas):")
+    for name, stats in sorted(stats_by_stage.items(), key=lambda x: x[1].total_tt, reverse=True):
+        sampled = sum(samples.get(name, {}).values())
+        extra = f", {skipped[name]} entradas sin perfil" if skipped.get(name) else ""
+        print(f"  {name}: {stats.total_tt:.2f}s perfilados, {sampled} muestras{extra}")
+        hottest = sorted(stats.stats.items(), key=lambda x: x[1][2], reverse=True)[:top]
+        for key, (_, calls, tottime, cumtime, _) in hottest:
+            print(f"    {tottime:8.3f}s {cumtime:8.3f}s {calls:9d}  {_function_label(key)}")
+
+    focus = [(func_name, name, entry) for func_name in PROFILE_FOCUS
+             for name, stats in stats_by_stage.items()
+             for key, entry in stats.stats.items() if key[2] == func_name]
+    if focus:
+        print("\nFunciones vigiladas (etapa: llamadas, tiempo acumulado):")
+        for func_name, name, (_, calls, _, cumtime, _) in focus:
+            print(f"  {func_name:<20} {name}: {calls} llamadas, {cumtime:.3f}s")
+
+def start(prefix):
+    """Activa el perfil si se pidió (--profile); el resumen se escribe al salir del proceso,
+    así también cubre las salidas tempranas (nada que regenerar, errores)"""
+    if not prefix:
+        return None
+    profiler = StageProfiler(prefix).start()
+    atexit.register(profiler.finish)
+    return profiler
+
+def main():
+    import argparse
+    import pstats
+
+    parser = argparse.ArgumentParser(description="Resumen de un perfil guardado por --profile")
+    parser.add_argument('pstats', nargs='+', help="Archivos PREFIJO.<etapa>.pstats")
+    parser.add_argument('--top', type=int, default=PROFILE_TOP, help="Funciones por etapa")
+    args = parser.parse_args()
+    stats_by_stage = {}
+    for path in args.pstats:
+        name = os.path.basename(path).rsplit('.', 2)[-2]
+        stats_by_stage[name] = pstats.Stats(path)
+    print_profile_summary(stats_by_stage, {}, {}, args.top)
+
+if __name__ == "__main__":
+    main()
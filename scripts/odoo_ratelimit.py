@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Limitador de tráfico RPC hacia Odoo compartido entre procesos (token bucket).
+
+Todos los scripts de Python que usan odoo_rpc comparten los buckets a través de
+un archivo de estado protegido con flock: una carga masiva y los reportes de chat
+corriendo al mismo tiempo se reparten el mismo presupuesto. Cada llamada toma una
+ficha del bucket global ('*') y del más específico que aplique ('modelo.método'
+o 'modelo.*').
+
+Clases de prioridad: cada una solo puede usar las fichas por encima de su reserva
+(fracción del burst). 'bulk' corre a toda la tasa cuando nadie más pide, pero deja
+la mitad del bucket para el tráfico 'critical' y 'normal'.
+
+Desactivado por defecto: se activa con ODOO_RATE_LIMIT=on, "rate_limit": true o
+definiendo "rate_limits" en odoo_config.json ({"mail.message.read": [10, 20], ...}
+= fichas por segundo, burst); ODOO_RATE_LIMIT=off lo apaga siempre. Solo lo
+respetan los scripts de Python: la sincronización de Wix en Node no toma fichas.
+"""
+
+import json
+import os
+import threading
+import time
+
+RATE_LIMIT_PATH = os.path.expanduser(os.environ.get('ODOO_RATE_LIMIT_FILE', "~/Dev/wix-tasks/state/odoo_rate_limit.json"))
+
+# 'modelo.método' / 'modelo.*' / '*' -> (fichas por segundo, burst)
+RATE_LIMITS = {
+    '*': (40.0, 80),
+    'mail.message.read': (20.0, 40),
+    'discuss.channel.search_read': (20.0, 40),
+    'res.partner.search_read': (20.0, 40),
+    'mailing.contact.*': (10.0, 20),
+}
+
+PRIORITIES = ('critical', 'normal', 'bulk')
+# Fracción del burst que cada prioridad deja libre para las más altas
+PRIORITY_RESERVE = {'critical': 0.0, 'normal': 0.2, 'bulk': 0.5}
+MAX_SLEEP = 1.0  # Segundos máximos entre reintentos (otro proceso pudo liberar presupuesto)
+
+class RateLimiter:
+    """Token buckets en un archivo compartido; seguro entre hilos y entre procesos"""
+
+    def __init__(self, limits=None, path=RATE_LIMIT_PATH):
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self.path = path
+        # flock protege entre procesos; entre hilos del mismo proceso (mismo archivo abierto) no
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def bucket_keys(self, model, method):
+        """Buckets que paga una llamada: el global y el más específico configurado"""
+        keys = ['*'] if '*' in self.limits else []
+        for key in (f'{model}.{method}', f'{model}.*'):
+            if key in self.limits:
+                keys.append(key)
+                break
+        return keys
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'a+', encoding='utf-8')
+        return self._file
+
+    def _try_take(self, keys, reserve):
+        """Toma una ficha de cada bucket o devuelve los segundos a esperar"""
+        import fcntl
+
+        with self._thread_lock:
+            f = self._open()
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}  # archivo truncado por un proceso interrumpido: se reinicia
+                now = time.time()
+                wait = 0.0
+                for key in keys:
+                    rate, burst = self.limits[key]
+                    tokens, updated = state.get(key, (burst, now))
+                    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+                    state[key] = (tokens, now)
+                    available = tokens - reserve * burst
+                    if available < 1:
+                        wait = max(wait, (1 - available) / rate)
+                if wait == 0.0:
+                    for key in keys:
+                        tokens, _ = state[key]
+                        state[key] = (tokens - 1, now)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return wait
+
+    def acquire(self, model, method, priority='normal'):
+        """Bloquea hasta tener presupuesto para una llamada; devuelve los segundos esperados"""
+        keys = self.bucket_keys(model, method)
+        if not keys:
+            return 0.0
+        reserve = PRIORITY_RESERVE[priority]
+        waited = 0.0
+        while True:
+            wait = self._try_take(keys, reserve)
+            if wait <= 0:
+                return waited
+            wait = min(wait, MAX_SLEEP)
+            time.sleep(wait)
+            waited += wait
+
+def limits_from_config(config):
+    """RATE_LIMITS con los presupuestos de "rate_limits" del config; None si está desactivado"""
+    env = os.environ.get('ODOO_RATE_LIMIT', '').lower()
+    if env in ('0', 'off', 'false', 'no'):
+        return None
+    enabled = env in ('1', 'on', 'true', 'yes') or config.get('rate_limit', bool(config.get('rate_limits')))
+    if not enabled:
+        return None
+    limits = dict(RATE_LIMITS)
+    for key, (rate, burst) in (config.get('rate_limits') or {}).items():
+        if not rate > 0 or not burst >= 1:
+            raise ValueError(f"rate_limits[{key!r}] inválido: [{rate}, {burst}] "
+                             "(fichas por segundo > 0, burst >= 1)")
+        limits[key] = (float(rate), burst)
+    return limits
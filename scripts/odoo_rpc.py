@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+"""
+Capa de acceso a Odoo compartida por los scripts de Python.
+Lee credenciales, autentica y devuelve un proxy de modelos instrumentado.
+El transporte puede ser XML-RPC (default) o JSON-RPC (`/jsonrpc`, con gzip).
+
+Importar este módulo no tiene efectos: odoo_config.json se lee en el primer
+acceso a URL/DB/USERNAME/PASSWORD/TRANSPORT y xmlrpc.client/http.client se
+cargan al crear el primer proxy.
+
+Cada llamada tiene un timeout de socket (--rpc-timeout) acotado por el plazo de
+la corrida (--deadline) o de la petición del worker (request_deadline()); pasado
+el plazo las llamadas lanzan DeadlineExceeded.
+Con --hedge las lecturas idempotentes que tardan más que su p95 observado se
+duplican por otra conexión: se usa la primera respuesta y se corta la otra.
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from odoo_metrics import METRICS
+from odoo_ratelimit import PRIORITIES, RateLimiter, limits_from_config
+from odoo_rpc_cache import CACHEABLE_METHODS, RpcCache
+
+# Credenciales en odoo_config.json del MCP (ODOO_CONFIG apunta a otro archivo)
+CONFIG_PATH = os.path.expanduser(os.environ.get('ODOO_CONFIG', "~/Dev/mcp/mcp-odoo/odoo_config.json"))
+_CONFIG_KEYS = {'URL': 'url', 'DB': 'db', 'USERNAME': 'username', 'PASSWORD': 'password'}
+
+TRANSPORTS = ('xmlrpc', 'jsonrpc')
+_transport = None  # fijado con set_transport(); si no, ODOO_TRANSPORT o "transport" del config
+_priority = None   # fijada con set_priority(); si no, ODOO_RPC_PRIORITY o 'normal'
+_cache = None      # fijada con set_cache(); si no, ODOO_RPC_CACHE o "rpc_cache" del config (apagada)
+_call_timeout = None  # fijado con set_call_timeout(); si no, ODOO_RPC_TIMEOUT o "rpc_timeout" del config
+_deadline = None      # instante (time.monotonic) en que vence el plazo de la corrida; None sin plazo
+_hedge = None         # fijado con set_hedging(); si no, ODOO_RPC_HEDGE o "rpc_hedge" del config (apagado)
+
+DEFAULT_CALL_TIMEOUT = 300.0  # segundos sin respuesta del socket antes de abandonar una llamada
+HEDGE_METHODS = CACHEABLE_METHODS  # solo lecturas idempotentes: repetirlas no cambia nada en Odoo
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20    # llamadas del mismo modelo/método antes de confiar en su p95
+HEDGE_MIN_DELAY = 0.05    # nunca duplicar antes de este tiempo (segundos)
+HEDGE_MAX_RATIO = 0.1     # tope de llamadas duplicadas sobre el total, por si todo se vuelve lento
+
+DEADLINE_MESSAGE = "Se agotó el plazo de las llamadas a Odoo (--deadline)"
+
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el plazo de la corrida (--deadline) antes o durante una llamada"""
+
+@lru_cache(maxsize=None)
+def load_config():
+    """Contenido de odoo_config.json (se lee una sola vez, en el primer uso)"""
+    with open(CONFIG_PATH) as f:
+        return json.load(f)
+
+def current_transport():
+    if _transport:
+        return _transport
+    return os.environ.get('ODOO_TRANSPORT') or load_config().get('transport', 'xmlrpc')
+
+def __getattr__(name):
+    # odoo_rpc.DB, odoo_rpc.PASSWORD, ... se resuelven al usarse, no al importar
+    if name in _CONFIG_KEYS:
+        return load_config()[_CONFIG_KEYS[name]]
+    if name == 'TRANSPORT':
+        return current_transport()
+    if name == 'cfg':
+        return load_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Bytes recibidos por el hilo actual (la respuesta se lee en el mismo hilo que hace la llamada)
+_received = threading.local()
+
+def bytes_received():
+    return getattr(_received, 'total', 0)
+
+class _CountingResponse:
+    """Envuelve la respuesta HTTP para contar los bytes leídos del socket"""
+
+    def __init__(self, response):
+        self._response = response
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        _received.total = bytes_received() + len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+@lru_cache(maxsize=None)
+def counting_transport_class(https=False):
+    """Transport de xmlrpc.client que contabiliza bytes recibidos (se define al primer uso)"""
+    import xmlrpc.client
+
+    base = xmlrpc.client.SafeTransport if https else xmlrpc.client.Transport
+
+    class CountingTransport(base):
+        aborted = False
+
+        def make_connection(self, host):
+            connection = super().make_connection(host)
+            _apply_timeout(connection)
+            return connection
+
+        def single_request(self, host, handler, request_body, verbose=False):
+            # Transport.request reintenta una vez si se cae la conexión: no tras abort()
+            if self.aborted:
+                raise ConnectionAbortedError("Llamada cancelada")
+            return super().single_request(host, handler, request_body, verbose)
+
+        def parse_response(self, response):
+            return super().parse_response(_CountingResponse(response))
+
+        def abort(self):
+            """Corta desde otro hilo la llamada en curso (y las siguientes) de este transporte"""
+            self.aborted = True
+            _shutdown(self._connection[1])
+
+    return CountingTransport
+
+def call_timeout():
+    """Timeout de socket para la próxima llamada: --rpc-timeout, acotado por lo que queda del plazo"""
+    timeout = current_call_timeout() or None
+    deadline = current_deadline()
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded(DEADLINE_MESSAGE)
+    return min(timeout, remaining) if timeout else remaining
+
+def _apply_timeout(connection):
+    # http.client usa connection.timeout al conectar; la conexión keep-alive ya abierta se ajusta aparte
+    timeout = call_timeout()
+    connection.timeout = timeout
+    if connection.sock is not None:
+        connection.sock.settimeout(timeout)
+
+def _shutdown(connection):
+    """Cierra el socket de una conexión http.client aunque otro hilo esté leyendo de él"""
+    import socket
+
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # ya cerrado
+
+# Mismos códigos que usa Odoo para los Fault de /xmlrpc/2 (odoo/service/wsgi_server.py)
+_FAULT_CODES = {
+    'odoo.exceptions.UserError': 2,
+    'odoo.exceptions.ValidationError': 2,
+    'odoo.exceptions.MissingError': 2,
+    'odoo.exceptions.RedirectWarning': 2,
+    'odoo.exceptions.AccessDenied': 3,
+    'odoo.exceptions.AccessError': 4,
+}
+
+def json_error_to_fault(error):
+    """Convierte un error de /jsonrpc en el Fault que habría dado /xmlrpc/2"""
+    import xmlrpc.client
+
+    details = error.get('data') or {}
+    code = _FAULT_CODES.get(details.get('name'), 1)
+    if code == 1:
+        # Error de aplicación: XML-RPC manda el traceback completo
+        return xmlrpc.client.Fault(code, details.get('debug') or details.get('message') or error.get('message', ''))
+    return xmlrpc.client.Fault(code, details.get('message') or error.get('message', ''))
+
+class JsonRpcProxy:
+    """Equivalente a ServerProxy sobre `/jsonrpc` de Odoo.
+
+    Los errores se convierten en las mismas excepciones que lanza xmlrpc.client
+    (Fault con el traceback de Odoo, ProtocolError para errores HTTP), así el
+    código que llama no distingue el transporte. Igual que ServerProxy, mantiene
+    una conexión persistente y no es seguro entre hilos.
+    """
+
+    def __init__(self, service, url=None):
+        import http.client
+        from urllib.parse import urlsplit
+
+        self._service = service
+        self._url = f"{url or load_config()['url']}/jsonrpc"
+        parts = urlsplit(self._url)
+        conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._conn = conn_class(parts.netloc)
+        self._path = parts.path
+        self._ids = itertools.count(1)
+        self._aborted = False
+
+    def post(self, body):
+        """Envía un cuerpo JSON-RPC y devuelve (bytes en la red, bytes descomprimidos)"""
+        import gzip
+        import http.client
+        import xmlrpc.client
+
+        headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+        for attempt in (0, 1):
+            if self._aborted:
+                raise ConnectionAbortedError("Llamada cancelada")
+            _apply_timeout(self._conn)
+            try:
+                self._conn.request('POST', self._path, body, headers)
+                response = self._conn.getresponse()
+                raw = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Conexión keep-alive cerrada por el servidor: reintentar una vez
+                self._conn.close()
+                if attempt:
+                    raise
+            except OSError:
+                # Timeout o conexión cortada con abort(): la conexión queda inservible
+                self._conn.close()
+                raise
+        _received.total = bytes_received() + len(raw)
+        if response.status != 200:
+            raise xmlrpc.client.ProtocolError(self._url, response.status, response.reason, dict(response.getheaders()))
+        if response.getheader('Content-Encoding') == 'gzip':
+            return raw, gzip.decompress(raw)
+        return raw, raw
+
+    def abort(self):
+        """Corta desde otro hilo la llamada en curso (y las siguientes) de este proxy"""
+        self._aborted = True
+        _shutdown(self._conn)
+
+    def request_body(self, method, args):
+        return json.dumps({
+            'jsonrpc': '2.0', 'method': 'call', 'id': next(self._ids),
+            'params': {'service': self._service, 'method': method, 'args': list(args)},
+        }).encode('utf-8')
+
+    def call(self, method, *args):
+        _, data = self.post(self.request_body(method, args))
+        reply = json.loads(data)
+        if reply.get('error'):
+            raise json_error_to_fault(reply['error'])
+        return reply.get('result')
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args: self.call(name, *args)
+
+def set_transport(name):
+    """Fija el transporte; None deja el de ODOO_TRANSPORT / odoo_config.json"""
+    global _transport
+    if name is None:
+        return
+    if name not in TRANSPORTS:
+        raise ValueError(f"Transporte desconocido: {name} (opciones: {', '.join(TRANSPORTS)})")
+    _transport = name
+
+def set_priority(name):
+    """Fija la clase de prioridad de las llamadas (ver odoo_ratelimit); None no cambia nada"""
+    global _priority
+    if name is None:
+        return
+    if name not in PRIORITIES:
+        raise ValueError(f"Prioridad desconocida: {name} (opciones: {', '.join(PRIORITIES)})")
+    _priority = name
+
+def current_priority():
+    return _priority or os.environ.get('ODOO_RPC_PRIORITY') or 'normal'
+
+@lru_cache(maxsize=None)
+def rate_limiter():
+    """Limitador compartido entre procesos, o None si está desactivado"""
+    limits = limits_from_config(load_config())
+    return RateLimiter(limits) if limits is not None else None
+
+def set_cache(enabled):
+    """Activa la caché de respuestas de solo lectura (ver odoo_rpc_cache); None no cambia nada"""
+    global _cache
+    if enabled is None:
+        return
+    _cache = bool(enabled)
+
+def cache_enabled():
+    if _cache is not None:
+        return _cache
+    env = os.environ.get('ODOO_RPC_CACHE')
+    if env:
+        return env.lower() in ('1', 'on', 'true', 'yes')
+    return bool(load_config().get('rpc_cache', False))
+
+@lru_cache(maxsize=None)
+def rpc_cache():
+    """Caché de respuestas en disco, o None si no está activada"""
+    return RpcCache(load_config()['url']) if cache_enabled() else None
+
+def set_call_timeout(seconds):
+    """Fija el timeout por llamada en segundos (0 = sin timeout); None no cambia nada"""
+    global _call_timeout
+    if seconds is None:
+        return
+    if seconds < 0:
+        raise ValueError(f"Timeout inválido: {seconds}")
+    _call_timeout = float(seconds)
+
+def current_call_timeout():
+    if _call_timeout is not None:
+        return _call_timeout
+    env = os.environ.get('ODOO_RPC_TIMEOUT')
+    if env:
+        return float(env)
+    return float(load_config().get('rpc_timeout', DEFAULT_CALL_TIMEOUT))
+
+def set_deadline(seconds):
+    """Plazo de la corrida: las llamadas RPC deben terminar dentro de `seconds` desde ahora; None no cambia nada"""
+    global _deadline
+    if seconds is None:
+        return
+    if seconds <= 0:
+        raise ValueError(f"Plazo inválido: {seconds}")
+    _deadline = time.monotonic() + seconds
+
+# Plazo de una petición del worker: vale solo para el hilo que la atiende (y sus duplicados)
+_request_deadline = threading.local()
+
+def current_deadline():
+    """Instante (time.monotonic) en que vence el plazo de este hilo o de la corrida; None sin plazo"""
+    return getattr(_request_deadline, 'value', None) or _deadline
+
+@contextmanager
+def request_deadline(seconds):
+    """Plazo de `seconds` para las llamadas de este hilo dentro del bloque; None no cambia nada"""
+    previous = getattr(_request_deadline, 'value', None)
+    if seconds is not None:
+        _request_deadline.value = time.monotonic() + seconds
+    try:
+        yield
+    finally:
+        _request_deadline.value = previous
+
+def set_hedging(enabled):
+    """Activa el duplicado de lecturas lentas; None no cambia nada"""
+    global _hedge
+    if enabled is None:
+        return
+    _hedge = bool(enabled)
+
+def hedging_enabled():
+    if _hedge is not None:
+        return _hedge
+    env = os.environ.get('ODOO_RPC_HEDGE')
+    if env:
+        return env.lower() in ('1', 'on', 'true', 'yes')
+    return bool(load_config().get('rpc_hedge', False))
+
+_hedge_lock = threading.Lock()
+_hedge_counts = [0, 0]  # lecturas duplicables y duplicados enviados en esta corrida
+
+def _hedge_budget(hedging):
+    """Cuenta una lectura duplicable (hedging=False) o reserva un duplicado si queda tope (True)"""
+    with _hedge_lock:
+        if not hedging:
+            _hedge_counts[0] += 1
+            return True
+        if _hedge_counts[1] + 1 > HEDGE_MAX_RATIO * _hedge_counts[0]:
+            return False
+        _hedge_counts[1] += 1
+        return True
+
+def hedge_delay(model, method):
+    """Segundos tras los que se duplica una lectura de model.method; None si no se duplica"""
+    if method not in HEDGE_METHODS or not hedging_enabled():
+        return None
+    p95 = METRICS.latency_quantile(model, method, HEDGE_QUANTILE, HEDGE_MIN_SAMPLES)
+    if p95 is None:
+        return None
+    return max(p95, HEDGE_MIN_DELAY)
+
+def _seconds_argument(value, allow_zero=False):
+    import argparse
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = -1.0
+    if not seconds > 0 and not (allow_zero and seconds == 0):
+        raise argparse.ArgumentTypeError(f"{value} no es un número de segundos válido")
+    return seconds
+
+def _timeout_argument(value):
+    return _seconds_argument(value, allow_zero=True)
+
+def add_deadline_arguments(parser, scope='la corrida'):
+    parser.add_argument('--deadline', type=_seconds_argument, metavar='SEG',
+                        help=f"Plazo de {scope}: pasados SEG segundos las llamadas a Odoo fallan en vez de esperar")
+    parser.add_argument('--rpc-timeout', type=_timeout_argument, metavar='SEG',
+                        help="Segundos sin respuesta antes de abandonar una llamada, 0 = sin límite "
+                             f"(default: ODOO_RPC_TIMEOUT, \"rpc_timeout\" de odoo_config.json o {DEFAULT_CALL_TIMEOUT:g})")
+    parser.add_argument('--hedge', action='store_true', default=None,
+                        help="Duplica por otra conexión las lecturas que tardan más que su p95 observado "
+                             "y usa la primera respuesta")
+
+def add_cache_argument(parser):
+    parser.add_argument('--rpc-cache', action='store_true', default=None,
+                        help="Responde desde disco las lecturas repetidas (res.partner, mail.message, "
+                             "mailing.contact) con TTL e invalidación por write_date")
+
+def add_priority_argument(parser, default='normal'):
+    parser.add_argument('--priority', choices=PRIORITIES,
+                        help="Clase de prioridad frente al limitador de RPC compartido entre procesos "
+                             f"(default: ODOO_RPC_PRIORITY o {default})")
+
+def add_transport_argument(parser):
+    # Sin default explícito: --help no necesita leer odoo_config.json
+    parser.add_argument('--transport', choices=TRANSPORTS,
+                        help="Protocolo para hablar con Odoo (default: ODOO_TRANSPORT, "
+                             "\"transport\" de odoo_config.json o xmlrpc)")
+
+def server_proxy(endpoint):
+    """Proxy del servicio `common`/`object` con el transporte configurado; contabiliza bytes recibidos"""
+    if current_transport() == 'jsonrpc':
+        return JsonRpcProxy(endpoint)
+    import xmlrpc.client
+
+    url = load_config()['url']
+    transport = counting_transport_class(url.startswith('https'))()
+    return xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/{endpoint}", transport=transport)
+
+def abort_proxy(proxy):
+    """Corta la llamada en curso de un proxy de server_proxy() desde otro hilo"""
+    if isinstance(proxy, JsonRpcProxy):
+        proxy.abort()
+    else:
+        proxy('transport').abort()
+
+class _Attempt(threading.Thread):
+    """Una copia de una llamada en su propio hilo y su propia conexión; avisa por `done` al terminar"""
+
+    def __init__(self, proxy, call, done, throttle=None):
+        super().__init__(daemon=True)
+        self.proxy = proxy
+        self._call = call
+        self._done = done
+        self._throttle = throttle
+        self._deadline = getattr(_request_deadline, 'value', None)
+        self.cancelled = False
+
+    def run(self):
+        _request_deadline.value = self._deadline
+        before = bytes_received()
+        result = error = None
+        try:
+            if self._throttle is not None:
+                self._throttle()
+            if self.cancelled:
+                raise ConnectionAbortedError("Llamada cancelada")
+            result = self._call(self.proxy)
+        except BaseException as e:
+            error = e
+        self._done.put((self, result, error, bytes_received() - before))
+
+    def cancel(self):
+        self.cancelled = True
+        abort_proxy(self.proxy)
+
+class InstrumentedModels:
+    """Proxy de `object` que registra latencia, errores y bytes por modelo/método.
+
+    Antes de cada llamada espera su turno en el limitador compartido (rate_limiter()).
+    Con la caché activada las lecturas cacheables pueden responderse desde disco.
+    Con hedging activado las lecturas lentas se duplican (ver _race()).
+    """
+
+    def __init__(self, models):
+        self._models = models
+
+    def execute_kw(self, db, uid, password, model, method, args, kwargs=None):
+        cache = rpc_cache()
+        if cache is None or not cache.cacheable(model, method):
+            return self._execute(db, uid, password, model, method, args, kwargs)
+        cache.revalidate(model, lambda check_method, check_args, check_kwargs=None: self._execute(
+            db, uid, password, model, check_method, check_args, check_kwargs))
+        key = cache.key(db, uid, model, method, args, kwargs)
+        hit, result = cache.get(key, model)
+        if hit:
+            METRICS.record_cache_hit(model, method)
+            return result
+        result = self._execute(db, uid, password, model, method, args, kwargs)
+        cache.put(key, model, method, args, result)
+        return result
+
+    def _execute(self, db, uid, password, model, method, args, kwargs=None):
+        call_timeout()  # falla antes de esperar al limitador si ya venció el plazo
+        limiter = rate_limiter()
+        throttle = (lambda: limiter.acquire(model, method, current_priority())) if limiter is not None else None
+        throttled = throttle() if throttle is not None else 0.0
+        extra = (kwargs,) if kwargs is not None else ()
+
+        def call(models):
+            return models.execute_kw(db, uid, password, model, method, args, *extra)
+
+        delay = hedge_delay(model, method)
+        before = bytes_received()
+        received = 0
+        start = time.perf_counter()
+        error = False
+        hedge = None
+        try:
+            if delay is None:
+                return call(self._models)
+            result, received, hedge = self._race(call, delay, throttle)
+            return result
+        except TimeoutError as e:
+            error = True
+            deadline = current_deadline()
+            if deadline is not None and time.monotonic() >= deadline and not isinstance(e, DeadlineExceeded):
+                # El timeout del socket era lo que quedaba del plazo
+                raise DeadlineExceeded(DEADLINE_MESSAGE) from e
+            raise
+        except Exception:
+            error = True
+            raise
+        finally:
+            METRICS.record_rpc(model, method, time.perf_counter() - start,
+                               bytes_received() - before + received, error=error, throttled=throttled,
+                               hedge=hedge)
+
+    def _race(self, call, delay, throttle):
+        """Hace la llamada y, si no respondió en `delay` segundos, la duplica por otra conexión.
+
+        Gana la primera respuesta sin error; la otra copia se corta cerrando su
+        socket (Odoo termina de procesarla, pero no se espera ni se descarga) y
+        su proxy se descarta. Devuelve (resultado, bytes recibidos, hedge) con
+        hedge None si no se duplicó y True si ganó el duplicado.
+        """
+        done = queue.Queue()
+        primary = _Attempt(self._models, call, done)
+        primary.start()
+        _hedge_budget(False)
+        try:
+            first = done.get(timeout=delay)
+        except queue.Empty:
+            first = None
+        if first is None and _hedge_budget(True):
+            hedge = _Attempt(server_proxy('object'), call, done, throttle)
+            hedge.start()
+            first = done.get()
+            if first[2] is not None:
+                # La primera en terminar falló: puede que la otra todavía responda
+                second = done.get()
+                if second[2] is None:
+                    first = second
+            winner, result, error, received = first
+            loser = hedge if winner is primary else primary
+            loser.cancel()
+            self._models = winner.proxy
+            if error is not None:
+                raise error
+            return result, received, winner is hedge
+        if first is None:
+            first = done.get()
+        _, result, error, received = first
+        if error is not None:
+            raise error
+        return result, received, None
+
+def models_proxy():
+    """Nuevo proxy de modelos instrumentado.
+
+    ServerProxy reutiliza una sola conexión HTTP y no es seguro entre hilos:
+    cada hilo que haga llamadas debe tener el suyo.
+    """
+    return InstrumentedModels(server_proxy('object'))
+
+def connect():
+    """Autentica contra Odoo y devuelve (uid, models); lanza Exception si falla"""
+    with METRICS.stage('auth'):
+        common = server_proxy('common')
+        cfg = load_config()
+        uid = common.authenticate(cfg['db'], cfg['username'], cfg['password'], {})
+    if not uid:
+        raise Exception("No se pudo autenticar")
+    return uid, models_proxy()
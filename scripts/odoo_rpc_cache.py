@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Caché en disco de respuestas RPC de solo lectura (opcional, ver odoo_rpc.set_cache).
+
+La clave es el hash de (url, db, uid, modelo, método, args, kwargs): la misma
+llamada en otra corrida (los res.partner de los mismos emails, la lectura de
+mensajes de sesiones cerradas, el escaneo de mailing.contact) se responde desde
+disco sin ir a Odoo. Solo se cachean los métodos de CACHEABLE_METHODS de los
+modelos con TTL en CACHE_TTLS; discuss.channel nunca, así el listado de sesiones
+y las huellas del manifiesto siempre son actuales.
+
+Invalidación por write_date: la primera vez que un proceso usa la caché de un
+modelo (y de nuevo cada REVALIDATE_INTERVAL, o tras expire_checks() en el worker
+persistente) se piden (una llamada `search`, acotada a REVALIDATE_SCOPE y a
+CHANGED_IDS_LIMIT) los ids modificados desde la última revisión. Se descartan los
+`read` que incluyen alguno de esos ids y, si hubo cualquier cambio, todas las
+búsquedas por dominio del modelo (un registro nuevo o modificado puede entrar en
+el resultado).
+
+Borrados: cada revisión guarda el id máximo del modelo y cuántos registros hay
+hasta ese id; si en la siguiente (un `search_count`) hay menos, se borró algo y
+se descarta todo lo del modelo. Los ids cacheados mayores que ese máximo que no
+aparecen entre los modificados se crearon y borraron entre revisiones, y se
+descartan igual que los modificados. El tamaño total está acotado con desalojo LRU.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+RPC_CACHE_PATH = os.path.expanduser(os.environ.get('ODOO_RPC_CACHE_FILE', "~/Dev/wix-tasks/state/odoo_rpc_cache.sqlite"))
+RPC_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Modelo -> segundos de vida de una respuesta; los modelos ausentes no se cachean
+CACHE_TTLS = {
+    'mail.message': 30 * 86400,
+    'res.partner': 86400,
+    'mailing.contact': 3600,
+    'mailing.list': 86400,
+}
+CACHEABLE_METHODS = {'read', 'search_read', 'search', 'search_count', 'read_group'}
+# Métodos cuyo resultado depende de un dominio (cualquier cambio del modelo los invalida)
+DOMAIN_METHODS = CACHEABLE_METHODS - {'read'}
+# Margen sobre la hora local al guardar la última revisión (relojes desfasados, transacciones en curso)
+WRITE_DATE_MARGIN = timedelta(minutes=5)
+# Segundos que vale una revisión por write_date dentro de un proceso de larga vida
+REVALIDATE_INTERVAL = 300
+# Dominio de las revisiones por modelo: solo los registros que la caché puede contener
+REVALIDATE_SCOPE = {'mail.message': [['model', '=', 'discuss.channel']]}
+# Ids modificados que se invalidan uno por uno; con más se descarta todo el modelo
+CHANGED_IDS_LIMIT = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY, model TEXT, method TEXT,
+    created REAL, accessed REAL, size INTEGER, value BLOB
+);
+CREATE TABLE IF NOT EXISTS entry_ids (key TEXT, model TEXT, record_id INTEGER);
+CREATE INDEX IF NOT EXISTS entry_ids_record ON entry_ids (model, record_id);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+DROP TABLE IF EXISTS checks;
+CREATE TABLE IF NOT EXISTS revisions (model TEXT PRIMARY KEY, checked TEXT, max_id INTEGER, records INTEGER);
+"""
+
+def _record_ids(method, args, result):
+    """Ids de los registros que contiene una respuesta (para invalidar por write_date)"""
+    if method == 'read':
+        ids = args[0] if args else []
+        return [ids] if isinstance(ids, int) else list(ids)
+    if method == 'search':
+        return list(result)
+    if method == 'search_read':
+        return [r['id'] for r in result if isinstance(r, dict) and 'id' in r]
+    return []
+
+class RpcCache:
+    """Caché SQLite compartida entre hilos (una conexión por hilo) y procesos"""
+
+    def __init__(self, url, path=RPC_CACHE_PATH, ttls=None, max_bytes=RPC_CACHE_MAX_BYTES):
+        self.url = url
+        self.path = path
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._checked = {}  # modelo -> time.monotonic() de su última revisión por write_date
+        self._puts = 0
+
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def cacheable(self, model, method):
+        return method in CACHEABLE_METHODS and self.ttls.get(model)
+
+    def key(self, db, uid, model, method, args, kwargs):
+        payload = json.dumps([self.url, db, uid, model, method, args, kwargs or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def revalidate(self, model, execute):
+        """Descarta entradas con registros modificados o borrados desde la última revisión del modelo.
+
+        `execute(método, args, kwargs)` llama a Odoo sobre el modelo sin pasar por la caché.
+        """
+        with self._lock:
+            checked = self._checked.get(model)
+            if checked is not None and time.monotonic() - checked < REVALIDATE_INTERVAL:
+                return
+            self._checked[model] = time.monotonic()
+        conn = self._db()
+        now = (datetime.utcnow() - WRITE_DATE_MARGIN).strftime('%Y-%m-%d %H:%M:%S')
+        scope = REVALIDATE_SCOPE.get(model, [])
+        row = conn.execute('SELECT checked, max_id, records FROM revisions WHERE model = ?', (model,)).fetchone()
+        # Sin revisión previa no se sabe qué cambió: se descarta lo que hubiera
+        drop_all = row is None
+        if not drop_all:
+            checked, max_id, records = row
+            changed = execute('search', [scope + [['write_date', '>=', checked]]], {'limit': CHANGED_IDS_LIMIT + 1})
+            remaining = execute('search_count', [scope + [['id', '<=', max_id]]])
+            drop_all = len(changed) > CHANGED_IDS_LIMIT or remaining < records
+        if drop_all:
+            self._delete(conn, 'SELECT key FROM entries WHERE model = ?', (model,))
+            latest = execute('search', [scope], {'limit': 1, 'order': 'id desc'})
+            max_id = latest[0] if latest else 0
+            records = execute('search_count', [scope + [['id', '<=', max_id]]])
+        else:
+            # Un registro nuevo siempre tiene write_date posterior a la revisión: si no está, se borró
+            fresh = conn.execute('SELECT DISTINCT record_id FROM entry_ids WHERE model = ? AND record_id > ?',
+                                 (model, max_id)).fetchall()
+            stale = sorted(set(changed).union(record_id for (record_id,) in fresh))
+            if stale:
+                self._delete(conn, 'SELECT key FROM entries WHERE model = ? AND method != ?', (model, 'read'))
+                for i in range(0, len(stale), 500):
+                    chunk = stale[i:i + 500]
+                    marks = ','.join('?' * len(chunk))
+                    self._delete(conn, f'SELECT DISTINCT key FROM entry_ids WHERE model = ? AND record_id IN ({marks})',
+                                 (model, *chunk))
+            created = [record_id for record_id in changed if record_id > max_id]
+            records = remaining + len(created)
+            max_id = max([max_id, *created])
+        conn.execute('INSERT OR REPLACE INTO revisions (model, checked, max_id, records) VALUES (?, ?, ?, ?)',
+                     (model, now, max_id, records))
+
+    def expire_checks(self):
+        """La próxima lectura de cada modelo vuelve a revisar write_date (una petición nueva del worker)"""
+        with self._lock:
+            self._checked.clear()
+
+    def _delete(self, conn, select_keys, params):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS doomed (key TEXT)')
+            conn.execute('DELETE FROM doomed')
+            conn.execute(f'INSERT INTO doomed {select_keys}', params)
+            conn.execute('DELETE FROM entries WHERE key IN (SELECT key FROM doomed)')
+            conn.execute('DELETE FROM entry_ids WHERE key IN (SELECT key FROM doomed)')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, key, model):
+        """(True, respuesta) si hay una entrada vigente; (False, None) si no"""
+        import zlib
+
+        conn = self._db()
+        row = conn.execute('SELECT created, value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return False, None
+        created, value = row
+        now = time.time()
+        if now - created > self.ttls[model]:
+            self._delete(conn, 'SELECT ? AS key', (key,))
+            return False, None
+        conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        return True, json.loads(zlib.decompress(value))
+
+    def put(self, key, model, method, args, result):
+        import zlib
+
+        try:
+            value = zlib.compress(json.dumps(result).encode('utf-8'))
+        except (TypeError, ValueError):
+            return  # respuesta no serializable en JSON: no se cachea
+        conn = self._db()
+        now = time.time()
+        ids = _record_ids(method, args, result)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM entry_ids WHERE key = ?', (key,))
+            conn.execute('INSERT OR REPLACE INTO entries (key, model, method, created, accessed, size, value) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', (key, model, method, now, now, len(value), value))
+            conn.executemany('INSERT INTO entry_ids (key, model, record_id) VALUES (?, ?, ?)',
+                             [(key, model, record_id) for record_id in ids])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._puts += 1
+            check_size = self._puts % 50 == 1
+        if check_size:
+            self.evict()
+
+    def evict(self):
+        """Desaloja las entradas menos usadas hasta quedar en el 90% de max_bytes"""
+        conn = self._db()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            if freed >= target:
+                break
+            doomed.append(key)
+            freed += size
+        for i in range(0, len(doomed), 500):
+            chunk = doomed[i:i + 500]
+            self._delete(conn, f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+        return len(doomed)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark de transporte XML-RPC vs JSON-RPC sobre páginas reales de mail.message.
+Mide bytes en la red (con gzip), bytes descomprimidos y tiempo de decodificación,
+y verifica que ambos transportes devuelvan los mismos datos.
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import statistics
+import time
+import xmlrpc.client
+from urllib.parse import urlsplit
+
+import odoo_rpc
+from odoo_chat_common import MESSAGE_FIELDS, MESSAGE_BATCH_SIZE, session_domain
+
+def raw_post(conn, path, body, content_type):
+    conn.request('POST', path, body, {'Content-Type': content_type, 'Accept-Encoding': 'gzip'})
+    response = conn.getresponse()
+    raw = response.read()
+    if response.status != 200:
+        raise xmlrpc.client.ProtocolError(path, response.status, response.reason, dict(response.getheaders()))
+    data = gzip.decompress(raw) if response.getheader('Content-Encoding') == 'gzip' else raw
+    return raw, data
+
+def sample_message_pages(uid, models, pages):
+    """Ids de mensajes de las sesiones más recientes, en páginas como las de get_messages_batch"""
+    sessions = models.execute_kw(
+        odoo_rpc.DB, uid, odoo_rpc.PASSWORD,
+        'discuss.channel', 'search_read',
+        [session_domain()],
+        {'fields': ['message_ids'], 'limit': 200 * pages, 'order': 'create_date desc'}
+    )
+    ids = sorted({mid for s in sessions for mid in s['message_ids']})
+    return [ids[i:i + MESSAGE_BATCH_SIZE] for i in range(0, len(ids), MESSAGE_BATCH_SIZE)][:pages]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara XML-RPC y JSON-RPC en páginas de mail.message")
+    parser.add_argument('--pages', type=int, default=5, help="Páginas de mensajes a medir")
+    parser.add_argument('--repeat', type=int, default=3, help="Repeticiones por página")
+    args = parser.parse_args()
+
+    uid, models = odoo_rpc.connect()
+    pages = sample_message_pages(uid, models, args.pages)
+    print(f"Páginas: {len(pages)} ({sum(len(p) for p in pages)} mensajes)")
+
+    parts = urlsplit(odoo_rpc.URL)
+    conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    conn = conn_class(parts.netloc)
+    json_proxy = odoo_rpc.JsonRpcProxy('object')
+    base_path = parts.path.rstrip('/')
+
+    results = {'xmlrpc': {'wire': 0, 'plain': 0, 'decode': []},
+               'jsonrpc': {'wire': 0, 'plain': 0, 'decode': []}}
+
+    for ids in pages:
+        params = (odoo_rpc.DB, uid, odoo_rpc.PASSWORD, 'mail.message', 'read', [ids], {'fields': MESSAGE_FIELDS})
+        decoded = {}
+        for _ in range(args.repeat):
+            raw, data = raw_post(conn, f'{base_path}/xmlrpc/2/object',
+                                 xmlrpc.client.dumps(params, 'execute_kw').encode('utf-8'), 'text/xml')
+            start = time.perf_counter()
+            decoded['xmlrpc'] = xmlrpc.client.loads(data)[0][0]
+            results['xmlrpc']['decode'].append(time.perf_counter() - start)
+            results['xmlrpc']['wire'] += len(raw)
+            results['xmlrpc']['plain'] += len(data)
+
+            raw, data = json_proxy.post(json_proxy.request_body('execute_kw', params))
+            start = time.perf_counter()
+            decoded['jsonrpc'] = json.loads(data)['result']
+            results['jsonrpc']['decode'].append(time.perf_counter() - start)
+            results['jsonrpc']['wire'] += len(raw)
+            results['jsonrpc']['plain'] += len(data)
+
+        if decoded['xmlrpc'] != decoded['jsonrpc']:
+            print(f"  ATENCIÓN: resultados distintos en la página que inicia en {ids[0]}")
+
+    print(f"\n{'Transporte':<10} {'KiB red':>10} {'KiB plano':>10} {'decode p50 ms':>14} {'decode total ms':>16}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['wire'] / 1024:10.1f} {r['plain'] / 1024:10.1f} "
+              f"{statistics.median(r['decode']) * 1000:14.2f} {sum(r['decode']) * 1000:16.1f}")
+    x, j = results['xmlrpc'], results['jsonrpc']
+    print(f"\nJSON-RPC vs XML-RPC: {j['wire'] / max(x['wire'], 1):.2f}x bytes en red, "
+          f"{sum(j['decode']) / max(sum(x['decode']), 1e-9):.2f}x tiempo de decodificación")
+
+if __name__ == "__main__":
+    main()
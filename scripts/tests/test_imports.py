@@ -0,0 +1,59 @@
+"""Importar cualquier script es barato y sin efectos.
+
+Cada módulo se importa en un proceso nuevo con HOME vacío y sin odoo_config.json:
+no debe leer la configuración, crear archivos ni cargar la pila HTTP/XML-RPC o
+numpy/pyarrow, y debe quedar dentro de IMPORT_BUDGET_SECONDS.
+"""
+
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = sorted(os.path.basename(path)[:-3] for path in glob.glob(os.path.join(SCRIPTS_DIR, 'odoo_*.py')))
+IMPORT_BUDGET_SECONDS = 0.5  # medido: ~45 ms el más pesado (odoo_chat_reports)
+HEAVY_MODULES = ('xmlrpc.client', 'http.client', 'sqlite3', 'numpy', 'pyarrow', 'zstandard')
+# Cargan su pila al importar a propósito: el benchmark mide xmlrpc/http.client
+# y el worker es un servidor HTTP (http.server importa http.client)
+EAGER_MODULES = {'odoo_transport_bench', 'odoo_chat_worker'}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+module = __import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+rpc = sys.modules.get('odoo_rpc')
+print(json.dumps({
+    'seconds': elapsed,
+    'heavy': [name for name in sys.argv[2:] if name in sys.modules],
+    'config_loaded': bool(rpc and rpc.load_config.cache_info().currsize),
+}))
+"""
+
+class ImportTest(unittest.TestCase):
+    def import_module(self, name, home):
+        env = {key: value for key, value in os.environ.items() if not key.startswith('ODOO_')}
+        env.update(HOME=home, ODOO_CONFIG=os.path.join(home, 'missing', 'odoo_config.json'),
+                   PYTHONPATH=SCRIPTS_DIR, PYTHONDONTWRITEBYTECODE='1')
+        result = subprocess.run([sys.executable, '-c', PROBE, name, *HEAVY_MODULES], cwd=home, env=env,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_imports_are_cheap_and_side_effect_free(self):
+        self.assertTrue(MODULES)
+        for name in MODULES:
+            with self.subTest(module=name), tempfile.TemporaryDirectory() as home:
+                probe = self.import_module(name, home)
+                self.assertEqual(os.listdir(home), [], "el import creó archivos")
+                self.assertFalse(probe['config_loaded'], "el import leyó odoo_config.json")
+                if name not in EAGER_MODULES:
+                    self.assertEqual(probe['heavy'], [])
+                self.assertLess(probe['seconds'], IMPORT_BUDGET_SECONDS)
+
+if __name__ == '__main__':
+    unittest.main()
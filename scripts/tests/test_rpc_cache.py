@@ -0,0 +1,115 @@
+"""odoo_rpc_cache: la revisión por write_date detecta registros modificados, nuevos y borrados"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import odoo_rpc_cache
+from odoo_rpc_cache import RpcCache
+
+class FakeModel:
+    """Tabla de Odoo en memoria con lo que usa RpcCache.revalidate (write_date como texto)"""
+
+    def __init__(self, count):
+        self.records = {i: '2026-01-01 00:00:00' for i in range(1, count + 1)}
+        self.calls = []
+
+    def create(self):
+        record_id = max(self.records, default=0) + 1
+        self.records[record_id] = '2099-01-01 00:00:00'
+        return record_id
+
+    def execute(self, method, args, kwargs=None):
+        kwargs = kwargs or {}
+        self.calls.append((method, args, kwargs))
+        ids = sorted(self.records, reverse=kwargs.get('order') == 'id desc')
+        for field, op, value in args[0]:
+            if field == 'write_date':
+                ids = [i for i in ids if self.records[i] >= value]
+            elif field == 'id':
+                ids = [i for i in ids if i <= value]
+        if method == 'search_count':
+            return len(ids)
+        return ids[:kwargs['limit']] if kwargs.get('limit') else ids
+
+class RevalidateTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'cache.sqlite')
+        self.model = FakeModel(10)
+        self.cache = self.fresh_cache()
+        # Primera revisión: guarda el id máximo y el conteo
+        self.cache.revalidate('res.partner', self.model.execute)
+        self.put('read', [[3]])
+        self.put('search', [[['email', '!=', False]]], list(self.model.records))
+
+    def fresh_cache(self):
+        """Otro proceso sobre el mismo archivo: vuelve a revisar al primer uso"""
+        return RpcCache('http://odoo', path=self.path)
+
+    def put(self, method, args, result=None):
+        key = self.cache.key('db', 2, 'res.partner', method, args, None)
+        self.cache.put(key, 'res.partner', method, args, result if result is not None else [{'id': 3}])
+        return key
+
+    def hit(self, method, args):
+        key = self.cache.key('db', 2, 'res.partner', method, args, None)
+        return self.cache.get(key, 'res.partner')[0]
+
+    def revalidate(self):
+        self.cache = self.fresh_cache()
+        self.cache.revalidate('res.partner', self.model.execute)
+
+    def test_unchanged_model_keeps_entries(self):
+        self.revalidate()
+        self.assertTrue(self.hit('read', [[3]]))
+        self.assertTrue(self.hit('search', [[['email', '!=', False]]]))
+
+    def test_deleted_record_drops_model(self):
+        del self.model.records[5]
+        self.revalidate()
+        self.assertFalse(self.hit('read', [[3]]))
+        self.assertFalse(self.hit('search', [[['email', '!=', False]]]))
+
+    def test_record_created_and_deleted_between_checks(self):
+        record_id = self.model.create()
+        self.put('read', [[record_id]], [{'id': record_id}])
+        del self.model.records[record_id]
+        self.revalidate()
+        self.assertFalse(self.hit('read', [[record_id]]))
+        self.assertFalse(self.hit('search', [[['email', '!=', False]]]))
+        self.assertTrue(self.hit('read', [[3]]))
+
+    def test_new_record_moves_baseline(self):
+        record_id = self.model.create()
+        self.revalidate()
+        self.assertFalse(self.hit('search', [[['email', '!=', False]]]))
+        self.assertTrue(self.hit('read', [[3]]))
+        # La siguiente revisión cuenta el registro nuevo y no lo toma por un borrado
+        self.model.records[record_id] = '2026-01-01 00:00:00'
+        self.put('search', [[['email', '!=', False]]], list(self.model.records))
+        self.revalidate()
+        self.assertTrue(self.hit('search', [[['email', '!=', False]]]))
+
+    def test_too_many_changes_drop_model(self):
+        limit = odoo_rpc_cache.CHANGED_IDS_LIMIT
+        odoo_rpc_cache.CHANGED_IDS_LIMIT = 2
+        self.addCleanup(setattr, odoo_rpc_cache, 'CHANGED_IDS_LIMIT', limit)
+        for record_id in (1, 2, 4):
+            self.model.records[record_id] = '2099-01-01 00:00:00'
+        self.revalidate()
+        self.assertFalse(self.hit('read', [[3]]))
+
+    def test_message_checks_are_scoped_to_livechat(self):
+        self.cache.revalidate('mail.message', self.model.execute)
+        self.cache = self.fresh_cache()
+        self.cache.revalidate('mail.message', self.model.execute)
+        for method, args, kwargs in self.model.calls[-2:]:
+            self.assertIn(['model', '=', 'discuss.channel'], args[0])
+
+if __name__ == '__main__':
+    unittest.main()
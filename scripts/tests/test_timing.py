@@ -0,0 +1,90 @@
+"""odoo_chat_timing: el cálculo vectorizado (numpy) y el de Python dan lo mismo; percentiles por histograma"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import odoo_chat_timing
+from odoo_chat_timing import VISITOR, BOT, HUMAN
+
+def random_timelines(rng, count):
+    """Líneas de tiempo como las de classify_session, con sesiones vacías y sin visitante"""
+    start = datetime(2026, 1, 1)
+    timelines = []
+    for _ in range(count):
+        dt = start + timedelta(seconds=rng.randint(0, 10_000_000))
+        dates, classes = [], []
+        for _ in range(rng.choice([0, 1, 2, 3, 5, 9])):
+            dt += timedelta(seconds=rng.randint(0, 900))
+            dates.append(dt.strftime('%Y-%m-%d %H:%M:%S'))
+            classes.append(rng.choice([VISITOR, VISITOR, BOT, HUMAN]))
+        timelines.append((dates, classes))
+    return timelines
+
+def exact_percentiles(values):
+    """Percentiles con la interpolación lineal de numpy.percentile"""
+    values = sorted(values)
+    result = {}
+    for q in odoo_chat_timing.PERCENTILES:
+        position = (len(values) - 1) * q / 100
+        low = int(position)
+        high = min(low + 1, len(values) - 1)
+        result[q] = values[low] + (values[high] - values[low]) * (position - low)
+    return result
+
+class TimingsTest(unittest.TestCase):
+    def test_python_edge_cases(self):
+        t = ['2026-01-01 00:00:00', '2026-01-01 00:00:10', '2026-01-01 00:00:30', '2026-01-01 00:01:00']
+        timings = odoo_chat_timing._timings_python([
+            ([], []),
+            (t[:2], [BOT, BOT]),
+            (t, [BOT, VISITOR, BOT, HUMAN]),
+            (t, [VISITOR, VISITOR, HUMAN, VISITOR]),
+        ])
+        self.assertEqual(timings[:2], [None, None])
+        self.assertEqual(timings[2], {'first_response': 20, 'time_to_human': 50,
+                                      'wait_gaps': [20], 'outcome': 'humano'})
+        self.assertEqual(timings[3], {'first_response': 30, 'time_to_human': 30,
+                                      'wait_gaps': [30], 'outcome': 'sin_respuesta'})
+
+    @unittest.skipIf(odoo_chat_timing._numpy() is None, "numpy no está instalado")
+    def test_numpy_matches_python(self):
+        np = odoo_chat_timing._numpy()
+        rng = random.Random(46)
+        for count in (0, 1, 7, 500):
+            timelines = random_timelines(rng, count)
+            self.assertEqual(odoo_chat_timing._timings_numpy(np, timelines),
+                             odoo_chat_timing._timings_python(timelines))
+
+    def test_histogram_percentiles(self):
+        rng = random.Random(9)
+        for size, top in ((1, 59), (2, 59), (101, 59), (5, 3600), (101, 86400)):
+            values = [rng.randint(0, top) for _ in range(size)]
+            histogram = {}
+            odoo_chat_timing.add_durations(histogram, values)
+            estimated = odoo_chat_timing.histogram_percentiles(histogram)
+            for q, value in exact_percentiles(values).items():
+                if top < odoo_chat_timing.EXACT_SECONDS:
+                    self.assertEqual(estimated[q], value)
+                else:
+                    self.assertLessEqual(abs(estimated[q] - value), max(value * 0.025, 1))
+        self.assertIsNone(odoo_chat_timing.histogram_percentiles({}))
+
+    def test_histograms_merge_like_concatenation(self):
+        rng = random.Random(26)
+        values = [rng.randint(0, 20000) for _ in range(300)]
+        whole, first, second = {}, {}, {}
+        odoo_chat_timing.add_durations(whole, values)
+        odoo_chat_timing.add_durations(first, values[:120])
+        odoo_chat_timing.add_durations(second, values[120:])
+        odoo_chat_timing.merge_histograms(first, second)
+        self.assertEqual(first, whole)
+        # Tamaño acotado: el histograma no crece con el número de valores
+        self.assertLess(len(whole), odoo_chat_timing.duration_bucket(20000) + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -64,6 +64,7 @@ export const config = {
     get productWriteConcurrency() { return getSettingInt('odoo.product_write_concurrency', 10); },
     get productWriteRetries() { return getSettingInt('odoo.product_write_retries', 3); },
     get rpcTimeoutMs() { return getSettingInt('odoo.rpc_timeout_ms', 300000); },
+    get chatWorkerUrl() { return getSetting('odoo.chat_worker_url', ''); },
   },
 
   smtp: {
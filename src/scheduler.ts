@@ -3,6 +3,7 @@ import { Cron } from 'croner';
 import { logger } from './utils/logger';
 import { BaseTask } from './tasks/base-task';
 import { getSetting, updateSetting, insertTaskRun, loadTaskHistory, pruneTaskHistory, pruneTaskLogs } from './services/settings-db';
+import { isChatWorkerEnabled, checkChatWorker } from './services/chat-worker';
 
 const CTX = 'Scheduler';
 
@@ -202,6 +203,9 @@ export function startAll(): void {
   }
   const enabledCount = Array.from(registeredTasks.values()).filter(e => e.state.enabled).length;
   logger.info(CTX, `${enabledCount}/${registeredTasks.size} task(s) running`);
+
+  // Chat tasks delegate to the Python worker when configured; probe it without blocking startup
+  if (isChatWorkerEnabled()) void checkChatWorker();
 }
 
 export function stopAll(): void {
@@ -0,0 +1,154 @@
+import * as http from 'http';
+import { config } from '../config';
+import { logger } from '../utils/logger';
+
+const CTX = 'ChatWorker';
+
+// Client for the persistent Python chat worker (scripts/odoo_chat_worker.py).
+// The worker keeps the Odoo session and the classifiers warm, so the chat tasks
+// share the Python classification instead of re-implementing it here.
+//
+// The tasks pass [config.odoo.livechatChannelId] (setting odoo.livechat_channel_id)
+// as `channels`, so the worker reads the same channel as the in-process fallback.
+// The worker's own LIVECHAT_CHANNEL_IDS default (channel 1) only applies to
+// requests that omit `channels`.
+
+// ── Response types (field names as returned by the Python worker) ─────────────
+
+export interface WorkerConversation {
+  session_id: number;
+  channel_id?: number;              // only when several channels were requested
+  date: string;
+  operator: string;
+  country: string;
+  active: boolean;
+  num_messages: number;
+  visitor_messages: string;
+  intents: string;
+  products: string;
+  emails: string;
+}
+
+export interface WorkerAnalysis {
+  total_sessions: number;
+  total_messages: number;
+  sessions_by_month: Record<string, number>;
+  sessions_by_weekday: Record<string, number>;
+  sessions_by_hour: Record<string, number>;
+  intents: Record<string, number>;
+  products_mentioned: Record<string, number>;
+  emails_captured: string[];
+  conversations_data: WorkerConversation[];
+  channels?: Record<string, Omit<WorkerAnalysis, 'channels'>>;  // per-channel breakdown (several channels only)
+}
+
+export interface WorkerLead {
+  session_id: number;
+  canal: number;
+  fecha_chat: string;
+  dias_transcurridos: number;
+  priority_num: number;
+  prioridad: string;
+  email: string;
+  tipo_cliente: string;
+  intenciones: string;
+  productos_solicitados: string;
+  resumen_visitante: string;
+  sugerencia_abordaje: string;
+  num_mensajes: number;
+  conversacion_completa: string;
+  nombre_odoo: string;
+  telefono: string;
+  celular: string;
+  ciudad: string;
+  estado: string;
+  empresa: string;
+  puesto: string;
+  es_empresa: boolean;
+  es_cliente_existente: boolean;
+  ordenes_venta: number;
+  total_facturado: number;
+}
+
+export interface WorkerLeads {
+  generated_at: string;
+  leads_with_email: WorkerLead[];   // already enriched and sorted by priority + recency
+  leads_without_email: WorkerLead[];
+}
+
+// ── Transport ────────────────────────────────────────────────────────────────
+
+/** True when odoo.chat_worker_url is set (http://127.0.0.1:8765 or unix:/path/to/worker.sock) */
+export function isChatWorkerEnabled(): boolean {
+  return config.odoo.chatWorkerUrl.trim() !== '';
+}
+
+function requestOptions(method: string, route: string): http.RequestOptions {
+  const target = config.odoo.chatWorkerUrl.trim();
+  if (target.startsWith('unix:')) {
+    return { socketPath: target.slice('unix:'.length), path: route, method };
+  }
+  const url = new URL(target);
+  return { host: url.hostname, port: url.port ? parseInt(url.port) : 80, path: route, method };
+}
+
+function request<T>(method: 'GET' | 'POST', route: string, body?: unknown): Promise<T> {
+  const payload = body === undefined ? undefined : Buffer.from(JSON.stringify(body), 'utf-8');
+  const timeoutMs = config.odoo.rpcTimeoutMs;
+
+  return new Promise((resolve, reject) => {
+    const req = http.request(
+      {
+        ...requestOptions(method, route),
+        headers: payload ? { 'Content-Type': 'application/json', 'Content-Length': payload.length } : {},
+      },
+      (res) => {
+        const chunks: Buffer[] = [];
+        res.on('data', (chunk: Buffer) => chunks.push(chunk));
+        res.on('end', () => {
+          const text = Buffer.concat(chunks).toString('utf-8');
+          const status = res.statusCode ?? 500;
+          let data: any;
+          try {
+            data = JSON.parse(text);
+          } catch {
+            data = text;
+          }
+          if (status >= 400) {
+            reject(new Error(`Chat worker ${route} failed: ${status} — ${data?.error ?? text}`));
+          } else {
+            resolve(data as T);
+          }
+        });
+      },
+    );
+    req.setTimeout(timeoutMs, () => req.destroy(new Error(`Chat worker timeout after ${timeoutMs}ms: ${route}`)));
+    req.on('error', reject);
+    if (payload) req.write(payload);
+    req.end();
+  });
+}
+
+// ── Public API ───────────────────────────────────────────────────────────────
+
+/** Ping the worker; logs and returns false instead of throwing */
+export async function checkChatWorker(): Promise<boolean> {
+  try {
+    const health = await request<{ status: string; uid: number | null; uptime_s: number }>('GET', '/health');
+    logger.info(CTX, `Chat worker ready at ${config.odoo.chatWorkerUrl} (uid=${health.uid}, up ${health.uptime_s}s)`);
+    return true;
+  } catch (err) {
+    logger.warn(CTX, `Chat worker unreachable at ${config.odoo.chatWorkerUrl}: ${(err as Error).message}`);
+    return false;
+  }
+}
+
+/** Aggregated chat analysis for sessions created since `since` (UTC 'YYYY-MM-DD HH:MM:SS') in `channels` */
+export function fetchChatAnalysis(since: string, channels: number[]): Promise<WorkerAnalysis> {
+  return request<WorkerAnalysis>('POST', '/analysis', { since, channels });
+}
+
+/** Enriched, prioritized leads for sessions created since `since` (UTC 'YYYY-MM-DD HH:MM:SS') in `channels` */
+export function fetchChatLeads(since: string, channels: number[]): Promise<WorkerLeads> {
+  return request<WorkerLeads>('POST', '/leads', { since, channels });
+}
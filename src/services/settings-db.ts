@@ -63,6 +63,7 @@ const DEFAULTS: DefaultSetting[] = [
   { key: 'odoo.product_write_concurrency', value: '10', category: 'odoo', description: 'Concurrencia de escritura de productos en Odoo' },
   { key: 'odoo.product_write_retries', value: '3', category: 'odoo', description: 'Reintentos de escritura de productos en Odoo' },
   { key: 'odoo.rpc_timeout_ms', value: '300000', category: 'odoo', description: 'Timeout de RPC en milisegundos' },
+  { key: 'odoo.chat_worker_url', value: '', category: 'odoo', description: 'URL del worker Python de chat (http://127.0.0.1:8765 o unix:/ruta.sock); vacío = análisis en proceso' },
 
   // Wix sync
   { key: 'wix.min_stock_threshold', value: '10', category: 'wix', description: 'Umbral mínimo de stock total. Si el stock sumado de todas las sucursales es menor a este valor, se pone en 0 en Wix.' },
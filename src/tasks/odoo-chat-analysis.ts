@@ -3,6 +3,7 @@ import { config, getEmailsForTask } from '../config';
 import { logger } from '../utils/logger';
 import { sendEmail } from '../services/email';
 import { searchReadAll, readRecords, OdooRecord } from '../services/odoo';
+import { isChatWorkerEnabled, fetchChatAnalysis } from '../services/chat-worker';
 import * as fs from 'fs';
 import * as path from 'path';
 
@@ -16,6 +17,8 @@ function stripHtml(html: string): string {
 
 // ── Pattern maps ───────────────────────────────────────────────────────────────
 
+// Fallback used when odoo.chat_worker_url is empty. Keep in sync with
+// intent_patterns / product_patterns in scripts/odoo_chat_common.py.
 const INTENT_PATTERNS: Record<string, RegExp> = {
   cotizacion_mayoreo: /cotizaci[oó]n.*mayoreo|mayoreo|precio.*mayoreo/i,
   talleres_clinicas: /taller|cl[ií]nica|capacitaci[oó]n|curso|inscrib/i,
@@ -23,25 +26,28 @@ const INTENT_PATTERNS: Record<string, RegExp> = {
   solo_viendo: /solo.*viendo|nada.*gracias|no.*gracias|solo.*mirando/i,
   busca_producto: /busco|necesito|quiero|donde.*encuentro|tienen/i,
   precio: /precio|costo|cu[aá]nto.*cuesta|cu[aá]nto.*vale/i,
+  disponibilidad: /disponib|hay.*en.*stock|tienen.*en.*existencia/i,
   envio: /env[ií]o|entrega|domicilio|mandan/i,
+  horario: /horario|abren|cierran|hora/i,
   ubicacion: /ubicaci[oó]n|direcci[oó]n|donde.*est[aá]n|sucursal/i,
+  devolucion: /devoluci[oó]n|cambio|garant[ií]a/i,
   factura: /factura|facturaci[oó]n|cfdi|rfc/i,
   contratista: /contratista|constructor|obra|proyecto/i,
 };
 
 const PRODUCT_PATTERNS: Record<string, RegExp> = {
+  'Varilla/Acero': /varilla|acero|alambre|clavo|malla|solera|perfil.*met[aá]l/i,
   'Cemento/Concreto': /cemento|concreto|mortero|mezcla|block|tabique|tabic[oó]n/i,
-  'Varilla/Acero': /varilla|acero|alambre|clavo|malla|solera/i,
+  'Pintura': /pintura|rodillo|brocha|impermeabilizante|sellador|esmalte/i,
   'Pisos/Loseta': /piso|loseta|porcelanato|azulejo|cer[aá]mica|adocreto/i,
+  'Plomería': /tubo|tuber[ií]a|v[aá]lvula|llave|conector|plomer[ií]a|tinaco/i,
   'Electricidad': /cable|el[eé]ctric|interruptor|contacto|l[aá]mpara|foco/i,
+  'Herramientas': /herramienta|taladro|sierra|martillo|llave|desarmador/i,
   'Madera': /madera|triplay|plywood|tabla|poste|viga/i,
-  'Plomería': /tubo|tuber[ií]a|v[aá]lvula|llave|conector|plomer[ií]a|tinaco/i,
-  'Pintura': /pintura|rodillo|brocha|impermeabilizante|sellador/i,
-  'Herramientas': /herramienta|taladro|sierra|martillo|desarmador/i,
   'Ferretería': /tornillo|pija|ancla|bisagra|jaladera|chapa|cerradura/i,
+  'Impermeabilizante': /impermeabilizante|impermeable|membrana|asfalto/i,
   'Vigueta/Estructura': /vigueta|bovedilla|castillo|armex|estructura/i,
   'Arena/Grava': /arena|grava|piedra|material.*p[eé]treo/i,
-  'Impermeabilizante': /impermeabilizante|impermeable|membrana|asfalto/i,
 };
 
 const EMAIL_RE = /[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}/g;
@@ -53,8 +59,11 @@ const INTENT_LABELS: Record<string, string> = {
   solo_viendo: '👀 Solo Viendo',
   busca_producto: '🔍 Busca Producto',
   precio: '💲 Consulta de Precio',
+  disponibilidad: '📦 Disponibilidad',
   envio: '🚚 Envío/Entrega',
+  horario: '🕐 Horario',
   ubicacion: '📍 Ubicación',
+  devolucion: '🔄 Devolución/Garantía',
   factura: '🧾 Facturación',
   contratista: '🏗️ Contratista/Constructor',
 };
@@ -107,34 +116,10 @@ export class OdooChatAnalysisTask extends BaseTask {
     const sinceStr = sevenDaysAgo.toISOString().slice(0, 19).replace('T', ' ');
     const periodLabel = `${sevenDaysAgo.toLocaleDateString('es-MX', { day: '2-digit', month: 'short', year: 'numeric' })} – ${now.toLocaleDateString('es-MX', { day: '2-digit', month: 'short', year: 'numeric' })}`;
 
-    logger.info(CTX, `Fetching livechat sessions for channel ${channelId} since ${sinceStr}...`);
-    const sessions = await searchReadAll(
-      'discuss.channel',
-      [
-        ['livechat_channel_id', '=', channelId],
-        ['create_date', '>=', sinceStr],
-      ],
-      ['name', 'create_date', 'livechat_operator_id', 'anonymous_name',
-       'country_id', 'message_ids', 'livechat_active'],
-      { order: 'create_date desc' },
-    );
-    logger.info(CTX, `Fetched ${sessions.length} sessions (last 7 days)`);
-
-    // ── 2. Collect and fetch all messages ──────────────────────────────────
-    const allMsgIds = new Set<number>();
-    for (const s of sessions) {
-      for (const id of s.message_ids as number[]) allMsgIds.add(id);
-    }
-    logger.info(CTX, `Fetching ${allMsgIds.size} messages...`);
-    const allMessages = await readRecords(
-      'mail.message',
-      Array.from(allMsgIds),
-      ['body', 'author_id', 'date', 'res_id', 'message_type'],
-    );
-    logger.info(CTX, `Fetched ${allMessages.length} messages`);
-
-    // ── 3. Analyze ─────────────────────────────────────────────────────────
-    const analysis = this.analyze(sessions, allMessages);
+    // ── 1-3. Fetch and analyze (Python worker when configured) ─────────────
+    const analysis = isChatWorkerEnabled()
+      ? await this.analyzeWithWorker(sinceStr)
+      : await this.fetchAndAnalyze(channelId, sinceStr);
 
     // ── 4. Write CSV files ─────────────────────────────────────────────────
     this.writeCsv(
@@ -216,6 +201,65 @@ export class OdooChatAnalysisTask extends BaseTask {
 
   // ── Analysis logic ─────────────────────────────────────────────────────────
 
+  private async fetchAndAnalyze(channelId: number, sinceStr: string): Promise<AnalysisResult> {
+    logger.warn(CTX, 'Chat worker not configured (odoo.chat_worker_url) — using the in-process TS classifier fallback');
+    logger.info(CTX, `Fetching livechat sessions for channel ${channelId} since ${sinceStr}...`);
+    const sessions = await searchReadAll(
+      'discuss.channel',
+      [
+        ['livechat_channel_id', '=', channelId],
+        ['create_date', '>=', sinceStr],
+      ],
+      ['name', 'create_date', 'livechat_operator_id', 'anonymous_name',
+       'country_id', 'message_ids', 'livechat_active'],
+      { order: 'create_date desc' },
+    );
+    logger.info(CTX, `Fetched ${sessions.length} sessions (last 7 days)`);
+
+    // ── 2. Collect and fetch all messages ──────────────────────────────────
+    const allMsgIds = new Set<number>();
+    for (const s of sessions) {
+      for (const id of s.message_ids as number[]) allMsgIds.add(id);
+    }
+    logger.info(CTX, `Fetching ${allMsgIds.size} messages...`);
+    const allMessages = await readRecords(
+      'mail.message',
+      Array.from(allMsgIds),
+      ['body', 'author_id', 'date', 'res_id', 'message_type'],
+    );
+    logger.info(CTX, `Fetched ${allMessages.length} messages`);
+
+    // ── 3. Analyze ─────────────────────────────────────────────────────────
+    return this.analyze(sessions, allMessages);
+  }
+
+  private async analyzeWithWorker(sinceStr: string): Promise<AnalysisResult> {
+    logger.info(CTX, `Requesting chat analysis since ${sinceStr} from Python worker...`);
+    const result = await fetchChatAnalysis(sinceStr, [config.odoo.livechatChannelId]);
+    logger.info(CTX, `Worker analyzed ${result.total_sessions} sessions, ${result.total_messages} messages`);
+    return {
+      totalSessions: result.total_sessions,
+      totalMessages: result.total_messages,
+      sessionsByMonth: result.sessions_by_month,
+      sessionsByWeekday: result.sessions_by_weekday,
+      sessionsByHour: Object.fromEntries(Object.entries(result.sessions_by_hour).map(([h, n]) => [Number(h), n])),
+      intents: result.intents,
+      productsMentioned: result.products_mentioned,
+      emailsCaptured: result.emails_captured,
+      conversations: result.conversations_data.map(c => ({
+        sessionId: c.session_id,
+        date: c.date,
+        operator: c.operator,
+        active: c.active,
+        numMessages: c.num_messages,
+        visitorMessages: c.visitor_messages,
+        intents: c.intents,
+        products: c.products,
+        emails: c.emails,
+      })),
+    };
+  }
+
   private analyze(sessions: OdooRecord[], messages: OdooRecord[]): AnalysisResult {
     const msgsBySession = new Map<number, OdooRecord[]>();
     for (const m of messages) {
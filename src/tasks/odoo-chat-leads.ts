@@ -3,6 +3,7 @@ import { config, getEmailsForTask } from '../config';
 import { logger } from '../utils/logger';
 import { sendEmail } from '../services/email';
 import { searchReadAll, searchRead, readRecords, OdooRecord } from '../services/odoo';
+import { isChatWorkerEnabled, fetchChatLeads } from '../services/chat-worker';
 import * as fs from 'fs';
 import * as path from 'path';
 
@@ -16,6 +17,8 @@ function stripHtml(html: string): string {
 
 const EMAIL_RE = /[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}/g;
 
+// Fallback used when odoo.chat_worker_url is empty. Keep in sync with
+// intent_patterns / product_patterns in scripts/odoo_chat_common.py.
 const INTENT_PATTERNS: Record<string, RegExp> = {
   cotizacion_mayoreo: /cotizaci[oó]n.*mayoreo|mayoreo|precio.*mayoreo/i,
   talleres_clinicas: /taller|cl[ií]nica|capacitaci[oó]n|curso|inscrib/i,
@@ -23,23 +26,28 @@ const INTENT_PATTERNS: Record<string, RegExp> = {
   solo_viendo: /solo.*viendo|nada.*gracias|no.*gracias|solo.*mirando/i,
   busca_producto: /busco|necesito|quiero|donde.*encuentro|tienen/i,
   precio: /precio|costo|cu[aá]nto.*cuesta|cu[aá]nto.*vale/i,
+  disponibilidad: /disponib|hay.*en.*stock|tienen.*en.*existencia/i,
+  envio: /env[ií]o|entrega|domicilio|mandan/i,
+  horario: /horario|abren|cierran|hora/i,
+  ubicacion: /ubicaci[oó]n|direcci[oó]n|donde.*est[aá]n|sucursal/i,
+  devolucion: /devoluci[oó]n|cambio|garant[ií]a/i,
   factura: /factura|facturaci[oó]n|cfdi|rfc/i,
   contratista: /contratista|constructor|obra|proyecto/i,
 };
 
 const PRODUCT_PATTERNS: Record<string, RegExp> = {
+  'Varilla/Acero': /varilla|acero|alambre|clavo|malla|solera|perfil.*met[aá]l/i,
   'Cemento/Concreto': /cemento|concreto|mortero|mezcla|block|tabique|tabic[oó]n/i,
-  'Varilla/Acero': /varilla|acero|alambre|clavo|malla|solera/i,
+  'Pintura': /pintura|rodillo|brocha|impermeabilizante|sellador|esmalte/i,
   'Pisos/Loseta': /piso|loseta|porcelanato|azulejo|cer[aá]mica|adocreto/i,
+  'Plomería': /tubo|tuber[ií]a|v[aá]lvula|llave|conector|plomer[ií]a|tinaco/i,
   'Electricidad': /cable|el[eé]ctric|interruptor|contacto|l[aá]mpara|foco/i,
+  'Herramientas': /herramienta|taladro|sierra|martillo|llave|desarmador/i,
   'Madera': /madera|triplay|plywood|tabla|poste|viga/i,
-  'Plomería': /tubo|tuber[ií]a|v[aá]lvula|llave|conector|plomer[ií]a|tinaco/i,
-  'Pintura': /pintura|rodillo|brocha|impermeabilizante|sellador/i,
-  'Herramientas': /herramienta|taladro|sierra|martillo|desarmador/i,
   'Ferretería': /tornillo|pija|ancla|bisagra|jaladera|chapa|cerradura/i,
+  'Impermeabilizante': /impermeabilizante|impermeable|membrana|asfalto/i,
   'Vigueta/Estructura': /vigueta|bovedilla|castillo|armex|estructura/i,
   'Arena/Grava': /arena|grava|piedra|material.*p[eé]treo/i,
-  'Impermeabilizante': /impermeabilizante|impermeable|membrana|asfalto/i,
 };
 
 // ── Types ──────────────────────────────────────────────────────────────────────
@@ -165,6 +173,99 @@ export class OdooChatLeadsTask extends BaseTask {
     const sinceStr = sevenDaysAgo.toISOString().slice(0, 19).replace('T', ' ');
     const periodLabel = `${sevenDaysAgo.toLocaleDateString('es-MX', { day: '2-digit', month: 'short', year: 'numeric' })} – ${now.toLocaleDateString('es-MX', { day: '2-digit', month: 'short', year: 'numeric' })}`;
 
+    const leads = isChatWorkerEnabled()
+      ? await this.leadsFromWorker(sinceStr)
+      : await this.collectLeads(channelId, sinceStr, now);
+
+    const leadsWithEmail = leads.filter(l => l.email);
+    const leadsNoEmail = leads.filter(l => !l.email && l.priorityNum <= 3);
+
+    // ── 6. Write CSVs ─────────────────────────────────────────────────────
+    this.writeCsv(
+      path.join(reportsDir, 'LEADS_SEGUIMIENTO_MARKETING.csv'),
+      ['prioridad', 'fecha_chat', 'dias_transcurridos', 'email', 'nombre_odoo',
+       'telefono', 'celular', 'tipo_cliente', 'productos_solicitados', 'intenciones',
+       'sugerencia_abordaje', 'resumen_visitante', 'ciudad', 'estado', 'empresa',
+       'puesto', 'es_cliente_existente', 'ordenes_venta', 'total_facturado',
+       'num_mensajes', 'session_id'],
+      leadsWithEmail.map(l => [
+        l.prioridad, l.fechaChat, l.diasTranscurridos, l.email, l.nombreOdoo,
+        l.telefono, l.celular, l.tipoCliente, l.productosSolicitados, l.intenciones,
+        l.sugerenciaAbordaje, l.resumenVisitante, l.ciudad, l.estado, l.empresa,
+        l.puesto, l.esClienteExistente, l.ordenesVenta, l.totalFacturado,
+        l.numMensajes, l.sessionId,
+      ]),
+    );
+
+    this.writeCsv(
+      path.join(reportsDir, 'LEADS_CONVERSACIONES_COMPLETAS.csv'),
+      ['prioridad', 'fecha_chat', 'email', 'nombre_odoo', 'tipo_cliente',
+       'productos_solicitados', 'conversacion_completa'],
+      leadsWithEmail.map(l => [
+        l.prioridad, l.fechaChat, l.email, l.nombreOdoo, l.tipoCliente,
+        l.productosSolicitados, l.conversacionCompleta,
+      ]),
+    );
+
+    this.writeCsv(
+      path.join(reportsDir, 'LEADS_SIN_EMAIL_OPORTUNIDADES.csv'),
+      ['prioridad', 'fecha_chat', 'dias_transcurridos', 'tipo_cliente',
+       'productos_solicitados', 'intenciones', 'resumen_visitante', 'num_mensajes'],
+      leadsNoEmail.map(l => [
+        l.prioridad, l.fechaChat, l.diasTranscurridos, l.tipoCliente,
+        l.productosSolicitados, l.intenciones, l.resumenVisitante, l.numMensajes,
+      ]),
+    );
+
+    // ── 7. Write Markdown report ───────────────────────────────────────────
+    const mdPath = path.join(reportsDir, 'REPORTE_SEGUIMIENTO_MARKETING.md');
+    fs.writeFileSync(mdPath, this.buildMarkdown(leadsWithEmail, leadsNoEmail, now, periodLabel), 'utf-8');
+    logger.info(CTX, `Reports written to ${reportsDir}`);
+
+    // ── 8. Email summary to marketing ──────────────────────────────────────
+    const recipients = getEmailsForTask('chatLeads');
+    if (recipients.length > 0) {
+      const priorityCounts = this.countByPriority(leadsWithEmail);
+      const html = this.buildEmailHtml(leadsWithEmail, priorityCounts, now, periodLabel);
+      const attachments = [
+        {
+          filename: 'LEADS_SEGUIMIENTO_MARKETING.csv',
+          path: path.join(reportsDir, 'LEADS_SEGUIMIENTO_MARKETING.csv'),
+          contentType: 'text/csv',
+        },
+        {
+          filename: 'LEADS_CONVERSACIONES_COMPLETAS.csv',
+          path: path.join(reportsDir, 'LEADS_CONVERSACIONES_COMPLETAS.csv'),
+          contentType: 'text/csv',
+        },
+        {
+          filename: 'LEADS_SIN_EMAIL_OPORTUNIDADES.csv',
+          path: path.join(reportsDir, 'LEADS_SIN_EMAIL_OPORTUNIDADES.csv'),
+          contentType: 'text/csv',
+        },
+        {
+          filename: 'REPORTE_SEGUIMIENTO_MARKETING.md',
+          path: mdPath,
+          contentType: 'text/markdown',
+        },
+      ];
+      await sendEmail({
+        to: recipients,
+        subject: `🎯 Leads del Chat — ${leadsWithEmail.length} prospectos (${priorityCounts['🔴 MÁXIMA'] || 0} urgentes) · ${periodLabel}`,
+        html,
+        text: `Reporte de leads (${periodLabel}): ${leadsWithEmail.length} con email, ${priorityCounts['🔴 MÁXIMA'] || 0} prioridad máxima`,
+        attachments,
+      });
+      logger.info(CTX, `Email sent to ${recipients.length} recipient(s)`);
+    } else {
+      logger.warn(CTX, 'No email recipients configured (CHAT_LEADS_EMAILS or MARKETING_EMAILS) — skipping email send');
+    }
+  }
+
+  // ── Helpers ────────────────────────────────────────────────────────────────
+
+  private async collectLeads(channelId: number, sinceStr: string, now: Date): Promise<Lead[]> {
+    logger.warn(CTX, 'Chat worker not configured (odoo.chat_worker_url) — using the in-process TS classifier fallback');
     logger.info(CTX, `Fetching livechat sessions for channel ${channelId} since ${sinceStr}...`);
     const sessions = await searchReadAll(
       'discuss.channel',
@@ -308,93 +409,41 @@ export class OdooChatLeadsTask extends BaseTask {
 
     // ── 5. Sort by priority + recency ──────────────────────────────────────
     leads.sort((a, b) => a.priorityNum - b.priorityNum || a.diasTranscurridos - b.diasTranscurridos);
-
-    const leadsWithEmail = leads.filter(l => l.email);
-    const leadsNoEmail = leads.filter(l => !l.email && l.priorityNum <= 3);
-
-    // ── 6. Write CSVs ─────────────────────────────────────────────────────
-    this.writeCsv(
-      path.join(reportsDir, 'LEADS_SEGUIMIENTO_MARKETING.csv'),
-      ['prioridad', 'fecha_chat', 'dias_transcurridos', 'email', 'nombre_odoo',
-       'telefono', 'celular', 'tipo_cliente', 'productos_solicitados', 'intenciones',
-       'sugerencia_abordaje', 'resumen_visitante', 'ciudad', 'estado', 'empresa',
-       'puesto', 'es_cliente_existente', 'ordenes_venta', 'total_facturado',
-       'num_mensajes', 'session_id'],
-      leadsWithEmail.map(l => [
-        l.prioridad, l.fechaChat, l.diasTranscurridos, l.email, l.nombreOdoo,
-        l.telefono, l.celular, l.tipoCliente, l.productosSolicitados, l.intenciones,
-        l.sugerenciaAbordaje, l.resumenVisitante, l.ciudad, l.estado, l.empresa,
-        l.puesto, l.esClienteExistente, l.ordenesVenta, l.totalFacturado,
-        l.numMensajes, l.sessionId,
-      ]),
-    );
-
-    this.writeCsv(
-      path.join(reportsDir, 'LEADS_CONVERSACIONES_COMPLETAS.csv'),
-      ['prioridad', 'fecha_chat', 'email', 'nombre_odoo', 'tipo_cliente',
-       'productos_solicitados', 'conversacion_completa'],
-      leadsWithEmail.map(l => [
-        l.prioridad, l.fechaChat, l.email, l.nombreOdoo, l.tipoCliente,
-        l.productosSolicitados, l.conversacionCompleta,
-      ]),
-    );
-
-    this.writeCsv(
-      path.join(reportsDir, 'LEADS_SIN_EMAIL_OPORTUNIDADES.csv'),
-      ['prioridad', 'fecha_chat', 'dias_transcurridos', 'tipo_cliente',
-       'productos_solicitados', 'intenciones', 'resumen_visitante', 'num_mensajes'],
-      leadsNoEmail.map(l => [
-        l.prioridad, l.fechaChat, l.diasTranscurridos, l.tipoCliente,
-        l.productosSolicitados, l.intenciones, l.resumenVisitante, l.numMensajes,
-      ]),
-    );
-
-    // ── 7. Write Markdown report ───────────────────────────────────────────
-    const mdPath = path.join(reportsDir, 'REPORTE_SEGUIMIENTO_MARKETING.md');
-    fs.writeFileSync(mdPath, this.buildMarkdown(leadsWithEmail, leadsNoEmail, now, periodLabel), 'utf-8');
-    logger.info(CTX, `Reports written to ${reportsDir}`);
-
-    // ── 8. Email summary to marketing ──────────────────────────────────────
-    const recipients = getEmailsForTask('chatLeads');
-    if (recipients.length > 0) {
-      const priorityCounts = this.countByPriority(leadsWithEmail);
-      const html = this.buildEmailHtml(leadsWithEmail, priorityCounts, now, periodLabel);
-      const attachments = [
-        {
-          filename: 'LEADS_SEGUIMIENTO_MARKETING.csv',
-          path: path.join(reportsDir, 'LEADS_SEGUIMIENTO_MARKETING.csv'),
-          contentType: 'text/csv',
-        },
-        {
-          filename: 'LEADS_CONVERSACIONES_COMPLETAS.csv',
-          path: path.join(reportsDir, 'LEADS_CONVERSACIONES_COMPLETAS.csv'),
-          contentType: 'text/csv',
-        },
-        {
-          filename: 'LEADS_SIN_EMAIL_OPORTUNIDADES.csv',
-          path: path.join(reportsDir, 'LEADS_SIN_EMAIL_OPORTUNIDADES.csv'),
-          contentType: 'text/csv',
-        },
-        {
-          filename: 'REPORTE_SEGUIMIENTO_MARKETING.md',
-          path: mdPath,
-          contentType: 'text/markdown',
-        },
-      ];
-      await sendEmail({
-        to: recipients,
-        subject: `🎯 Leads del Chat — ${leadsWithEmail.length} prospectos (${priorityCounts['🔴 MÁXIMA'] || 0} urgentes) · ${periodLabel}`,
-        html,
-        text: `Reporte de leads (${periodLabel}): ${leadsWithEmail.length} con email, ${priorityCounts['🔴 MÁXIMA'] || 0} prioridad máxima`,
-        attachments,
-      });
-      logger.info(CTX, `Email sent to ${recipients.length} recipient(s)`);
-    } else {
-      logger.warn(CTX, 'No email recipients configured (CHAT_LEADS_EMAILS or MARKETING_EMAILS) — skipping email send');
-    }
+    return leads;
   }
 
-  // ── Helpers ────────────────────────────────────────────────────────────────
+  private async leadsFromWorker(sinceStr: string): Promise<Lead[]> {
+    logger.info(CTX, `Requesting chat leads since ${sinceStr} from Python worker...`);
+    const result = await fetchChatLeads(sinceStr, [config.odoo.livechatChannelId]);
+    const leads: Lead[] = result.leads_with_email.concat(result.leads_without_email).map(l => ({
+      sessionId: l.session_id,
+      fechaChat: l.fecha_chat,
+      diasTranscurridos: l.dias_transcurridos,
+      priorityNum: l.priority_num,
+      prioridad: l.prioridad,
+      email: l.email,
+      tipoCliente: l.tipo_cliente,
+      intenciones: l.intenciones,
+      productosSolicitados: l.productos_solicitados,
+      resumenVisitante: l.resumen_visitante,
+      sugerenciaAbordaje: l.sugerencia_abordaje,
+      numMensajes: l.num_mensajes,
+      conversacionCompleta: l.conversacion_completa,
+      nombreOdoo: l.nombre_odoo,
+      telefono: l.telefono,
+      celular: l.celular,
+      ciudad: l.ciudad,
+      estado: l.estado,
+      empresa: l.empresa,
+      puesto: l.puesto,
+      esClienteExistente: l.es_cliente_existente,
+      ordenesVenta: l.ordenes_venta,
+      totalFacturado: l.total_facturado,
+    }));
+    logger.info(CTX, `Worker returned ${leads.length} leads (${result.leads_with_email.length} with email)`);
+    leads.sort((a, b) => a.priorityNum - b.priorityNum || a.diasTranscurridos - b.diasTranscurridos);
+    return leads;
+  }
 
   private countByPriority(leads: Lead[]): Record<string, number> {
     const counts: Record<string, number> = {};